@@ -1,12 +1,18 @@
 import logging.config
+import queue
 import sqlite3
-import pickle
+import time
 
 import numpy as np
 import sqlalchemy.exc
-from flask import Flask, render_template, request
+from flask import Flask, Response, g, jsonify, render_template, request
 
 from src.add_bodymeasurement import UserInputManager
+from src.app_metrics import AppMetrics
+from src.db_engine import pool_status
+from src.model_registry import ModelRegistry
+from src.prediction_cache import PredictionCache
+from src.serve_model import BAND_LABELS, body_fat_band, body_fat_bands, validate_records
 
 # Initialize the Flask application
 app = Flask(__name__, template_folder="app/templates", static_folder="app/static")
@@ -22,23 +28,53 @@ logger = logging.getLogger("Body Fat App")
 # Initialize the database session
 application_manager = UserInputManager(app)
 
-try:
-    MODEL_PATH = "models/Lasso.sav"
-    model = pickle.load(open(MODEL_PATH, "rb"))
-except FileNotFoundError as e:
-    logger.error("The model file does not exist at %s", MODEL_PATH)
-    raise e
-else:
-    logger.info("Successfully load the model from %s", MODEL_PATH)
-
-try:
-    SCALER_PATH = "models/scaler.sav"
-    scaler = pickle.load(open(SCALER_PATH, "rb"))
-except FileNotFoundError as e:
-    logger.error("The scalar file does not exist at %s", SCALER_PATH)
-    raise e
-else:
-    logger.info("Successfully load the scalar from %s", SCALER_PATH)
+# Serve the model and swap in a retrained one when the model files change
+model_registry = ModelRegistry(app.config["MODEL_PATH"], app.config["SCALER_PATH"],
+                               poll_interval=app.config["MODEL_RELOAD_INTERVAL"])
+
+# Cache predictions of repeated measurements until a new model version is swapped in
+prediction_cache = PredictionCache(maxsize=app.config["PREDICTION_CACHE_SIZE"],
+                                   ttl=app.config["PREDICTION_CACHE_TTL"],
+                                   decimals=app.config["PREDICTION_CACHE_DECIMALS"],
+                                   fingerprint=model_registry.version)
+model_registry.add_listener(prediction_cache.invalidate)
+
+# Count the requests and time them and their phases, served in the Prometheus text format by /metrics
+app_metrics = AppMetrics()
+app_metrics.set_model_version(model_registry.version)
+model_registry.add_listener(app_metrics.set_model_version)
+# with write-behind, the inserts fail in the writer thread instead of in the request
+if application_manager.writer is not None:
+    application_manager.writer.add_listener(app_metrics.count_db_error)
+flask_wsgi_app = app.wsgi_app
+
+
+def timed_wsgi_app(environ, start_response):
+    """Record when the request reached the app in its WSGI environment, before Flask routes it"""
+    environ["bodyfat.request_start"] = time.perf_counter()
+    return flask_wsgi_app(environ, start_response)
+
+
+app.wsgi_app = timed_wsgi_app
+
+
+@app.after_request
+def add_model_version(response):
+    """Report the model version that answered the request in a response header"""
+    response.headers.setdefault("X-Model-Version", g.get("model_version", model_registry.version))
+    return response
+
+
+@app.after_request
+def record_request(response):
+    """Count the request and record its latency under its URL rule"""
+    # every access through the request proxy costs about a microsecond, so it is resolved once
+    current = request._get_current_object()
+    endpoint = current.url_rule.rule if current.url_rule is not None else "unmatched"
+    now = time.perf_counter()
+    app_metrics.observe_request(endpoint, current.method, response.status_code,
+                                now - current.environ.get("bodyfat.request_start", now))
+    return response
 
 
 @app.route("/")
@@ -55,6 +91,7 @@ def add_entry():
        Returns:
            redirect to index page
     """
+    timer = app_metrics.timer("/result")
     try:
         name = request.form["name"]
         age = request.form["age"]
@@ -71,43 +108,46 @@ def add_entry():
         forearm = request.form["forearm"]
         wrist = request.form["wrist"]
         user_input = [age, weight, height, neck, chest, abdomen, hip, thigh, knee, ankle, biceps, forearm, wrist]
+        timer.lap("parse_form")
 
         # Add user body information to RDS for future usages
 
         application_manager.add_user(name, age, weight, height, neck, chest, abdomen, hip, thigh, knee,
                                          ankle, biceps, forearm, wrist)
         logger.info("New user body measurement is added %s", user_input)
+        timer.lap("db_insert")
 
         user_input = [age, weight, height, neck, chest, abdomen, hip, thigh, knee, ankle, biceps, forearm, wrist]
         for _input in user_input:
             if not _input:
                 return render_template("error.html", msg="Error! Please input a value for every input field.")
-        user_input = np.array(user_input).reshape(1, -1)
-        # scale user input
-        user_input_transformed = scaler.transform(user_input)
-        # generate prediction
-        user_prediction = float(model.predict(user_input_transformed))
+        # generate prediction on the scaled user input, unless the same input was seen before
+        current = model_registry.current
+        g.model_version = current.version
+        features = [float(_input) for _input in user_input]
+        if not np.isfinite(features).all():
+            return render_template("error.html", msg="Error! Please input a number for every input field.")
+        user_prediction = prediction_cache.get(features, current.version)
+        if user_prediction is None:
+            user_prediction = current.scorer.predict_one(features)
+            prediction_cache.put(features, user_prediction, current.version)
         user_prediction = round(user_prediction, 1)
         percentage = user_prediction * 7
-        if user_prediction < 8:
-            body_percentage = 20
-        elif 8 <= user_prediction < 15:
-            body_percentage = 82
-        elif 15 <= user_prediction <= 18:
-            body_percentage = 144
-        elif 18 < user_prediction < 25:
-            body_percentage = 206
-        elif user_prediction >= 30:
-            body_percentage = 268
-
-        logger.info("The predicted body fat for the user is %s", user_prediction)
+        body_percentage = body_fat_band(user_prediction)
+        timer.lap("predict")
+
+        logger.info("The predicted body fat for the user is %s (model version %s)",
+                    user_prediction, current.version)
 
         logger.debug("Result page accessed")
 
-        return render_template("index.html", user_prediction=user_prediction, percentage=percentage,
-                               body_percentage=body_percentage)
+        page = render_template("index.html", user_prediction=user_prediction, percentage=percentage,
+                               body_percentage=body_percentage, model_version=current.version)
+        timer.lap("render")
+        return page
 
     except sqlite3.OperationalError as e:
+        app_metrics.count_db_error(type(e).__name__)
         logger.error(
             "Error page returned. Not able to add user input to local sqlite "
             "database: %s. Error: %s ",
@@ -117,6 +157,7 @@ def add_entry():
                                    "Please check if you are connected to Northwestern VPN and "
                                    "configure your RDS and try back later.")
     except sqlalchemy.exc.OperationalError as e:
+        app_metrics.count_db_error(type(e).__name__)
         logger.error(
             "Error page returned. Not able to add user input to MySQL database: %s. "
             "Error: %s ",
@@ -125,6 +166,81 @@ def add_entry():
                                msg="We are sorry. There was a problem accessing the database. "
                                    "Please check if you are connected to Northwestern VPN and "
                                    "configure your RDS and try back later.")
+    except queue.Full:
+        app_metrics.count_db_error("WriteQueueFull")
+        logger.error("Error page returned. The queue of user inputs waiting to be written is full")
+        return render_template("error.html",
+                               msg="We are sorry. The app is busy right now. Please try back later.")
+
+
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """View that scores a JSON batch of body measurement records
+       Expects either a list of records or an object with a "records" list. Every record holds
+       the same 13 measurements as the form in the index page.
+       Returns:
+           JSON with one prediction and body fat band per record
+    """
+    payload = request.get_json(silent=True)
+    records = payload.get("records") if isinstance(payload, dict) else payload
+    if not isinstance(records, list):
+        return jsonify(error="Request body must be a JSON list of records "
+                             "or an object with a 'records' list"), 400
+    if len(records) > app.config["MAX_BATCH_SIZE"]:
+        return jsonify(error="A batch can hold at most %d records" % app.config["MAX_BATCH_SIZE"]), 413
+
+    try:
+        features, valid, errors = validate_records(records)
+    except TypeError as e:
+        return jsonify(error=str(e)), 400
+
+    # scale and score all valid records at once
+    current = model_registry.current
+    g.model_version = current.version
+    predictions = np.full(len(records), np.nan)
+    if valid.any():
+        predictions[valid] = current.scorer.predict(features[valid])
+    predictions = np.round(predictions, 1)
+    bands = body_fat_bands(predictions)
+
+    results = []
+    for prediction, band, error in zip(predictions.tolist(), bands.tolist(), errors):
+        if error:
+            results.append({"prediction": None, "band": None, "error": "Missing or invalid: " + ", ".join(error)})
+        else:
+            results.append({"prediction": prediction, "band": BAND_LABELS[band]})
+    logger.info("Scored a batch of %d records, %d of them valid (model version %s)",
+                len(records), int(valid.sum()), current.version)
+
+    return jsonify(predictions=results, model_version=current.version)
+
+
+@app.route("/metrics")
+def metrics():
+    """View that reports the request counts, the latency quantiles of the requests and of the phases of /result,
+       the database errors and the model version of this process
+       Returns:
+           The metrics in the Prometheus text format
+    """
+    return Response(app_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/metrics/db")
+def db_metrics():
+    """View that reports the state of the database connection pool of this process
+       Returns:
+           JSON with the pool size, checked in/out and overflow connections and checkout wait times
+    """
+    return jsonify(pool_status(application_manager.database.get_engine(app)))
+
+
+@app.route("/metrics/cache")
+def cache_metrics():
+    """View that reports the prediction cache of this process
+       Returns:
+           JSON with the cache size, hit/miss/eviction counters and the model fingerprint
+    """
+    return jsonify(prediction_cache.stats())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+"""Measure the overhead the latency instrumentation of the app adds to every request.
+
+A /result request records four phases and the request itself. Every run instruments `--calls` requests and the
+best of `--repeats` runs is reported per request. Folding the samples into the histograms happens when /metrics is
+scraped, its cost is reported per request folded. Run from the root of the repository:
+
+    python -m benchmarks.bench_app_metrics --calls 50000
+"""
+import argparse
+import time
+
+from benchmarks.bench_artifact_io import best_of
+from src.app_metrics import AppMetrics
+
+
+def instrument_request(metrics: AppMetrics) -> None:
+    """Make the calls /result makes to the metrics, without the work they time"""
+    start = time.perf_counter()
+    timer = metrics.timer("/result")
+    for phase in ("parse_form", "db_insert", "predict", "render"):
+        timer.lap(phase)
+    metrics.observe_request("/result", "POST", 200, time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of the app metrics")
+    parser.add_argument("--calls", type=int, default=50000,
+                        help="Number of requests per run, below MAX_PENDING so that they are folded at scrape")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    metrics = AppMetrics()
+    record, fold = [], []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            instrument_request(metrics)
+        record.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        metrics.fold()
+        fold.append(time.perf_counter() - start)
+
+    print("%-34s %14s" % ("case", "time (us)"))
+    print("%-34s %14.3f" % ("instrumented /result request", min(record) / args.calls * 1e6))
+    print("%-34s %14.3f" % ("fold at scrape, per request", min(fold) / args.calls * 1e6))
+    print("%-34s %14.3f" % ("render /metrics", best_of(metrics.render, args.repeats) * 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare the write time, read time and file size of the CSV, Parquet and Feather artifact formats.
+
+The table is a synthetic body measurement table with the columns of data/raw/bodyfat.csv.
+Run from the root of the repository:
+
+    python -m benchmarks.bench_artifact_io --rows 2000000 --repeats 3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.artifact_io import FORMATS, read_table, write_table
+
+COLUMNS = ["Density", "BodyFat", "Age", "Weight", "Height", "Neck", "Chest", "Abdomen", "Hip", "Thigh",
+           "Knee", "Ankle", "Biceps", "Forearm", "Wrist"]
+MEANS = [1.056, 19.2, 44.9, 178.9, 70.1, 38.0, 100.8, 92.6, 99.9, 59.4, 38.6, 23.1, 32.3, 28.7, 18.2]
+SCALES = [0.019, 8.4, 12.6, 29.4, 3.7, 2.4, 8.4, 10.8, 7.2, 5.2, 2.4, 1.7, 3.0, 2.0, 0.9]
+
+
+def synthetic_table(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Draw a table of body measurements rounded like the raw data"""
+    rng = np.random.default_rng(seed)
+    data = rng.normal(MEANS, SCALES, size=(rows, len(COLUMNS))).round(1)
+    table = pd.DataFrame(data, columns=COLUMNS)
+    table["Density"] = rng.normal(MEANS[0], SCALES[0], size=rows).round(4)
+    table["Age"] = table["Age"].round().astype(int)
+    return table
+
+
+def best_of(function, repeats: int) -> float:
+    """Run a function several times and return its fastest wall time in seconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the artifact formats of the pipeline")
+    parser.add_argument("--rows", type=int, default=2000000, help="Number of rows of the synthetic table")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of runs per measurement, the best is kept")
+    args = parser.parse_args()
+
+    table = synthetic_table(args.rows)
+    print("%d rows x %d columns, %.1f MB in memory" % (args.rows, len(COLUMNS),
+                                                        table.memory_usage(deep=True).sum() / 2 ** 20))
+    print("%-26s %10s %10s %14s %10s" % ("format", "write (s)", "read (s)", "2 columns (s)", "size (MB)"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        variants = [(fmt, fmt, {}) for fmt in FORMATS] + [("feather, no memory map", "feather",
+                                                          {"memory_map": False})]
+        for label, fmt, options in variants:
+            path = os.path.join(directory, "table" + FORMATS[fmt])
+            write = best_of(lambda: write_table(table, path), args.repeats)
+            read = best_of(lambda: read_table(path, **options), args.repeats)
+            read_columns = best_of(lambda: read_table(path, columns=["BodyFat", "Abdomen"], **options),
+                                   args.repeats)
+            print("%-26s %10.3f %10.3f %14.3f %10.1f" % (label, write, read, read_columns,
+                                                        os.path.getsize(path) / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare scoring N records through /predict_batch against looping over /result.
+
+Run from the root of the repository after the model has been trained (`make train`):
+
+    python -m benchmarks.bench_batch_predict --n_records 500 --repeats 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+FORM = {"name": "bench", "age": "22", "weight": "165", "height": "70", "neck": "30", "chest": "100",
+        "abdomen": "85", "hip": "100", "thigh": "60", "knee": "80", "ankle": "23", "biceps": "35",
+        "forearm": "25", "wrist": "18"}
+
+
+def summarize(label: str, latencies: list, n_records: int) -> None:
+    """Print requests/sec, records/sec and latency percentiles of a run"""
+    latencies = np.array(latencies)
+    total = latencies.sum()
+    print("%-22s requests/sec: %9.1f  records/sec: %9.1f  p50: %8.2f ms  p99: %8.2f ms"
+          % (label, len(latencies) / total, n_records / total,
+             np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark /predict_batch against /result")
+    parser.add_argument("--n_records", type=int, default=500, help="Number of records per batch")
+    parser.add_argument("--repeats", type=int, default=20, help="Number of batches to send")
+    args = parser.parse_args()
+
+    # keep the benchmark away from the real database
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + db_path
+
+    from src.add_bodymeasurement import create_db
+    create_db(os.environ["SQLALCHEMY_DATABASE_URI"])
+    from app import app  # pylint: disable=import-outside-toplevel
+    client = app.test_client()
+
+    rng = np.random.default_rng(0)
+    records = []
+    for _ in range(args.n_records):
+        record = {key: float(value) * rng.uniform(0.9, 1.1) for key, value in FORM.items() if key != "name"}
+        records.append(record)
+
+    loop_latencies = []
+    for record in records:
+        form = dict(FORM, **{key: str(value) for key, value in record.items()})
+        start = time.perf_counter()
+        client.post("/result", data=form)
+        loop_latencies.append(time.perf_counter() - start)
+
+    batch_latencies = []
+    batch_records = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        response = client.post("/predict_batch", json={"records": records})
+        batch_latencies.append(time.perf_counter() - start)
+        batch_records.append(len(response.get_json()["predictions"]))
+
+    summarize("/result (loop)", loop_latencies, len(loop_latencies))
+    summarize("/predict_batch (%d)" % args.n_records, batch_latencies, sum(batch_records))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare the batch scoring mode of the predict step against reading, scoring and writing all rows at once.
+
+The all-at-once version is what `predict` does with x_test: read the whole table, predict in one call
+and write the predictions with `np.savetxt`. Every run happens in a fresh interpreter, so its peak RSS
+only covers that run. Run from the root of the repository:
+
+    python -m benchmarks.bench_batch_score --rows 1000000 4000000 --chunksize 100000 --n-jobs 1 4
+"""
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+from sklearn import linear_model
+from sklearn.preprocessing import StandardScaler
+
+from benchmarks.bench_artifact_io import COLUMNS, synthetic_table
+from src.artifact_io import TableWriter
+
+FEATURES = [column for column in COLUMNS if column not in ("Density", "BodyFat")]
+
+TEMPLATE = """
+import json, pickle, resource, time
+import numpy as np
+from src.artifact_io import read_table
+from src.score_model import score_batch
+features = {features!r}
+start = time.perf_counter()
+if {n_jobs!r} is None:
+    model, scaler = pickle.load(open({model_path!r}, "rb")), pickle.load(open({scaler_path!r}, "rb"))
+    data = read_table({load_path!r})
+    np.savetxt({save_path!r} + ".txt", model.predict(scaler.transform(data[features])))
+else:
+    score_batch({{"load_path": {load_path!r}, "scaler_path": {scaler_path!r}, "chunksize": {chunksize!r},
+                 "n_jobs": {n_jobs!r}, "save_path": {save_path!r} + ".parquet"}}, {model_path!r}, features)
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+def measure(**arguments) -> dict:
+    """Score the table in a fresh interpreter and collect its time and peak RSS"""
+    output = subprocess.run([sys.executable, "-c", TEMPLATE.format(**arguments)], check=True, capture_output=True,
+                            text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the batch scoring mode of the predict step")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000, 4000000], help="Numbers of rows to score")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Number of rows per chunk")
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, 4], help="Numbers of worker processes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path, scaler_path = os.path.join(directory, "Lasso.sav"), os.path.join(directory, "scaler.sav")
+        sample = synthetic_table(10000)
+        scaler = StandardScaler().fit(sample[FEATURES])
+        model = linear_model.Lasso(alpha=0.2).fit(pd.DataFrame(scaler.transform(sample[FEATURES]), columns=FEATURES),
+                                                  sample["BodyFat"])
+        with open(model_path, "wb") as file:
+            pickle.dump(model, file)
+        with open(scaler_path, "wb") as file:
+            pickle.dump(scaler, file)
+
+        print("%10s %-14s %10s %12s %14s" % ("rows", "mode", "time (s)", "rows/s", "peak RSS (MB)"))
+        for rows in args.rows:
+            load_path = os.path.join(directory, "users.parquet")
+            # written in pieces, so that this process stays small: a child's peak RSS includes its parent's
+            # memory from before the exec
+            with TableWriter(load_path) as writer:
+                for seed, offset in enumerate(range(0, rows, args.chunksize)):
+                    writer.write(synthetic_table(min(args.chunksize, rows - offset), seed))
+            for mode, n_jobs in [("all at once", None)] + [("batch n_jobs=%d" % n, n) for n in args.n_jobs]:
+                result = measure(features=FEATURES, n_jobs=n_jobs, model_path=model_path, scaler_path=scaler_path,
+                                 load_path=load_path, save_path=os.path.join(directory, "predictions"),
+                                 chunksize=args.chunksize)
+                print("%10d %-14s %10.2f %12.0f %14.1f" % (rows, mode, result["seconds"], rows / result["seconds"],
+                                                          result["max_rss_kb"] / 1024))
+
+
+if __name__ == "__main__":
+    main()
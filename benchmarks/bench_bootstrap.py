@@ -0,0 +1,54 @@
+"""Compare the vectorized bootstrap of the evaluate step against computing the metrics of one replicate at a time.
+
+The test set has the size of the test split of the pipeline by default. Run from the root of the repository:
+
+    python -m benchmarks.bench_bootstrap --rows 50 --replicates 1000 10000 100000 --n-jobs 1 4
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.metrics import bootstrap_metrics, compute_metrics
+
+
+def loop_bootstrap(y_true: np.ndarray, y_pred: np.ndarray, replicates: int, seed: int) -> dict:
+    """Resample and compute the metrics replicate by replicate"""
+    rng = np.random.default_rng(seed)
+    values = []
+    for _ in range(replicates):
+        index = rng.integers(0, len(y_true), len(y_true))
+        values.append(compute_metrics(y_true[index], y_pred[index], n_features=13))
+    return {name: np.percentile([value[name] for value in values], [2.5, 97.5]).tolist() for name in values[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the bootstrap confidence intervals of the metrics")
+    parser.add_argument("--rows", type=int, default=50, help="Number of test rows")
+    parser.add_argument("--replicates", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Numbers of bootstrap replicates")
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, 4], help="Numbers of processes")
+    parser.add_argument("--loop-limit", type=int, default=10000,
+                        help="Largest number of replicates the replicate by replicate loop is timed for")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    y_true = rng.normal(19., 8., args.rows)
+    y_pred = y_true + rng.normal(0., 2., args.rows)
+
+    print("%10s %-16s %10s %16s" % ("replicates", "method", "time (s)", "R2 interval"))
+    for replicates in args.replicates:
+        if replicates <= args.loop_limit:
+            start = time.perf_counter()
+            intervals = loop_bootstrap(y_true, y_pred, replicates, 1)
+            print("%10d %-16s %10.3f %16s" % (replicates, "loop", time.perf_counter() - start,
+                                             "[%.3f, %.3f]" % tuple(intervals["R-squared"])))
+        for n_jobs in args.n_jobs:
+            start = time.perf_counter()
+            intervals = bootstrap_metrics(y_true, y_pred, 13, replicates, random_state=1, n_jobs=n_jobs)
+            print("%10d %-16s %10.3f %16s" % (replicates, "matrix n_jobs=%d" % n_jobs, time.perf_counter() - start,
+                                             "[%.3f, %.3f]" % tuple(intervals["R-squared"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compare bulk ingestion of a measurement file against adding the users one at a time.
+
+Both run against a fresh local SQLite database:
+
+    python -m benchmarks.bench_bulk_ingest --n_rows 100000 --n_single 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.add_bodymeasurement import MEASUREMENT_COLUMNS, UserInputManager, create_db, ingest_file
+
+MEANS = [45., 179., 70., 38., 101., 93., 100., 59., 39., 23., 32., 29., 18.]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bulk ingestion into the UserInputs table")
+    parser.add_argument("--n_rows", type=int, default=100000, help="Number of rows in the bulk file")
+    parser.add_argument("--n_single", type=int, default=1000, help="Number of users added one at a time")
+    parser.add_argument("--chunksize", type=int, default=10000, help="Rows per bulk transaction")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(np.round(MEANS * rng.uniform(0.9, 1.1, (args.n_rows, len(MEANS))), 1),
+                        columns=MEASUREMENT_COLUMNS)
+    data.insert(0, "name", "user")
+    input_path = os.path.join(directory, "users.csv")
+    data.to_csv(input_path, index=False)
+
+    engine_string = "sqlite:///" + os.path.join(directory, "single.db")
+    create_db(engine_string)
+    manager = UserInputManager(engine_string=engine_string)
+    start = time.perf_counter()
+    for record in data.head(args.n_single).to_dict("records"):
+        manager.add_user(**record)
+    single_rate = args.n_single / (time.perf_counter() - start)
+    manager.close()
+
+    engine_string = "sqlite:///" + os.path.join(directory, "bulk.db")
+    create_db(engine_string)
+    stats = ingest_file(engine_string, input_path, args.chunksize)
+
+    print("add_user one at a time: %10.0f rows/sec" % single_rate)
+    print("ingest_file (chunks of %d): %10.0f rows/sec (%d rows in %.2f s)"
+          % (args.chunksize, stats["rows_per_second"], stats["inserted"], stats["seconds"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare folding newly appended rows into the scaler against refitting it on all rows.
+
+The cleaned data holds `--rows` rows the scaler has already seen, followed by `--new-rows` new ones. The increment
+still reads and hashes the rows already seen, to check that they did not change, but only fits the new ones.
+Run from the root of the repository:
+
+    python -m benchmarks.bench_incremental_scaler --rows 2000000 --new-rows 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from benchmarks.bench_artifact_io import COLUMNS, synthetic_table
+from src.artifact_io import TableWriter, read_table
+from src.generate_features import update_scaler
+
+FEATURES = [column for column in COLUMNS if column not in ("Density", "BodyFat")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the incremental scaler update against a full refit")
+    parser.add_argument("--rows", type=int, default=2000000, help="Number of rows the scaler has already seen")
+    parser.add_argument("--new-rows", type=int, default=20000, help="Number of newly appended rows")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Number of rows per chunk")
+    args = parser.parse_args()
+
+    print("%-8s %16s %16s %18s" % ("format", "full refit (s)", "increment (s)", "max |mean diff|"))
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in [".csv", ".parquet"]:
+            path = os.path.join(directory, "cleaned_data" + extension)
+            with TableWriter(path) as writer:
+                for seed, offset in enumerate(range(0, args.rows, args.chunksize)):
+                    writer.write(synthetic_table(min(args.chunksize, args.rows - offset), seed))
+            scaler, rows, fingerprint = update_scaler(None, path, FEATURES, 0, args.chunksize)
+            table = synthetic_table(args.new_rows, seed=10 ** 6)
+            if extension == ".csv":
+                table.to_csv(path, index=False, mode="a", header=False)
+            else:
+                # a Parquet file cannot be appended to, rewrite it with the new rows as the last row group
+                old = read_table(path)
+                with TableWriter(path) as writer:
+                    writer.write(old)
+                    writer.write(table)
+                del old
+
+            start = time.perf_counter()
+            full = StandardScaler().fit(read_table(path, columns=FEATURES))
+            full_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            scaler, rows, fingerprint = update_scaler(scaler, path, FEATURES, rows, args.chunksize, fingerprint)
+            increment_seconds = time.perf_counter() - start
+
+            print("%-8s %16.3f %16.3f %18.2e" % (extension[1:], full_seconds, increment_seconds,
+                                                 np.max(np.abs(scaler.mean_ - full.mean_))))
+
+
+if __name__ == "__main__":
+    main()
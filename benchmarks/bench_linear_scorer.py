@@ -0,0 +1,61 @@
+"""Compare the per-prediction latency of the compiled scorer against scaler.transform + model.predict.
+
+Run from the root of the repository after the model has been trained (`make train`):
+
+    python -m benchmarks.bench_linear_scorer --n_rows 10000
+"""
+import argparse
+import pickle
+import timeit
+import warnings
+
+import numpy as np
+
+from src.linear_scorer import LinearScorer
+
+
+def report(label: str, seconds: float, n_predictions: int) -> None:
+    """Print the latency per prediction of a timed run"""
+    print("%-34s %10.2f us/prediction" % (label, seconds / n_predictions * 1e6))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the compiled linear scorer")
+    parser.add_argument("--model_path", default="models/Lasso.sav", help="Path to the pickled model")
+    parser.add_argument("--scaler_path", default="models/scaler.sav", help="Path to the pickled scaler")
+    parser.add_argument("--n_rows", type=int, default=10000, help="Number of rows in the batch run")
+    parser.add_argument("--number", type=int, default=2000, help="Number of single row predictions")
+    args = parser.parse_args()
+
+    # the app passes bare arrays to estimators fitted on DataFrames
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    with open(args.model_path, "rb") as f:
+        model = pickle.load(f)
+    with open(args.scaler_path, "rb") as f:
+        scaler = pickle.load(f)
+    scorer = LinearScorer.from_estimators(scaler, model)
+
+    rng = np.random.default_rng(0)
+    batch = scaler.mean_ + rng.standard_normal((args.n_rows, scaler.mean_.shape[0])) * scaler.scale_
+    row = batch[:1]
+    row_list = row[0].tolist()
+
+    difference = np.abs(model.predict(scaler.transform(batch)) - scorer.predict(batch)).max()
+    print("max abs difference over %d rows: %.3e" % (args.n_rows, difference))
+    print("active features: %d of %d" % (scorer.active.shape[0], scorer.n_features))
+
+    report("single row, sklearn two-step", timeit.timeit(
+        lambda: model.predict(scaler.transform(row)), number=args.number), args.number)
+    report("single row, scorer.predict", timeit.timeit(
+        lambda: scorer.predict(row), number=args.number), args.number)
+    report("single row, scorer.predict_one", timeit.timeit(
+        lambda: scorer.predict_one(row_list), number=args.number), args.number)
+    report("batch, sklearn two-step", timeit.timeit(
+        lambda: model.predict(scaler.transform(batch)), number=10), args.n_rows * 10)
+    report("batch, scorer.predict", timeit.timeit(
+        lambda: scorer.predict(batch), number=10), args.n_rows * 10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Load test the serving path of the app and compare the results with a saved baseline.
+
+Every scenario sends `--requests` requests to the app, after `--warmup` requests that are not measured, and reports
+the throughput, the p50, p95 and p99 latency and the peak resident memory of the process so far, which covers the
+app and the load generator alike. Two drivers are run:
+
+- `test_client`: Flask's test client in this process, one request at a time, which leaves out the HTTP stack
+- `wsgi`: werkzeug's threaded WSGI server on a free local port, sent requests over keep-alive connections by
+  `--concurrency` threads
+
+`/result` is posted `--payloads` distinct synthetic measurements in turn, so with fewer payloads than requests part
+of the predictions come from the prediction cache. User inputs are written to a temporary SQLite database. The app
+logs every prediction to stderr, which belongs to the serving path; redirect it to keep the report readable. Run from
+the root of the repository after the model has been trained (`make train`):
+
+    python -m benchmarks.bench_load --requests 2000 --save benchmarks/baselines/local.json 2> /dev/null
+    python -m benchmarks.bench_load --requests 2000 --compare benchmarks/baselines/local.json 2> /dev/null
+
+`--compare` flags every metric that is more than `--threshold` worse than in the baseline and exits with status 1
+if any is. Baselines are only comparable on the same machine.
+"""
+import argparse
+import concurrent.futures
+import http.client
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+import typing
+import urllib.parse
+
+import numpy as np
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks.bench_batch_predict import FORM
+
+# Scenarios of the serving path, by name: HTTP method and path
+SCENARIOS = {"index": ("GET", "/"), "result": ("POST", "/result")}
+# Reported metrics, by name: whether a higher value is better
+METRICS = {"throughput": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "peak_rss_mb": False}
+
+
+def synthetic_forms(count: int, seed: int = 0) -> typing.List[typing.Dict[str, str]]:
+    """Draw forms of /result whose measurements are within 10% of a typical user"""
+    rng = np.random.default_rng(seed)
+    return [dict({key: "%.1f" % (float(value) * rng.uniform(0.9, 1.1)) for key, value in FORM.items()
+                  if key != "name"}, name="load%d" % index)
+            for index in range(count)]
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident memory of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class FlaskClientDriver:
+    """Sends requests through Flask's test client, which is not shared between threads."""
+
+    concurrency = 1
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method: str, path: str, form: typing.Optional[dict]) -> int:
+        """Send a request and return its status code"""
+        return self.client.open(path, method=method, data=form).status_code
+
+    def close(self) -> None:
+        """Nothing to release"""
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    """Keeps the connection open between requests, as a production server behind a proxy would."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, *args, **kwargs) -> None:
+        """Do not log every request"""
+
+
+class WSGIServerDriver:
+    """Serves the app with werkzeug's threaded WSGI server and sends it requests over HTTP, one keep-alive
+    connection per sending thread."""
+
+    def __init__(self, app, concurrency: int):
+        self.concurrency = concurrency
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.connections = threading.local()
+
+    def send(self, method: str, path: str, form: typing.Optional[dict]) -> int:
+        """Send a request and return its status code"""
+        if not hasattr(self.connections, "connection"):
+            self.connections.connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+        connection = self.connections.connection
+        headers = {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self) -> None:
+        """Stop the server"""
+        self.server.shutdown()
+        self.thread.join()
+
+
+def run_scenario(driver, method: str, path: str, forms: typing.List[dict], requests: int,
+                 warmup: int) -> typing.Dict[str, float]:
+    """Send `warmup` and then `requests` requests through a driver, split across its threads, and summarize the
+    measured ones"""
+    def send(indices: range) -> typing.Tuple[typing.List[float], int]:
+        latencies = []
+        errors = 0
+        for index in indices:
+            form = forms[index % len(forms)] if method == "POST" else None
+            start = time.perf_counter()
+            status = driver.send(method, path, form)
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+        return latencies, errors
+
+    def run(count: int) -> typing.Tuple[typing.List[float], int, float]:
+        shares = [range(worker, count, driver.concurrency) for worker in range(driver.concurrency)]
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=driver.concurrency) as executor:
+            results = list(executor.map(send, shares))
+        seconds = time.perf_counter() - start
+        return [latency for latencies, _ in results for latency in latencies], sum(errors for _, errors in results), \
+            seconds
+
+    run(warmup)
+    latencies, errors, seconds = run(requests)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {"requests": requests, "errors": errors, "throughput": requests / seconds,
+            "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "peak_rss_mb": peak_rss_mb()}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> typing.List[str]:
+    """List the metrics of the results that are more than `threshold` worse than in the baseline, as relative
+    change, skipping the drivers and scenarios the baseline does not have"""
+    regressions = []
+    for driver, scenarios in results.items():
+        for scenario, metrics in scenarios.items():
+            reference = baseline.get(driver, {}).get(scenario)
+            if reference is None:
+                continue
+            for metric, higher_is_better in METRICS.items():
+                change = metrics[metric] / reference[metric] - 1
+                if (-change if higher_is_better else change) > threshold:
+                    regressions.append("%s %s %s: %.3f -> %.3f (%+.1f%%)" % (driver, scenario, metric,
+                                                                             reference[metric], metrics[metric],
+                                                                             change * 100))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the serving path of the app")
+    parser.add_argument("--requests", type=int, default=1000, help="Number of measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="Number of requests sent before measuring")
+    parser.add_argument("--payloads", type=int, default=1000, help="Number of distinct /result payloads")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of threads sending to the WSGI server")
+    parser.add_argument("--drivers", nargs="+", default=["test_client", "wsgi"], choices=["test_client", "wsgi"])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--save", default=None, help="Save the results as a JSON baseline at this path")
+    parser.add_argument("--compare", default=None, help="Compare the results with the JSON baseline at this path")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative change of a metric beyond which it is flagged as a regression")
+    args = parser.parse_args()
+
+    # keep the load test away from the real database
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_load.db")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + db_path
+
+    from src.add_bodymeasurement import create_db  # pylint: disable=import-outside-toplevel
+    create_db(os.environ["SQLALCHEMY_DATABASE_URI"])
+    from app import app  # pylint: disable=import-outside-toplevel
+
+    forms = synthetic_forms(args.payloads)
+    results = {}
+    print("%-12s %-8s %12s %10s %10s %10s %10s %8s" % ("driver", "scenario", "requests/s", "p50 (ms)", "p95 (ms)",
+                                                       "p99 (ms)", "RSS (MB)", "errors"))
+    for name in args.drivers:
+        driver = FlaskClientDriver(app) if name == "test_client" else WSGIServerDriver(app, args.concurrency)
+        try:
+            results[name] = {}
+            for scenario in args.scenarios:
+                method, path = SCENARIOS[scenario]
+                metrics = run_scenario(driver, method, path, forms, args.requests, args.warmup)
+                results[name][scenario] = metrics
+                print("%-12s %-8s %12.1f %10.2f %10.2f %10.2f %10.1f %8d"
+                      % (name, scenario, metrics["throughput"], metrics["p50_ms"], metrics["p95_ms"],
+                         metrics["p99_ms"], metrics["peak_rss_mb"], metrics["errors"]))
+        finally:
+            driver.close()
+
+    if args.save is not None:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        settings = {key: value for key, value in vars(args).items() if key not in ("save", "compare", "threshold")}
+        with open(args.save, "w") as file:
+            json.dump({"settings": dict(settings, python=platform.python_version(), machine=platform.node()),
+                       "results": results}, file, indent=2)
+        print("Saved the baseline to %s" % args.save)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No metric is more than %.0f%% worse than the baseline" % (args.threshold * 100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Compare the metrics engine of the evaluate step against one scikit-learn call per metric.
+
+The scikit-learn version is what `model_evaluate` used to do: MSE, RMSE, MAPE and R squared, each call
+validating and converting the single column DataFrames again. Run from the root of the repository:
+
+    python -m benchmarks.bench_metrics --rows 10000 1000000 10000000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import sklearn.metrics
+
+from benchmarks.bench_artifact_io import best_of
+from src.metrics import compute_metrics, compute_metrics_chunks
+
+
+def sklearn_metrics(y_true: pd.DataFrame, y_pred: pd.DataFrame) -> dict:
+    """Compute the four metrics with four scikit-learn calls"""
+    mse = sklearn.metrics.mean_squared_error(y_true, y_pred)
+    return {"MSE": mse, "RMSE": mse ** 0.5,
+            "MAPE": sklearn.metrics.mean_absolute_percentage_error(y_true, y_pred),
+            "R-squared": sklearn.metrics.r2_score(y_true, y_pred)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the metrics engine of the evaluate step")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000, 10000000], help="Numbers of rows")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Number of rows per chunk")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of runs per measurement, the best is kept")
+    args = parser.parse_args()
+
+    print("%10s %16s %12s %12s %14s" % ("rows", "scikit-learn (s)", "engine (s)", "chunked (s)", "max rel diff"))
+    for rows in args.rows:
+        rng = np.random.default_rng(rows)
+        y_true = pd.DataFrame({"BodyFat": rng.normal(19., 8., rows)})
+        y_pred = pd.DataFrame(y_true["BodyFat"].to_numpy() + rng.normal(0., 2., rows))
+        expected, actual = sklearn_metrics(y_true, y_pred), compute_metrics(y_true, y_pred)
+        difference = max(abs(actual[name] / value - 1) for name, value in expected.items())
+
+        chunks = [(y_true[start:start + args.chunksize], y_pred[start:start + args.chunksize])
+                  for start in range(0, rows, args.chunksize)]
+        print("%10d %16.4f %12.4f %12.4f %14.1e" % (
+            rows, best_of(lambda: sklearn_metrics(y_true, y_pred), args.repeats),
+            best_of(lambda: compute_metrics(y_true, y_pred), args.repeats),
+            best_of(lambda: compute_metrics_chunks(chunks), args.repeats), difference))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare the startup time and memory of loading the exported .npz model against the pickled model.
+
+Every variant runs in a fresh interpreter, which imports what it needs and builds the scorer.
+Run from the root of the repository after `make train`:
+
+    python -m benchmarks.bench_model_load --repeats 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+PICKLE = """
+import pickle
+from src.linear_scorer import LinearScorer
+with open("models/scaler.sav", "rb") as f:
+    scaler = pickle.load(f)
+with open("models/Lasso.sav", "rb") as f:
+    model = pickle.load(f)
+scorer = LinearScorer.from_estimators(scaler, model)
+"""
+
+NPZ = """
+from src.model_artifact import load_linear_model
+scorer, _, _ = load_linear_model("models/bodyfat_model.npz")
+"""
+
+TEMPLATE = """
+import time
+start = time.perf_counter()
+{body}
+seconds = time.perf_counter() - start
+import json, resource, sys
+print(json.dumps({{"seconds": seconds, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "sklearn_imported": "sklearn" in sys.modules}}))
+"""
+
+
+def measure(body: str, repeats: int) -> dict:
+    """Run a loading snippet in fresh interpreters and collect its time and peak RSS"""
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", TEMPLATE.format(body=body)],
+                                check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {"seconds": float(np.median([run["seconds"] for run in runs])),
+            "max_rss_kb": int(np.median([run["max_rss_kb"] for run in runs])),
+            "sklearn_imported": runs[0]["sklearn_imported"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark loading the exported model against the pickles")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of fresh interpreters per variant")
+    args = parser.parse_args()
+
+    for label, body in [("pickle (scaler.sav + Lasso.sav)", PICKLE), ("npz (bodyfat_model.npz)", NPZ)]:
+        result = measure(body, args.repeats)
+        print("%-32s load: %7.1f ms  peak RSS: %7.1f MB  sklearn imported: %s"
+              % (label, result["seconds"] * 1000, result["max_rss_kb"] / 1024, result["sklearn_imported"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare the combined outlier mask against chaining `remove_outliers` once per rule.
+
+Both remove the same rows. The chained version copies the DataFrame for every rule, the rule engine
+evaluates every rule on NumPy arrays and copies the DataFrame once.
+Run from the root of the repository:
+
+    python -m benchmarks.bench_outlier_rules --rows 100000 1000000 --rules 1 4 8
+"""
+import argparse
+import time
+
+from benchmarks.bench_artifact_io import COLUMNS, synthetic_table
+from src.outlier_rules import OutlierRules
+from src.preprocess_data import remove_outliers
+
+MEASURED = [column for column in COLUMNS if column != "Density"]
+
+
+def range_rules(count: int, table) -> list:
+    """Build range rules on the first `count` measurement columns that each reject about 1% of the rows"""
+    rules = []
+    for column in MEASURED[:count]:
+        lower, upper = table[column].quantile([0.005, 0.995])
+        rules.append({"type": "range", "column": column, "minimum": lower, "maximum": upper})
+    return rules
+
+
+def best_of(function, repeats: int) -> float:
+    """Run a function several times and return its fastest wall time in seconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def chained(table, rules):
+    """Apply the rules one after the other with remove_outliers"""
+    for rule in rules:
+        table = remove_outliers(table, rule["column"], rule["minimum"], rule["maximum"])
+    return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the outlier rule engine")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000], help="Numbers of rows")
+    parser.add_argument("--rules", type=int, nargs="+", default=[1, 4, 8], help="Numbers of rules")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of runs per measurement, the best is kept")
+    args = parser.parse_args()
+
+    print("%10s %6s %12s %12s %16s" % ("rows", "rules", "chained (s)", "engine (s)", "engine ns/row/rule"))
+    for rows in args.rows:
+        table = synthetic_table(rows)
+        for count in args.rules:
+            rules = range_rules(count, table)
+            assert chained(table, rules).equals(OutlierRules(rules).apply(table))
+            chained_seconds = best_of(lambda: chained(table, rules), args.repeats)
+            engine_seconds = best_of(lambda: OutlierRules(rules).apply(table), args.repeats)
+            print("%10d %6d %12.4f %12.4f %16.2f" % (rows, count, chained_seconds, engine_seconds,
+                                                      engine_seconds / rows / count * 1e9))
+
+
+if __name__ == "__main__":
+    main()
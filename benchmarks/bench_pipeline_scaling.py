@@ -0,0 +1,188 @@
+"""Measure how every stage of the pipeline scales with the number of rows of the raw data.
+
+The raw data is drawn by `src/synthetic_data.py` from data/raw/bodyfat.csv, so it keeps the ranges and correlations
+of the real measurements. At every size the steps preprocess, get_features, train, predict and evaluate of `run.py`
+run one after the other, as `make cleaned features train predict evaluate` runs them, each in a fresh interpreter,
+with the paths of the configuration pointed at a temporary directory. For every stage the wall time, the peak RSS
+(VmHWM, which unlike ru_maxrss leaves out the memory of this process) and the bytes read and written (`rchar` and
+`wchar` of /proc/self/io, so reads served from the page cache count too, and so do the imports) are recorded.
+
+The report gives the scaling exponent of the time and peak RSS of every stage between consecutive sizes, the slope
+on a log-log scale: 1 is linear. The cost at the smallest size, which is mostly the imports, is subtracted first, so
+at least three sizes are needed. A stage is flagged as super-linear when its exponent between the two largest sizes
+exceeds 1 + `--tolerance`. The backend comparison is left out, and so is the bootstrap of evaluate, whose 2000
+replicates would dominate its time at the small sizes. With `--bootstrap`, evaluate runs a second time with the
+bootstrap of the configuration and is reported as the stage "bootstrap". Run from the root of the repository:
+
+    python -m benchmarks.bench_pipeline_scaling --rows 1000 10000 100000 1000000 10000000 \
+        --output data/artifacts/scaling_report.json
+
+10 million rows need about 1 GB for the raw CSV and a few GB more for the artifacts of the stages.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.synthetic_data import MeasurementGenerator
+
+STAGES = ["preprocess", "get_features", "train", "predict", "evaluate"]
+# Runs a stage of run.py, then saves its peak RSS and I/O counters as JSON to the path in argv[1]
+WRAPPER = """
+import atexit, json, os, resource, runpy, sys
+
+def save_usage(path=sys.argv[1]):
+    usage = {"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    usage["max_rss_kb"] = int(line.split()[1])
+    if os.path.exists("/proc/self/io"):
+        with open("/proc/self/io") as file:
+            counters = dict(line.split(": ") for line in file.read().splitlines())
+        usage.update(read_bytes=int(counters["rchar"]), written_bytes=int(counters["wchar"]))
+    else:
+        blocks = resource.getrusage(resource.RUSAGE_SELF)
+        usage.update(read_bytes=blocks.ru_inblock * 512, written_bytes=blocks.ru_oublock * 512)
+    with open(path, "w") as file:
+        json.dump(usage, file)
+
+atexit.register(save_usage)
+sys.argv = ["run.py"] + sys.argv[2:]
+runpy.run_path("run.py", run_name="__main__")
+"""
+
+
+def redirect_paths(config: typing.Any, directory: str) -> typing.Any:
+    """Point every path of a configuration at a directory, keeping the file names"""
+    if isinstance(config, dict):
+        return {key: os.path.join(directory, os.path.basename(value))
+                if isinstance(value, str) and key.endswith("path") else redirect_paths(value, directory)
+                for key, value in config.items()}
+    return config
+
+
+def run_stage(stage: str, config_path: str, usage_path: str, timeout: float) -> dict:
+    """Run a stage of run.py in a fresh interpreter and collect its wall time, peak RSS and I/O"""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", WRAPPER, usage_path, stage, "--config", config_path],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=timeout,
+                             check=False)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError("%s failed:\n%s" % (stage, "\n".join(process.stderr.splitlines()[-20:])))
+    with open(usage_path) as file:
+        usage = json.load(file)
+    return {"seconds": seconds, "peak_rss_mb": usage["max_rss_kb"] / 1024,
+            "read_mb": usage["read_bytes"] / 1e6, "written_mb": usage["written_bytes"] / 1e6}
+
+
+def scaling_exponents(rows: typing.Sequence[int], values: typing.Sequence[float]) -> typing.List[float]:
+    """Return the slope against the rows on a log-log scale, between consecutive sizes, of the values above the value
+    at the smallest size; NaN where the value did not grow"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exponents = np.diff(np.log(np.asarray(values[1:]) - values[0])) / np.diff(np.log(rows[1:]))
+    return [float(exponent) for exponent in exponents]
+
+
+def scaling_report(results: typing.Dict[str, typing.Dict[int, dict]], tolerance: float) -> dict:
+    """Compute the scaling exponents of the time and peak RSS of every stage and flag the super-linear ones"""
+    report = {}
+    for stage, sizes in results.items():
+        rows = sorted(sizes)
+        if len(rows) < 3:
+            continue
+        time_exponents = scaling_exponents(rows, [sizes[size]["seconds"] for size in rows])
+        memory_exponents = scaling_exponents(rows, [sizes[size]["peak_rss_mb"] for size in rows])
+        report[stage] = {"rows": rows, "time_exponents": time_exponents, "memory_exponents": memory_exponents,
+                         "super_linear_time": time_exponents[-1] > 1 + tolerance,
+                         "super_linear_memory": memory_exponents[-1] > 1 + tolerance}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark how the pipeline stages scale with the rows")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7],
+                        help="Numbers of rows of the synthetic raw data")
+    parser.add_argument("--config", default="config/config.yaml", help="Configuration of the stages")
+    parser.add_argument("--source", default="data/raw/bodyfat.csv", help="Real data the generator is fitted on")
+    parser.add_argument("--chunksize", type=int, default=1000000, help="Number of rows generated at once")
+    parser.add_argument("--timeout", type=float, default=3600,
+                        help="Seconds after which a stage is stopped and not run at larger sizes")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Exponent above 1 beyond which a stage is flagged as super-linear")
+    parser.add_argument("--bootstrap", action="store_true",
+                        help="Also time evaluate with the bootstrap of the configuration, reported separately")
+    parser.add_argument("--output", default=None, help="Save the measurements and the report as JSON")
+    args = parser.parse_args()
+
+    generator = MeasurementGenerator.fit(pd.read_csv(args.source))
+    with open(args.config) as file:
+        config = yaml.safe_load(file)
+    config["evaluate"]["compare_backends"] = None
+    bootstrap = config["evaluate"]["bootstrap"] if args.bootstrap else None
+    config["evaluate"]["bootstrap"] = None
+    # label of every run, the step of run.py and whether it uses the configuration with the bootstrap
+    runs = [(stage, stage, False) for stage in STAGES] + ([("bootstrap", "evaluate", True)] if bootstrap else [])
+
+    results = {label: {} for label, _, _ in runs}
+    stopped = set()
+    print("%10s %-13s %10s %14s %10s %13s" % ("rows", "stage", "time (s)", "peak RSS (MB)", "read (MB)",
+                                               "written (MB)"))
+    for rows in sorted(args.rows):
+        with tempfile.TemporaryDirectory() as directory:
+            stage_config = redirect_paths(config, directory)
+            stage_config["preprocess"]["load_path"] = os.path.join(directory, "bodyfat.csv")
+            config_path = os.path.join(directory, "config.yaml")
+            with open(config_path, "w") as file:
+                yaml.safe_dump(stage_config, file)
+            bootstrap_config_path = os.path.join(directory, "config_bootstrap.yaml")
+            with open(bootstrap_config_path, "w") as file:
+                yaml.safe_dump(dict(stage_config, evaluate=dict(stage_config["evaluate"], bootstrap=bootstrap)), file)
+            generator.write_csv(stage_config["preprocess"]["load_path"], rows, args.chunksize)
+
+            for label, stage, with_bootstrap in runs:
+                if stopped:
+                    print("%10d %-13s %10s" % (rows, label, "skipped"))
+                    continue
+                try:
+                    result = run_stage(stage, bootstrap_config_path if with_bootstrap else config_path,
+                                       os.path.join(directory, "usage.json"), args.timeout)
+                except subprocess.TimeoutExpired:
+                    # the later stages need the artifacts of this one
+                    stopped.add(label)
+                    print("%10d %-13s %10s" % (rows, label, "timed out"))
+                    continue
+                results[label][rows] = result
+                print("%10d %-13s %10.2f %14.1f %10.1f %13.1f" % (rows, label, result["seconds"],
+                                                                  result["peak_rss_mb"], result["read_mb"],
+                                                                  result["written_mb"]))
+
+    report = scaling_report(results, args.tolerance)
+    print("\nScaling exponents between consecutive sizes, 1 is linear")
+    for stage, scaling in report.items():
+        flags = [kind for kind in ("time", "memory") if scaling["super_linear_" + kind]]
+        print("%-13s time: %-40s memory: %-40s %s"
+              % (stage, " ".join("%.2f" % exponent for exponent in scaling["time_exponents"]),
+                 " ".join("%.2f" % exponent for exponent in scaling["memory_exponents"]),
+                 "SUPER-LINEAR " + ", ".join(flags) if flags else ""))
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump({"results": {stage: {str(rows): result for rows, result in sizes.items()}
+                                   for stage, sizes in results.items()},
+                       "report": report}, file, indent=2)
+        print("Report saved as %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare reading an artifact straight from S3 against downloading it first, as `run_s3.py download` does.
+
+S3 is the in-process moto stand-in, so the times leave out the network and mostly show the cost of going
+through the disk twice. The bytes fetched show what ranged reads save when only some columns are needed.
+Run from the root of the repository, with moto installed:
+
+    python -m benchmarks.bench_s3_read --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import moto
+
+from benchmarks.bench_artifact_io import synthetic_table
+from src import s3
+from src.artifact_io import artifact_path, read_table, write_table
+
+BUCKET = "bench-artifacts"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark streaming reads of s3:// artifacts")
+    parser.add_argument("--rows", type=int, default=1000000, help="Number of rows of the artifact")
+    args = parser.parse_args()
+
+    for variable in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        os.environ.setdefault(variable, "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    table = synthetic_table(args.rows)
+    columns = list(table.columns[:2])
+    fetched = []
+    with moto.mock_aws(), tempfile.TemporaryDirectory() as directory:
+        client = s3.get_client()
+        client.create_bucket(Bucket=BUCKET)
+        client.meta.events.register("after-call.s3.GetObject",
+                                    lambda http_response, **kwargs: fetched.append(
+                                        int(http_response.headers.get("Content-Length", 0))))
+
+        print("%-8s %-30s %10s %14s" % ("format", "method", "time (s)", "fetched (MB)"))
+        for fmt in ("csv", "parquet"):
+            s3path = "s3://%s/data/artifacts/%s" % (BUCKET, artifact_path("features.csv", fmt))
+            write_table(table, s3path)
+            local_path = os.path.join(directory, os.path.basename(s3path))
+            cases = [("download, then read", lambda: (s3.download_file_from_s3(local_path, s3path, force=True),
+                                                      read_table(local_path))),
+                     ("stream", lambda: read_table(s3path))]
+            if fmt == "parquet":
+                cases.append(("stream %d columns" % len(columns), lambda: read_table(s3path, columns=columns)))
+            for method, read in cases:
+                fetched.clear()
+                start = time.perf_counter()
+                read()
+                seconds = time.perf_counter() - start
+                print("%-8s %-30s %10.2f %14.1f" % (fmt, method, seconds, sum(fetched) / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare the peak memory and time of the in-memory and the chunked preprocess step as the raw data grows.
+
+Every run happens in a fresh interpreter, so its peak RSS only covers that run.
+Run from the root of the repository:
+
+    python -m benchmarks.bench_streaming_preprocess --rows 250000 1000000 4000000 --chunksize 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_artifact_io import synthetic_table
+
+TEMPLATE = """
+import json, resource, time
+from src.preprocess_data import preprocess_data
+config = {{"preprocess": {{"load_path": {load_path!r}, "save_path": {save_path!r}, "chunksize": {chunksize!r},
+                          "remove_outliers": {{"column_name": "BodyFat", "minimum": 5, "maximum": 50}}}}}}
+start = time.perf_counter()
+preprocess_data(config)
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+def measure(load_path: str, save_path: str, chunksize) -> dict:
+    """Preprocess the raw data in a fresh interpreter and collect its time and peak RSS"""
+    code = TEMPLATE.format(load_path=load_path, save_path=save_path, chunksize=chunksize)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the chunked preprocess step against the in-memory one")
+    parser.add_argument("--rows", type=int, nargs="+", default=[250000, 1000000, 4000000],
+                        help="Numbers of rows of the synthetic raw data")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Number of rows per chunk")
+    args = parser.parse_args()
+
+    print("%10s %10s %-10s %10s %14s" % ("rows", "size (MB)", "mode", "time (s)", "peak RSS (MB)"))
+    with tempfile.TemporaryDirectory() as directory:
+        load_path = os.path.join(directory, "bodyfat.csv")
+        for rows in args.rows:
+            # written in pieces, so that this process stays small: a child's peak RSS includes its parent's
+            # memory from before the exec
+            for seed, offset in enumerate(range(0, rows, args.chunksize)):
+                synthetic_table(min(args.chunksize, rows - offset), seed).to_csv(
+                    load_path, index=False, mode="w" if offset == 0 else "a", header=offset == 0)
+            size = os.path.getsize(load_path) / 2 ** 20
+            outputs = {}
+            for mode, chunksize in [("in-memory", None), ("chunked", args.chunksize)]:
+                outputs[mode] = os.path.join(directory, "cleaned_%s.csv" % mode)
+                result = measure(load_path, outputs[mode], chunksize)
+                print("%10d %10.1f %-10s %10.2f %14.1f" % (rows, size, mode, result["seconds"],
+                                                          result["max_rss_kb"] / 1024))
+            with open(outputs["in-memory"], "rb") as expected, open(outputs["chunked"], "rb") as actual:
+                if expected.read() != actual.read():
+                    print("%10d the chunked output differs from the in-memory output" % rows)
+
+
+if __name__ == "__main__":
+    main()
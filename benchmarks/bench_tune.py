@@ -0,0 +1,74 @@
+"""Compare the cross validated regularization path of the tune step against a loop of `model_train` calls.
+
+Both score the same alphas on the same folds. The loop fits every alpha of every fold from scratch,
+the path warm starts every fit from the previous alpha. The target is a sparse linear combination of
+synthetic body measurements plus noise. Run from the root of the repository:
+
+    python -m benchmarks.bench_tune --rows 252 20000 --n-alphas 100 --n-jobs 1 4
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.exceptions import ConvergenceWarning
+
+from benchmarks.bench_artifact_io import COLUMNS, synthetic_table
+from src.train_model import model_train
+from src.tune_model import alpha_grid, cross_validate_path
+
+FEATURES = [column for column in COLUMNS if column not in ("Density", "BodyFat")]
+
+
+def synthetic_problem(rows: int, seed: int = 0):
+    """Draw scaled features and a target that depends on a few of them"""
+    table = synthetic_table(rows, seed)[FEATURES]
+    x = (table - table.mean()) / table.std()
+    coef = np.zeros(len(FEATURES))
+    coef[[1, 5, 6, 12]] = [2., 6., -3., -1.5]
+    y = pd.Series(x.to_numpy() @ coef + 19 + np.random.default_rng(seed).normal(0, 4, rows), name="BodyFat")
+    return x, y
+
+
+def naive_search(x, y, alphas, n_splits, random_state):
+    """Score every alpha on every fold with an independent `model_train` call"""
+    from sklearn.model_selection import KFold
+
+    mse = np.zeros((n_splits, len(alphas)))
+    for fold, (train, test) in enumerate(KFold(n_splits, shuffle=True, random_state=random_state).split(x)):
+        for index, alpha in enumerate(alphas):
+            model = model_train(x.iloc[train], y.iloc[train], FEATURES, alpha, random_state)
+            mse[fold, index] = np.mean((model.predict(x.iloc[test][FEATURES]) - y.iloc[test]) ** 2)
+    mean = mse.mean(axis=0)
+    return alphas[np.argmin(mean)], mean
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the tune step against a loop of model_train calls")
+    parser.add_argument("--rows", type=int, nargs="+", default=[252, 20000], help="Numbers of rows")
+    parser.add_argument("--n-alphas", type=int, default=100, help="Number of alphas")
+    parser.add_argument("--n-splits", type=int, default=5, help="Number of folds")
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, 4], help="Numbers of processes of the path")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", ConvergenceWarning)
+
+    print("%8s %-12s %10s %12s %12s" % ("rows", "search", "time (s)", "best alpha", "best MSE"))
+    for rows in args.rows:
+        x, y = synthetic_problem(rows)
+        alphas = alpha_grid(x.to_numpy(), y.to_numpy(), n_alphas=args.n_alphas)
+
+        start = time.perf_counter()
+        alpha, mean = naive_search(x, y, alphas, args.n_splits, 1)
+        print("%8d %-12s %10.3f %12.5f %12.4f" % (rows, "model_train", time.perf_counter() - start, alpha,
+                                                 mean.min()))
+        for n_jobs in args.n_jobs:
+            start = time.perf_counter()
+            result = cross_validate_path(x, y, FEATURES, alphas=list(alphas), n_splits=args.n_splits,
+                                         random_state=1, n_jobs=n_jobs)
+            print("%8d %-12s %10.3f %12.5f %12.4f" % (rows, "path n_jobs=%d" % n_jobs, time.perf_counter() - start,
+                                                     result["alpha"], result["mse"]))
+
+
+if __name__ == "__main__":
+    main()
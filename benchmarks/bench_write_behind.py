@@ -0,0 +1,57 @@
+"""Compare the latency of add_user with a synchronous commit against the write-behind mode.
+
+Every statement sent to the SQLite database is delayed by `--db_latency_ms` to stand in for the
+round trip to RDS:
+
+    python -m benchmarks.bench_write_behind --n_users 200 --db_latency_ms 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import sqlalchemy
+
+from src.add_bodymeasurement import UserInputManager, create_db
+
+USER = dict(name="bench", age=22, weight=165., height=70., neck=30., chest=100., abdomen=85., hip=100.,
+            thigh=60., knee=80., ankle=23., biceps=35., forearm=25., wrist=18.)
+
+
+def run(manager: UserInputManager, n_users: int) -> np.ndarray:
+    """Time every add_user call"""
+    latencies = []
+    for _ in range(n_users):
+        start = time.perf_counter()
+        manager.add_user(**USER)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the write-behind mode of UserInputManager")
+    parser.add_argument("--n_users", type=int, default=200, help="Number of users to add")
+    parser.add_argument("--db_latency_ms", type=float, default=5, help="Delay added to every statement")
+    args = parser.parse_args()
+
+    engine_string = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    create_db(engine_string)
+
+    @sqlalchemy.event.listens_for(sqlalchemy.engine.Engine, "before_cursor_execute")
+    def delay(*_):
+        time.sleep(args.db_latency_ms / 1000)
+
+    for label, write_behind in [("synchronous commit", None), ("write-behind", {"batch_size": 100})]:
+        manager = UserInputManager(engine_string=engine_string, write_behind=write_behind)
+        latencies = run(manager, args.n_users)
+        start = time.perf_counter()
+        manager.close()
+        print("%-20s p50: %8.3f ms  p99: %8.3f ms  close: %8.1f ms"
+              % (label, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000,
+                 (time.perf_counter() - start) * 1000))
+    sqlalchemy.event.remove(sqlalchemy.engine.Engine, "before_cursor_execute", delay)
+
+
+if __name__ == "__main__":
+    main()
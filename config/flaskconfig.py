@@ -8,8 +8,36 @@ SQLALCHEMY_TRACK_MODIFICATIONS = True
 HOST = "0.0.0.0"
 SQLALCHEMY_ECHO = False  # If true, SQL for queries made will be printed
 MAX_ROWS_SHOW = 100
+# Model served by the app: the NumPy-only export written by `run.py train`, or a pickled model of any
+# type in src/model_backends.py such as "models/Lasso.sav" together with SCALER_PATH
+MODEL_PATH = os.environ.get("MODEL_PATH", "models/bodyfat_model.npz")
+SCALER_PATH = "models/scaler.sav"
+MODEL_RELOAD_INTERVAL = 5.0  # Seconds between checks for a retrained model, 0 disables hot reload
+MAX_BATCH_SIZE = 1000  # Maximum number of records accepted by /predict_batch
 SQLALCHEMY_TRACK_MODIFICATIONS = True
 
 SQLALCHEMY_DATABASE_URI = os.environ.get("SQLALCHEMY_DATABASE_URI")
 if SQLALCHEMY_DATABASE_URI is None:
     SQLALCHEMY_DATABASE_URI = "sqlite:///data/bodyfat.db"
+
+# Connection pool of the database engine shared by the app and run_rds.py. The queue settings
+# (pool_size, max_overflow, pool_timeout) are ignored for SQLite
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),  # Connections kept open per process
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),  # Extra connections allowed under load
+    "pool_timeout": 30,  # Seconds to wait for a free connection before giving up
+    "pool_recycle": 1800,  # Seconds after which a connection is replaced, below the RDS idle timeout
+    "pool_pre_ping": True,  # Test connections on checkout so that stale ones are replaced
+}
+
+# Write user inputs to the database from a background thread instead of inside /result
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "false").lower() == "true"
+WRITE_BEHIND_BATCH_SIZE = 100  # Maximum number of rows inserted at once
+WRITE_BEHIND_FLUSH_INTERVAL = 1.0  # Maximum number of seconds a row waits before it is inserted
+WRITE_BEHIND_QUEUE_SIZE = 10000  # Maximum number of rows waiting to be inserted
+WRITE_BEHIND_PUT_TIMEOUT = 0.5  # Number of seconds a request waits for room in a full queue
+
+# Cache of the predictions for repeated measurements, invalidated when the model files change
+PREDICTION_CACHE_SIZE = 10000  # Maximum number of cached predictions, 0 disables the cache
+PREDICTION_CACHE_TTL = 3600  # Number of seconds a cached prediction stays valid
+PREDICTION_CACHE_DECIMALS = 2  # Number of decimals the measurements are rounded to in the cache key
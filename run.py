@@ -1,30 +1,85 @@
-import logging.config
 import argparse
-import yaml
+import json
+import logging.config
+import subprocess
+import sys
 
-from src.preprocess_data import preprocess_data
-from src.generate_features import get_features
-from src.train_model import train
-from src.score_model import predict
-from src.evaulate_model import evaluate
+import yaml
 
 LOGGING_CONFIG = "config/logging/local.conf"
 logging.config.fileConfig(LOGGING_CONFIG, disable_existing_loggers=True)
 logger = logging.getLogger("run.py")
 
+# Module and function of every step. A step's module, and with it pandas and scikit-learn,
+# is only imported when the step runs
+STEPS = {"preprocess": ("src.preprocess_data", "preprocess_data"),
+         "get_features": ("src.generate_features", "get_features"),
+         "train": ("src.train_model", "train"),
+         "tune": ("src.tune_model", "tune"),
+         "predict": ("src.score_model", "predict"),
+         "evaluate": ("src.evaulate_model", "evaluate")}
+
+
+def profile_startup(step: str, config_path: str, output_path: str = None) -> int:
+    """Run a step in a fresh interpreter started with `-X importtime` and report the time of every import
+        Args:
+            step (`str`): The step to run
+            config_path (`str`): Path to configuration file
+            output_path (`str`): Path to save the import time profile as JSON
+        Returns:
+            returncode (`int`): Exit code of the step
+    """
+    from src.import_profiler import format_summary, parse_importtime, summarize_imports
+
+    process = subprocess.run([sys.executable, "-X", "importtime", __file__, step, "--config", config_path],
+                             stderr=subprocess.PIPE, text=True, check=False)
+    lines = process.stderr.splitlines()
+    for line in lines:
+        if not line.startswith("import time:"):
+            print(line, file=sys.stderr)
+
+    summary = summarize_imports(parse_importtime(lines))
+    print(format_summary(summary))
+    if output_path:
+        with open(output_path, "w") as file:
+            json.dump(dict(summary, step=step), file, indent=2)
+        logger.info("Import time profile saved as %s", output_path)
+
+    return process.returncode
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="pipeline for running body fat prediction model")
 
     parser.add_argument("step",
                         help="Which step to run",
-                        choices=["preprocess", "get_features", "train", "predict", "evaluate"])
+                        choices=list(STEPS) + ["all"])
 
     parser.add_argument("--config",
                         default="config/config.yaml",
                         help="Path to configuration file")
 
+    parser.add_argument("--no-cache",
+                        action="store_true",
+                        help="Run every stage of `all` even if its inputs and configuration are unchanged")
+
+    parser.add_argument("--no-persist",
+                        action="store_true",
+                        help="Keep the artifacts of `all` in the stage cache only, without writing them to the "
+                             "paths in the configuration")
+
+    parser.add_argument("--profile-startup",
+                        action="store_true",
+                        help="Report the import time of every module the step loads")
+
+    parser.add_argument("--profile-output",
+                        help="Path to save the import time profile as JSON, used with --profile-startup")
+
     args = parser.parse_args()
 
+    if args.profile_startup:
+        sys.exit(profile_startup(args.step, args.config, args.profile_output))
+
     with open(args.config, "r") as f:
         try:
             config = yaml.load(f, Loader=yaml.FullLoader)
@@ -33,13 +88,22 @@ if __name__ == "__main__":
         else:
             logger.info("Configuration file loaded from %s", args.config)
 
-    if args.step == "preprocess":
-        preprocess_data(config)
-    elif args.step == "get_features":
-        get_features(config)
-    elif args.step == "train":
-        train(config)
-    elif args.step == "predict":
-        predict(config)
-    elif args.step == "evaluate":
-        evaluate(config)
+    # s3:// paths only import boto3 when they are used, and so do their settings
+    s3_settings = (config.get("artifacts") or {}).get("s3") or {}
+    if any(s3_settings.values()):
+        from src import s3
+
+        s3.configure(**s3_settings)
+
+    if args.step == "all":
+        from src.pipeline import format_report, run_pipeline
+
+        cache_dir = None if args.no_cache else config.get("pipeline", {}).get("cache_dir")
+        _, report = run_pipeline(config, cache_dir=cache_dir, persist=not args.no_persist)
+        print(format_report(report))
+        sys.exit(0)
+
+    # __import__ rather than importlib.import_module, so that -X importtime attributes the step's imports to it
+    module_name, function_name = STEPS[args.step]
+    step_function = getattr(__import__(module_name, fromlist=[function_name]), function_name)
+    step_function(config)
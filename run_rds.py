@@ -1,8 +1,8 @@
 import argparse
 import logging.config
 
-from src.add_bodymeasurement import UserInputManager, create_db
-from config.flaskconfig import SQLALCHEMY_DATABASE_URI
+from src.add_bodymeasurement import UserInputManager, create_db, ingest_file
+from config.flaskconfig import SQLALCHEMY_DATABASE_URI, SQLALCHEMY_ENGINE_OPTIONS
 
 logging.config.fileConfig("config/logging/local.conf")
 logger = logging.getLogger("rds-pipeline")
@@ -36,15 +36,26 @@ if __name__ == "__main__":
     sb_ingest.add_argument("--wrist", help="App user's wrist circumstance in cm")
     sb_ingest.add_argument("--engine_string", default=SQLALCHEMY_DATABASE_URI,
                            help="SQLAlchemy connection URI for database")
+
+    # Sub-parser for ingesting a file of body measurements
+    sb_bulk = subparsers.add_parser("ingest_bulk", description="Add a CSV or JSON lines file of data to database")
+    sb_bulk.add_argument("--input_path", required=True,
+                         help="Path to a .csv or .jsonl file with one column per UserInputs column")
+    sb_bulk.add_argument("--chunksize", type=int, default=10000,
+                         help="Number of rows inserted per transaction")
+    sb_bulk.add_argument("--engine_string", default=SQLALCHEMY_DATABASE_URI,
+                         help="SQLAlchemy connection URI for database")
     args = parser.parse_args()
     sp_used = args.subparser_name
 
     if sp_used == "create_db":
-        create_db(args.engine_string)
+        create_db(args.engine_string, SQLALCHEMY_ENGINE_OPTIONS)
     elif sp_used == "ingest":
-        am = UserInputManager(engine_string=args.engine_string)
+        am = UserInputManager(engine_string=args.engine_string, engine_options=SQLALCHEMY_ENGINE_OPTIONS)
         am.add_user(args.name, args.age, args.height, args.weight, args.neck,
                     args.chest, args.abdomen, args.hip, args.thigh, args.knee,
                     args.ankle, args.biceps, args.forearm, args.wrist)
+    elif sp_used == "ingest_bulk":
+        ingest_file(args.engine_string, args.input_path, args.chunksize, SQLALCHEMY_ENGINE_OPTIONS)
     else:
         parser.print_help()
@@ -1,6 +1,6 @@
 import argparse
 import logging.config
-from src.s3 import download_file_from_s3, upload_file_to_s3
+from src.s3 import CHUNK_SIZE, MAX_CONCURRENCY, MAX_WORKERS, download_file_from_s3, sync_prefix, upload_file_to_s3
 
 logging.config.fileConfig("config/logging/local.conf")
 logger = logging.getLogger("s3-pipeline")
@@ -9,15 +9,30 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
 
     parser.add_argument("step", default="download",
-                        choices=["download", "upload"],
-                        help="'download' will download the data from S3. 'upload' will upload data to S3")
+                        choices=["download", "upload", "sync_download", "sync_upload"],
+                        help="'download' will download the data from S3. 'upload' will upload data to S3. "
+                             "'sync_download' and 'sync_upload' transfer every file of a directory or s3 prefix")
     parser.add_argument("--s3_path", default="s3://2022-msia-423-xu-ziru/raw/bodyfat.csv",
-                        help="s3 data path to download or upload data")
+                        help="s3 data path, or prefix to sync, to download or upload data")
     parser.add_argument("--local_path", default="data/raw/bodyfat.csv",
-                        help="local data path to store or upload data")
+                        help="local data path, or directory to sync, to store or upload data")
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE,
+                        help="part size in bytes of multipart transfers")
+    parser.add_argument("--max_concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="number of parts of a file transferred at the same time")
+    parser.add_argument("--max_workers", type=int, default=MAX_WORKERS,
+                        help="number of files transferred at the same time when syncing")
+    parser.add_argument("--force", action="store_true",
+                        help="transfer files even if they are unchanged")
+    parser.add_argument("--endpoint_url", default=None,
+                        help="URL of an S3 compatible service to use instead of AWS")
     args = parser.parse_args()
 
+    transfer_args = {"chunk_size": args.chunk_size, "max_concurrency": args.max_concurrency, "force": args.force,
+                     "endpoint_url": args.endpoint_url}
     if args.step == "download":
-        download_file_from_s3(args.local_path, args.s3_path)
+        download_file_from_s3(args.local_path, args.s3_path, **transfer_args)
     elif args.step == "upload":
-        upload_file_to_s3(args.local_path, args.s3_path)
+        upload_file_to_s3(args.local_path, args.s3_path, **transfer_args)
+    else:
+        sync_prefix(args.local_path, args.s3_path, args.step.split("_")[1], args.max_workers, **transfer_args)
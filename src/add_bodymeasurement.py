@@ -1,13 +1,23 @@
+import atexit
 import logging.config
+import queue
+import threading
+import time
 import typing
 
 import flask
 import sqlalchemy
 import sqlalchemy.orm
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, Float, String
+from sqlalchemy import Column, ForeignKey, Integer, Float, String
 from sqlalchemy.ext.declarative import declarative_base
 
+from src.db_engine import get_engine
+
+# pandas is only imported by the bulk ingestion functions, so that serving the app does not load it
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 Base: typing.Any = declarative_base()
@@ -38,16 +48,43 @@ class UserInput(Base):
         return f'User_id: {self.id}, age: {self.age}, weight: {self.weight}, height:{self.height}'
 
 
-def create_db(engine_string: str) -> None:
+class UserLabel(Base):
+    """Creates a data model for the body fat measured for a user input, which makes the input usable for training."""
+
+    __tablename__ = 'UserLabels'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_input_id = Column(Integer, ForeignKey('UserInputs.id'), unique=True, nullable=False)
+    body_fat = Column(Float, unique=False, nullable=False)
+
+    def __repr__(self):
+        return f'User_id: {self.user_input_id}, body_fat: {self.body_fat}'
+
+
+# Columns of the UserInputs table that can be ingested, required ones first
+REQUIRED_COLUMNS = ["name", "age", "weight", "height"]
+MEASUREMENT_COLUMNS = ["age", "weight", "height", "neck", "chest", "abdomen", "hip", "thigh",
+                       "knee", "ankle", "biceps", "forearm", "wrist"]
+
+
+class SharedEngineSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy extension that takes its engine from the shared engine factory."""
+
+    def create_engine(self, sa_url, engine_opts):
+        return get_engine(sa_url, **engine_opts)
+
+
+def create_db(engine_string: str, engine_options: typing.Optional[dict] = None) -> None:
     """Create database from provided engine string.
     Args:
         engine_string (str): SQLAlchemy engine string specifying which database
                              to write to
+        engine_options (dict): Keyword arguments of `sqlalchemy.create_engine`, e.g. pool settings
     Returns: None
     """
 
     try:
-        engine = sqlalchemy.create_engine(engine_string)
+        engine = get_engine(engine_string, **(engine_options or {}))
         Base.metadata.create_all(engine)
     except sqlalchemy.exc.ArgumentError:
         logger.error('%s is not a valid engine string', engine_string)
@@ -58,30 +95,184 @@ def create_db(engine_string: str) -> None:
         logger.info('Database created at %s', engine_string)
 
 
+class UserInputWriter:
+    """Writes user inputs to the database from a background thread in batches.
+
+    Rows are put on a bounded queue and a worker thread bulk inserts them once `batch_size` rows
+    are waiting or the oldest waiting row is `flush_interval` seconds old. When the queue is full,
+    `submit` blocks for up to `put_timeout` seconds and then raises `queue.Full`.
+    """
+
+    _STOP = object()
+
+    def __init__(self, engine: sqlalchemy.engine.Engine, batch_size: int = 100, flush_interval: float = 1.0,
+                 queue_size: int = 10000, put_timeout: float = 0.5):
+        """
+             Args:
+                engine (`sqlalchemy.engine.Engine`): Engine of the database to write to
+                batch_size (int): Maximum number of rows in one insert
+                flush_interval (float): Maximum number of seconds a row waits before it is written
+                queue_size (int): Maximum number of rows waiting to be written
+                put_timeout (float): Number of seconds `submit` waits for room in a full queue
+        """
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.failed = 0
+        self._listeners: typing.List[typing.Callable[[str], None]] = []
+
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="UserInputWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row: dict) -> None:
+        """Queues a row of the UserInputs table for writing
+        Args:
+            row (dict): Column values of the new row
+        Returns: None
+        """
+        if self._closed:
+            raise RuntimeError('The writer is closed')
+        try:
+            self.queue.put(row, timeout=self.put_timeout)
+        except queue.Full as e:
+            logger.error('The write queue is full, %d rows are waiting to be written', self.queue.qsize())
+            raise e
+
+    def add_listener(self, listener: typing.Callable[[str], None]) -> None:
+        """Register a function called from the worker thread for every row that could not be written
+        Args:
+            listener (callable): Function taking the name of the exception class of the failed insert
+        Returns: None
+        """
+        self._listeners.append(listener)
+
+    def flush(self) -> None:
+        """Blocks until every queued row has been written
+        Returns: None
+        """
+        self.queue.join()
+
+    def close(self) -> None:
+        """Writes the remaining rows and stops the worker thread
+        Returns: None
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(self._STOP)
+        self._thread.join()
+        logger.info('Write-behind stopped after writing %d rows (%d failed)', self.written, self.failed)
+
+    def _run(self) -> None:
+        batch: typing.List[dict] = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                row = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+
+            stop = row is self._STOP
+            if row is not None and not stop:
+                batch.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (stop or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+                deadline = None
+            if stop:
+                self.queue.task_done()
+                return
+
+    def _insert(self, rows: typing.List[dict]) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(UserInput.__table__.insert(), rows)
+
+    def _write(self, batch: typing.List[dict]) -> None:
+        try:
+            self._insert(batch)
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+            else:
+                # the rows come from different users, so a bad row must not cost the others theirs
+                logger.warning('Failed to write a batch of %d rows, writing them one at a time: %s', len(batch), e)
+                self._write_one_by_one(batch)
+        else:
+            self.written += len(batch)
+            logger.debug('Wrote a batch of %d rows to the database', len(batch))
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def _write_one_by_one(self, batch: typing.List[dict]) -> None:
+        for row in batch:
+            try:
+                self._insert([row])
+            except sqlalchemy.exc.SQLAlchemyError as e:
+                self._fail(row, e)
+            else:
+                self.written += 1
+
+    def _fail(self, row: dict, error: Exception) -> None:
+        self.failed += 1
+        logger.error('Failed to write the row %s to the database: %s', row, error)
+        for listener in self._listeners:
+            listener(type(error).__name__)
+
+
 class UserInputManager:
 
     def __init__(self, app: typing.Optional[flask.app.Flask] = None,
-                 engine_string: typing.Optional[str] = None):
+                 engine_string: typing.Optional[str] = None,
+                 write_behind: typing.Optional[dict] = None,
+                 engine_options: typing.Optional[dict] = None):
         """
              Args:
-                app (Flask): Flask app
+                app (Flask): Flask app, whose engine options are read from `SQLALCHEMY_ENGINE_OPTIONS`
                 engine_string (str): Engine string
+                write_behind (dict): Keyword arguments of `UserInputWriter`. If given, or if the app
+                                     config sets `WRITE_BEHIND`, `add_user` queues rows instead of
+                                     committing them in the calling thread
+                engine_options (dict): Keyword arguments of `sqlalchemy.create_engine` used with
+                                       `engine_string`, e.g. pool settings
         """
         if app:
-            self.database = SQLAlchemy(app)
+            self.database = SharedEngineSQLAlchemy(app)
             self.session = self.database.session
+            if write_behind is None and app.config.get("WRITE_BEHIND"):
+                write_behind = {"batch_size": app.config["WRITE_BEHIND_BATCH_SIZE"],
+                                "flush_interval": app.config["WRITE_BEHIND_FLUSH_INTERVAL"],
+                                "queue_size": app.config["WRITE_BEHIND_QUEUE_SIZE"],
+                                "put_timeout": app.config["WRITE_BEHIND_PUT_TIMEOUT"]}
         elif engine_string:
-            engine = sqlalchemy.create_engine(engine_string)
+            engine = get_engine(engine_string, **(engine_options or {}))
             session_maker = sqlalchemy.orm.sessionmaker(bind=engine)
             self.session = session_maker()
         else:
             raise ValueError(
                 'Need either an engine string or a Flask app to initialize')
 
+        self.writer = None
+        if write_behind is not None:
+            engine = self.database.get_engine(app) if app else self.session.get_bind()
+            self.writer = UserInputWriter(engine, **write_behind)
+            logger.info('Body measurements are written to the database in the background')
+
     def close(self) -> None:
-        """Closes SQLAlchemy session
+        """Closes SQLAlchemy session and flushes the rows waiting to be written
         Returns: None
         """
+        if self.writer is not None:
+            self.writer.close()
         self.session.close()
 
     def add_user(self, name: str, age: int, weight: float, height: float, neck: float = None,
@@ -107,6 +298,11 @@ class UserInputManager:
         Returns:
             None
         """
+        if self.writer is not None:
+            self.writer.submit(dict(name=name, age=age, weight=weight, height=height, neck=neck,
+                                    chest=chest, abdomen=abdomen, hip=hip, thigh=thigh, knee=knee,
+                                    ankle=ankle, biceps=biceps, forearm=forearm, wrist=wrist))
+            return
 
         try:
             session = self.session
@@ -121,3 +317,130 @@ class UserInputManager:
             raise e
         else:
             logger.info('The body measurement information is added to database')
+
+
+def validate_chunk(chunk: "pd.DataFrame") -> "pd.DataFrame":
+    """Keep the rows of a chunk of body measurements that can be added to the UserInputs table.
+    Rows are rejected if a required value is missing or if a measurement is not a positive number.
+    Args:
+        chunk (`pd.DataFrame`): Chunk of body measurements, one column per UserInputs column
+    Returns:
+        valid (`pd.DataFrame`): The valid rows with numeric measurements
+    """
+    chunk = chunk.rename(columns=str.lower)
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise KeyError('Missing required columns %s' % missing)
+
+    import pandas as pd
+
+    valid = chunk.reindex(columns=["name"] + MEASUREMENT_COLUMNS)
+    measurements = valid[MEASUREMENT_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    # a measurement is bad if it was given but is not a positive number
+    bad = (measurements.isna() & valid[MEASUREMENT_COLUMNS].notna()) | (measurements <= 0)
+    keep = ~bad.any(axis=1).to_numpy() & valid[REQUIRED_COLUMNS].notna().all(axis=1).to_numpy()
+
+    valid = measurements[keep]
+    valid.insert(0, 'name', chunk['name'][keep].astype(str))
+
+    return valid
+
+
+def ingest_file(engine_string: str, input_path: str, chunksize: int = 10000,
+                engine_options: typing.Optional[dict] = None) -> dict:
+    """Add body measurements from a CSV or JSON lines file to the UserInputs table.
+    The file is read in chunks and every chunk is inserted in its own transaction.
+    Args:
+        engine_string (str): SQLAlchemy engine string specifying which database to write to
+        input_path (str): Path to a `.csv` or `.jsonl` file of body measurements
+        chunksize (int): Number of rows read, validated and inserted at a time
+        engine_options (dict): Keyword arguments of `sqlalchemy.create_engine`, e.g. pool settings
+    Returns:
+        stats (dict): Number of rows read, inserted and rejected, seconds taken and rows per second
+    """
+    import pandas as pd
+
+    if input_path.endswith(('.jsonl', '.json')):
+        reader = pd.read_json(input_path, lines=True, chunksize=chunksize)
+    else:
+        reader = pd.read_csv(input_path, chunksize=chunksize)
+
+    engine = get_engine(engine_string, **(engine_options or {}))
+    table = UserInput.__table__
+    stats = {'read': 0, 'inserted': 0, 'rejected': 0}
+    start = time.perf_counter()
+    try:
+        for chunk in reader:
+            valid = validate_chunk(chunk)
+            # replace NaN by None so that missing measurements are stored as NULL
+            records = valid.astype(object).where(valid.notna(), None).to_dict('records')
+            if records:
+                with engine.begin() as connection:
+                    connection.execute(table.insert(), records)
+
+            stats['read'] += len(chunk)
+            stats['inserted'] += len(records)
+            stats['rejected'] += len(chunk) - len(records)
+            elapsed = time.perf_counter() - start
+            logger.info('Inserted %d of %d rows read (%.0f rows/sec)',
+                        stats['inserted'], stats['read'], stats['read'] / elapsed)
+    except FileNotFoundError as e:
+        logger.error('The file does not exist at %s', input_path)
+        raise e
+    except sqlalchemy.exc.OperationalError as e:
+        logger.error('Failed to connect to server. '
+                     'Please check if you are connected to Northwestern VPN')
+        raise e
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_second'] = stats['read'] / stats['seconds']
+    logger.info('Bulk ingestion of %s finished: %d rows inserted, %d rejected in %.2f seconds (%.0f rows/sec)',
+                input_path, stats['inserted'], stats['rejected'], stats['seconds'], stats['rows_per_second'])
+
+    return stats
+
+
+def read_user_inputs(engine_string: str, chunksize: int = 10000, since_id: int = 0, labeled: bool = False,
+                     columns: typing.Optional[typing.List[str]] = None,
+                     engine_options: typing.Optional[dict] = None) -> typing.Iterator["pd.DataFrame"]:
+    """Read the UserInputs table in chunks, in id order, through a server-side cursor.
+    On databases whose driver supports it (PostgreSQL, MySQL) the rows are streamed from the server
+    rather than buffered in the client, so memory use does not grow with the size of the table.
+    Args:
+        engine_string (str): SQLAlchemy engine string specifying which database to read from
+        chunksize (int): Number of rows fetched at a time
+        since_id (int): Watermark, only rows with a larger id are read. For labeled inputs this is the id of
+                        the label, so that inputs labeled after a run are still read by the next one
+        labeled (bool): Whether to only read the inputs with a body fat in the UserLabels table,
+                        which is added as the `body_fat` column, with the id of the label as `label_id`
+        columns (`list` of `str`): Measurement columns to read, all of them if None
+        engine_options (dict): Keyword arguments of `sqlalchemy.create_engine`, e.g. pool settings
+    Returns:
+        chunks (`iterator` of `pd.DataFrame`): The `id`, the measurements and the `body_fat` of the rows,
+                                               in order of the watermark
+    """
+    import pandas as pd
+
+    inputs = UserInput.__table__
+    selected = [inputs.c.id] + [inputs.c[column] for column in (columns or MEASUREMENT_COLUMNS)]
+    source, key = inputs, inputs.c.id
+    if labeled:
+        labels = UserLabel.__table__
+        selected += [labels.c.body_fat, labels.c.id.label('label_id')]
+        source, key = inputs.join(labels, labels.c.user_input_id == inputs.c.id), labels.c.id
+    query = sqlalchemy.select(selected).select_from(source).where(key > since_id).order_by(key)
+
+    engine = get_engine(engine_string, **(engine_options or {}))
+    try:
+        with engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(query)
+            names = list(result.keys())
+            while True:
+                rows = result.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=names)
+    except sqlalchemy.exc.OperationalError as e:
+        logger.error('Failed to connect to server. '
+                     'Please check if you are connected to Northwestern VPN')
+        raise e
@@ -0,0 +1,223 @@
+import collections
+import threading
+import time
+import typing
+
+import numpy as np
+
+# Upper bounds in seconds of the latency buckets, from 1 microsecond to about 2 minutes, 2 ** 0.25 apart, so a
+# quantile estimated from the buckets is within 19% of the true latency
+BUCKET_BOUNDS = np.array([1e-6 * 2 ** (index / 4) for index in range(109)])
+# Quantiles reported for every latency
+QUANTILES = (0.5, 0.9, 0.99)
+# Number of requests whose samples may wait for the next scrape before a request folds them into the histograms
+MAX_PENDING = 100000
+
+
+class LatencyHistogram:
+    """Counts latencies in fixed log-spaced buckets.
+
+    It is not thread safe, `AppMetrics` only updates it under its lock.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(len(BUCKET_BOUNDS) + 1, dtype=np.int64)
+        self.count = 0
+        self.sum = 0.
+
+    def observe(self, seconds: typing.Union[float, typing.Sequence[float]]) -> None:
+        """Record one or several latencies
+        Args:
+            seconds (float or `list` of float): The latencies in seconds
+        Returns:
+            None
+        """
+        seconds = np.atleast_1d(np.asarray(seconds, dtype=float))
+        self.counts += np.bincount(np.searchsorted(BUCKET_BOUNDS, seconds), minlength=len(self.counts))
+        self.count += len(seconds)
+        self.sum += float(seconds.sum())
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within the bucket that holds it
+        Args:
+            q (float): The quantile, between 0 and 1
+        Returns:
+            latency (float): The estimated latency in seconds, NaN if nothing was recorded
+        """
+        if self.count == 0:
+            return float("nan")
+
+        rank = q * self.count
+        cumulative = np.cumsum(self.counts)
+        index = min(int(np.searchsorted(cumulative, rank)), len(BUCKET_BOUNDS) - 1)
+        lower = BUCKET_BOUNDS[index - 1] if index > 0 else 0.
+        below = cumulative[index - 1] if index > 0 else 0
+        return float(lower + (BUCKET_BOUNDS[index] - lower) * (rank - below) / max(self.counts[index], 1))
+
+
+class PhaseTimer:
+    """Times the consecutive phases of a request, each `lap` records the time since the previous one."""
+
+    def __init__(self, metrics: "AppMetrics", endpoint: str):
+        """
+            Args:
+                metrics (`AppMetrics`): Metrics the phase latencies are recorded in
+                endpoint (str): Endpoint the phases belong to
+        """
+        self.samples = metrics.phase_samples
+        self.endpoint = endpoint
+        self.last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        """Record the time since the previous lap, or since the timer started, as the latency of a phase
+        Args:
+            phase (str): Name of the phase that just ended
+        Returns:
+            None
+        """
+        now = time.perf_counter()
+        self.samples.append((self.endpoint, phase, now - self.last))
+        self.last = now
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return ",".join('%s="%s"' % (name, _escape(value)) for name, value in labels.items())
+
+
+class AppMetrics:
+    """In-process request counters, latency histograms of requests and of their phases, database error counters
+    and the served model version, rendered in the Prometheus text format.
+
+    Recording a request or a phase only appends its raw sample to a deque, which is thread safe without a lock.
+    The samples are folded into the counters and histograms when the metrics are rendered, or by a request once
+    `MAX_PENDING` requests are waiting, so the request path never bins latencies. Every process keeps its own
+    metrics, as with the prediction cache.
+    """
+
+    def __init__(self, prefix: str = "bodyfat"):
+        """
+            Args:
+                prefix (str): Prefix of every metric name
+        """
+        self.prefix = prefix
+        self.request_samples = collections.deque()
+        self.phase_samples = collections.deque()
+        self.requests = collections.Counter()
+        self.db_errors = collections.Counter()
+        self.request_latency: typing.Dict[str, LatencyHistogram] = collections.defaultdict(LatencyHistogram)
+        self.phase_latency: typing.Dict[typing.Tuple[str, str], LatencyHistogram] = \
+            collections.defaultdict(LatencyHistogram)
+        self.model_version = None
+        self._lock = threading.Lock()
+
+    def observe_request(self, endpoint: str, method: str, status: int, seconds: float) -> None:
+        """Count a request and record its latency
+        Args:
+            endpoint (str): URL rule of the request
+            method (str): HTTP method
+            status (int): HTTP status code of the response
+            seconds (float): Time spent handling the request
+        Returns:
+            None
+        """
+        self.request_samples.append((endpoint, method, status, seconds))
+        if len(self.request_samples) > MAX_PENDING:
+            self.fold()
+
+    def timer(self, endpoint: str) -> PhaseTimer:
+        """Start timing the phases of a request
+        Args:
+            endpoint (str): URL rule of the request
+        Returns:
+            timer (`PhaseTimer`): Timer whose `lap` ends a phase
+        """
+        return PhaseTimer(self, endpoint)
+
+    def count_db_error(self, error: str) -> None:
+        """Count a failed database write
+        Args:
+            error (str): Kind of error, e.g. the name of the exception class
+        Returns:
+            None
+        """
+        with self._lock:
+            self.db_errors[error] += 1
+
+    def set_model_version(self, version: str) -> None:
+        """Record the version of the model that serves the predictions
+        Args:
+            version (str): Model version
+        Returns:
+            None
+        """
+        self.model_version = version
+
+    def fold(self) -> None:
+        """Move the pending samples into the counters and histograms
+        Returns:
+            None
+        """
+        with self._lock:
+            latencies = collections.defaultdict(list)
+            # popleft is atomic, samples appended meanwhile wait for the next fold
+            for _ in range(len(self.request_samples)):
+                endpoint, method, status, seconds = self.request_samples.popleft()
+                self.requests[(endpoint, method, status)] += 1
+                latencies[endpoint].append(seconds)
+            for endpoint, seconds in latencies.items():
+                self.request_latency[endpoint].observe(seconds)
+
+            latencies = collections.defaultdict(list)
+            for _ in range(len(self.phase_samples)):
+                endpoint, phase, seconds = self.phase_samples.popleft()
+                latencies[(endpoint, phase)].append(seconds)
+            for key, seconds in latencies.items():
+                self.phase_latency[key].observe(seconds)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format
+        Returns:
+            text (str): One line per sample, with HELP and TYPE lines for every metric
+        """
+        self.fold()
+        with self._lock:
+            return self._render()
+
+    def _render(self) -> str:
+        prefix = self.prefix
+        lines = ["# HELP %s_requests_total Requests handled, by endpoint, method and status" % prefix,
+                 "# TYPE %s_requests_total counter" % prefix]
+        lines += ["%s_requests_total{%s} %d" % (prefix, _labels(endpoint=endpoint, method=method, status=status),
+                                                count)
+                  for (endpoint, method, status), count in sorted(self.requests.items())]
+
+        for name, help_text, histograms in [
+                ("request_latency_seconds", "Latency of the requests, by endpoint",
+                 {(("endpoint", endpoint),): histogram for endpoint, histogram in self.request_latency.items()}),
+                ("phase_latency_seconds", "Latency of the phases of the requests, by endpoint and phase",
+                 {(("endpoint", endpoint), ("phase", phase)): histogram
+                  for (endpoint, phase), histogram in self.phase_latency.items()})]:
+            lines += ["# HELP %s_%s %s" % (prefix, name, help_text), "# TYPE %s_%s summary" % (prefix, name)]
+            for labels, histogram in sorted(histograms.items(), key=lambda item: item[0]):
+                labels = dict(labels)
+                for q in QUANTILES:
+                    lines.append("%s_%s{%s} %.9g" % (prefix, name, _labels(**labels, quantile=q),
+                                                     histogram.quantile(q)))
+                lines.append("%s_%s_sum{%s} %.9g" % (prefix, name, _labels(**labels), histogram.sum))
+                lines.append("%s_%s_count{%s} %d" % (prefix, name, _labels(**labels), histogram.count))
+
+        lines += ["# HELP %s_db_errors_total Failed database writes, by error" % prefix,
+                  "# TYPE %s_db_errors_total counter" % prefix]
+        lines += ["%s_db_errors_total{%s} %d" % (prefix, _labels(error=error), count)
+                  for error, count in sorted(self.db_errors.items())]
+
+        if self.model_version is not None:
+            lines += ["# HELP %s_model_info Version of the model serving the predictions" % prefix,
+                      "# TYPE %s_model_info gauge" % prefix,
+                      "%s_model_info{%s} 1" % (prefix, _labels(version=self.model_version))]
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,429 @@
+import contextlib
+import logging
+import os
+import shutil
+import typing
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# File extension of every supported artifact format
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+
+def artifact_format(path: str) -> str:
+    """Infer the format of an artifact from the extension of its path
+    Args:
+        path (`str`): Path of the artifact
+    Returns:
+        fmt (`str`): One of `FORMATS`
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    for fmt, fmt_extension in FORMATS.items():
+        if extension == fmt_extension:
+            return fmt
+    if extension in (".arrow", ".ipc"):
+        return "feather"
+    raise ValueError("Cannot infer the artifact format of %s, expected one of %s" % (path, list(FORMATS.values())))
+
+
+def artifact_path(path: str, fmt: typing.Optional[str] = None) -> str:
+    """Replace the extension of a path with the one of the artifact format
+    Args:
+        path (`str`): Path of the artifact as written in the configuration
+        fmt (`str`): One of `FORMATS`, None to keep the path unchanged
+    Returns:
+        path (`str`): Path with the extension of `fmt`
+    """
+    if fmt is None:
+        return path
+    if fmt not in FORMATS:
+        raise ValueError("Unsupported artifact format %s, expected one of %s" % (fmt, list(FORMATS)))
+
+    return os.path.splitext(path)[0] + FORMATS[fmt]
+
+
+def config_format(config: dict) -> typing.Optional[str]:
+    """Read the artifact format from the `artifacts` section of the configuration
+    Args:
+        config (`dict`): Dictionary of configurations
+    Returns:
+        fmt (`str`): Artifact format, None if the configuration does not set one
+    """
+    return (config.get("artifacts") or {}).get("format")
+
+
+def is_s3(path) -> bool:
+    """Check if a path is an s3:// URI
+    Args:
+        path: Path of a file, or a file object
+    Returns:
+        is_s3 (`bool`): True for an S3 object
+    """
+    return isinstance(path, str) and path.startswith("s3://")
+
+
+def open_file(path: str, mode: str = "rb") -> typing.IO:
+    """Open a local file, or stream an S3 object if the path is an s3:// URI
+    Args:
+        path (`str`): Local path or s3:// URI
+        mode (`str`): Mode of `open`, S3 objects only support "r", "rb", "w" and "wb"
+    Returns:
+        file (`:obj:`typing.IO`): The open file
+    """
+    if is_s3(path):
+        from src import s3
+
+        return s3.open_s3(path, mode)
+    return open(path, mode)
+
+
+def path_exists(path: str) -> bool:
+    """Check if a local file or an S3 object exists
+    Args:
+        path (`str`): Local path or s3:// URI
+    Returns:
+        exists (`bool`): Whether it exists
+    """
+    if is_s3(path):
+        from src import s3
+
+        return s3.exists(path)
+    return os.path.exists(path)
+
+
+def remove_file(path: str) -> None:
+    """Delete a local file or an S3 object, if it exists
+    Args:
+        path (`str`): Local path or s3:// URI
+    Returns:
+        None
+    """
+    if is_s3(path):
+        from src import s3
+
+        s3.remove(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+@contextlib.contextmanager
+def _path_or_file(path, mode: str = "rb", memory_map: bool = False):
+    """Pass a local path through to pandas and pyarrow, which open it themselves, or open an S3 object as a file.
+    With `memory_map`, a local file is memory-mapped instead."""
+    if is_s3(path):
+        with open_file(path, mode) as file:
+            yield file
+    elif memory_map:
+        import pyarrow
+
+        with pyarrow.memory_map(path) as source:
+            yield source
+    else:
+        yield path
+
+
+def write_table(data: typing.Union[pd.DataFrame, pd.Series], path: str, fmt: typing.Optional[str] = None,
+                compression: typing.Optional[str] = None) -> None:
+    """Write a DataFrame, without its index, as a CSV, Parquet or Feather (Arrow IPC) file
+    Args:
+        data (`:obj:`pd.DataFrame`): Data to write, a Series is written as a single column
+        path (`str`): The path to save the data
+        fmt (`str`): One of `FORMATS`, inferred from the extension of `path` if None
+        compression (`str`): Compression codec. Parquet defaults to snappy. Feather is written uncompressed
+                             by default so that it can be memory-mapped without decoding
+    Returns:
+        None
+    """
+    fmt = fmt or artifact_format(path)
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+
+    if fmt not in FORMATS:
+        raise ValueError("Unsupported artifact format %s, expected one of %s" % (fmt, list(FORMATS)))
+
+    try:
+        with _path_or_file(path, "w" if fmt == "csv" else "wb") as target:
+            if fmt == "csv":
+                data.to_csv(target, index=False)
+            elif fmt == "parquet":
+                data.to_parquet(target, index=False, compression=compression or "snappy")
+            else:
+                from pyarrow import Table, feather
+
+                feather.write_feather(Table.from_pandas(data, preserve_index=False), target,
+                                      compression=compression or "uncompressed")
+    except FileNotFoundError as e:
+        logger.error("The specified path %s does not exist", path)
+        raise e
+    else:
+        logger.debug("Wrote %s as %s, shape %s", path, fmt, str(data.shape))
+
+
+def read_table(path: typing.Union[str, typing.BinaryIO], fmt: typing.Optional[str] = None,
+               columns: typing.Optional[typing.List[str]] = None, memory_map: bool = True,
+               **csv_options) -> pd.DataFrame:
+    """Read a CSV, Parquet or Feather (Arrow IPC) file into a DataFrame
+    Args:
+        path (`str`): The path of the data, an s3:// URI, or a binary file object holding it
+        fmt (`str`): One of `FORMATS`, inferred from the extension of `path` if None
+        columns (`list` of `str`): Columns to read, all of them if None. Parquet and Feather skip the others
+                                   on disk
+        memory_map (`bool`): Whether to memory-map a Feather file instead of reading it into memory
+        **csv_options: Extra arguments of `pd.read_csv`, e.g. `header=None`
+    Returns:
+        data (`:obj:`pd.DataFrame`): The data
+    """
+    fmt = fmt or artifact_format(path)
+    if fmt not in FORMATS:
+        raise ValueError("Unsupported artifact format %s, expected one of %s" % (fmt, list(FORMATS)))
+
+    try:
+        with _path_or_file(path) as source:
+            if fmt == "csv":
+                data = pd.read_csv(source, usecols=columns, **csv_options)
+            elif fmt == "parquet":
+                data = pd.read_parquet(source, columns=columns)
+            else:
+                from pyarrow import feather
+
+                data = feather.read_table(source, columns=columns, memory_map=memory_map).to_pandas()
+    except FileNotFoundError as e:
+        logger.error("The specified path %s does not contain the file", path)
+        raise e
+
+    if columns is not None:
+        data = data[list(columns)]
+    logger.debug("Read %s as %s, shape %s", path, fmt, str(data.shape))
+
+    return data
+
+
+def count_rows(path: str, fmt: typing.Optional[str] = None) -> int:
+    """Count the rows of a CSV, Parquet or Feather file without loading it
+    Args:
+        path (`str`): The path of the data
+        fmt (`str`): One of `FORMATS`, inferred from the extension of `path` if None
+    Returns:
+        rows (`int`): Number of rows, not counting the header of a CSV file
+    """
+    fmt = fmt or artifact_format(path)
+    if fmt == "csv":
+        lines, last = 0, b"\n"
+        with open_file(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                lines += block.count(b"\n")
+                last = block[-1:]
+        # a last line without a trailing newline still holds a row
+        return max(lines + (last != b"\n") - 1, 0)
+    if fmt == "parquet":
+        from pyarrow import parquet
+
+        with _path_or_file(path) as source:
+            return parquet.ParquetFile(source).metadata.num_rows
+    if fmt == "feather":
+        import pyarrow
+
+        with _path_or_file(path, memory_map=True) as source:
+            reader = pyarrow.ipc.open_file(source)
+            return sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+    raise ValueError("Unsupported artifact format %s, expected one of %s" % (fmt, list(FORMATS)))
+
+
+def iter_table(path: str, chunksize: int, fmt: typing.Optional[str] = None,
+               columns: typing.Optional[typing.List[str]] = None, start: int = 0) -> typing.Iterator[pd.DataFrame]:
+    """Read a CSV, Parquet or Feather file in chunks of at most `chunksize` rows
+    Args:
+        path (`str`): The path of the data
+        chunksize (`int`): Maximum number of rows of a chunk
+        fmt (`str`): One of `FORMATS`, inferred from the extension of `path` if None
+        columns (`list` of `str`): Columns to read, all of them if None
+        start (`int`): Number of rows to skip. They are not parsed, and Parquet row groups and Feather
+                       record batches before `start` are not read at all
+    Returns:
+        chunks (`iterator` of `:obj:`pd.DataFrame`): The data, chunk by chunk, in file order
+    """
+    fmt = fmt or artifact_format(path)
+    if not path_exists(path):
+        logger.error("The specified path %s does not contain the file", path)
+        raise FileNotFoundError(path)
+
+    if fmt == "csv":
+        skiprows = range(1, start + 1) if start else None
+        with _path_or_file(path) as source:
+            for chunk in pd.read_csv(source, chunksize=chunksize, usecols=columns, skiprows=skiprows):
+                yield chunk if columns is None else chunk[list(columns)]
+    elif fmt == "parquet":
+        from pyarrow import parquet
+
+        with _path_or_file(path) as source:
+            file = parquet.ParquetFile(source)
+            row_groups, offset = [], 0
+            for index in range(file.num_row_groups):
+                rows = file.metadata.row_group(index).num_rows
+                if offset + rows > start:
+                    row_groups.append(index)
+                else:
+                    offset += rows
+            skip = start - offset
+            for batch in file.iter_batches(batch_size=chunksize, columns=columns, row_groups=row_groups):
+                if skip >= batch.num_rows:
+                    skip -= batch.num_rows
+                    continue
+                yield batch.slice(skip).to_pandas()
+                skip = 0
+    elif fmt == "feather":
+        import pyarrow
+
+        with _path_or_file(path, memory_map=True) as source:
+            reader = pyarrow.ipc.open_file(source)
+            skip = start
+            for index in range(reader.num_record_batches):
+                batch = reader.get_batch(index)
+                if skip >= batch.num_rows:
+                    skip -= batch.num_rows
+                    continue
+                for offset in range(skip, batch.num_rows, chunksize):
+                    chunk = batch.slice(offset, chunksize).to_pandas()
+                    yield chunk if columns is None else chunk[list(columns)]
+                skip = 0
+    else:
+        raise ValueError("Unsupported artifact format %s, expected one of %s" % (fmt, list(FORMATS)))
+
+
+class TableWriter:
+    """Writes a CSV, Parquet or Feather file chunk by chunk, so that the whole table never has to be in memory.
+
+    Every chunk must have the columns and dtypes of the first one. The result is the same file as
+    `write_table` of all chunks concatenated, apart from the Parquet row groups and Feather record batches.
+    In append mode the chunks are added after the rows already in the file. Parquet and Feather files
+    cannot grow in place, so their rows are copied batch by batch into a new file that replaces the old
+    one on `close`. An s3:// path is streamed as a multipart upload, and the object only changes on `close`,
+    so the rows already in it are copied the same way in every format.
+
+    A local file is written next to its path and only moved there by `close`, apart from a CSV file in append
+    mode, which grows in place. When the `with` block raises, `abort` leaves the file as it was before.
+    """
+
+    def __init__(self, path: str, fmt: typing.Optional[str] = None, compression: typing.Optional[str] = None,
+                 append: bool = False):
+        """
+            Args:
+                path (`str`): The path to save the data
+                fmt (`str`): One of `FORMATS`, inferred from the extension of `path` if None
+                compression (`str`): Compression codec, with the defaults of `write_table`
+                append (`bool`): Whether to keep the rows already in the file, if it exists
+        """
+        self.path = path
+        self.fmt = fmt or artifact_format(path)
+        if self.fmt not in FORMATS:
+            raise ValueError("Unsupported artifact format %s, expected one of %s" % (self.fmt, list(FORMATS)))
+        self.compression = compression
+        self.append = append and path_exists(path)
+        self.rows = 0
+        self.chunks = 0
+        self._schema = None
+        self._writer = None
+        self._file = None
+        # size of a local CSV file before the appended rows, the one file that grows in place
+        self._append_size = os.path.getsize(path) if self.append and self.fmt == "csv" and not is_s3(path) else None
+        self._write_path = path if is_s3(path) or self._append_size is not None else path + ".tmp"
+
+    def write(self, data: pd.DataFrame) -> None:
+        """Append a chunk to the file
+        Args:
+            data (`:obj:`pd.DataFrame`): Chunk to append, written without its index
+        Returns:
+            None
+        """
+        try:
+            if self.fmt == "csv" and is_s3(self.path):
+                if self._file is None:
+                    self._file = open_file(self.path, "w")
+                    if self.append:
+                        with open_file(self.path, "r") as old:
+                            shutil.copyfileobj(old, self._file)
+                data.to_csv(self._file, index=False, header=self.chunks == 0 and not self.append)
+            elif self.fmt == "csv":
+                first = self.chunks == 0 and not self.append
+                data.to_csv(self._write_path, index=False, mode="w" if first else "a", header=first)
+            else:
+                import pyarrow
+
+                if self._writer is None:
+                    self._open(pyarrow.Table.from_pandas(data, preserve_index=False).schema)
+                self._writer.write_table(pyarrow.Table.from_pandas(data, schema=self._schema, preserve_index=False))
+        except FileNotFoundError as e:
+            logger.error("The specified path %s does not exist", self.path)
+            raise e
+
+        self.rows += len(data)
+        self.chunks += 1
+
+    def _open(self, schema) -> None:
+        import pyarrow
+        from pyarrow import parquet
+
+        if self.append:
+            # the rows already in the file fix the schema of the appended ones
+            with _path_or_file(self.path, memory_map=self.fmt == "feather") as source:
+                if self.fmt == "parquet":
+                    schema = parquet.ParquetFile(source).schema_arrow
+                else:
+                    schema = pyarrow.ipc.open_file(source).schema
+        self._schema = schema
+
+        sink = self._write_path
+        if is_s3(self.path):
+            self._file = sink = open_file(self.path, "wb")
+        if self.fmt == "parquet":
+            self._writer = parquet.ParquetWriter(sink, schema, compression=self.compression or "snappy")
+        else:
+            options = pyarrow.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pyarrow.ipc.new_file(sink, schema, options=options)
+        if self.append:
+            for chunk in iter_table(self.path, 1 << 16, self.fmt):
+                self._writer.write_table(pyarrow.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+    def close(self) -> None:
+        """Finish the file
+        Returns:
+            None
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._write_path != self.path and os.path.exists(self._write_path):
+            os.replace(self._write_path, self.path)
+        logger.debug("Wrote %d rows in %d chunks to %s", self.rows, self.chunks, self.path)
+
+    def abort(self) -> None:
+        """Drop the rows written so far and leave the file as it was before
+        Returns:
+            None
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._file is not None:
+            self._file.abort()
+            self._file = None
+        if self._write_path != self.path and os.path.exists(self._write_path):
+            os.remove(self._write_path)
+        elif self._append_size is not None:
+            with open(self.path, "r+b") as file:
+                file.truncate(self._append_size)
+        logger.warning("Dropped the %d rows written to %s", self.rows, self.path)
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+import time
+import typing
+
+import sqlalchemy
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Options that only apply to a pool with a queue of connections
+QUEUE_POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout")
+
+_engines: typing.Dict[tuple, sqlalchemy.engine.Engine] = {}
+_lock = threading.Lock()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds = 0.
+        self.max_wait_seconds = 0.
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def get_engine(engine_string: typing.Union[str, sqlalchemy.engine.url.URL], **options) -> sqlalchemy.engine.Engine:
+    """Get the engine of a database, creating it on first use.
+    The same engine is returned for every call with the same engine string in a process, so all
+    entry points share one connection pool. A forked process creates its own engine.
+    Args:
+        engine_string (str): SQLAlchemy engine string specifying which database to connect to
+        **options: Keyword arguments of `sqlalchemy.create_engine`, e.g. `pool_size`, `max_overflow`,
+                   `pool_timeout`, `pool_recycle` and `pool_pre_ping`. Queue options are dropped unless
+                   the engine uses a `QueuePool`, which SQLite does not by default.
+    Returns:
+        engine (`sqlalchemy.engine.Engine`): Engine of the database
+    """
+    url = make_url(engine_string)
+    key = (os.getpid(), url)
+    with _lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            return engine
+
+        options = dict(options)
+        poolclass = options.get("poolclass")
+        if poolclass is None and url.get_backend_name() != "sqlite":
+            options["poolclass"] = poolclass = TimedQueuePool
+        if poolclass is None or not issubclass(poolclass, QueuePool):
+            for option in QUEUE_POOL_OPTIONS:
+                options.pop(option, None)
+
+        engine = sqlalchemy.create_engine(url, **options)
+        _engines[key] = engine
+        logger.info("Created engine for %r with pool %s", url, type(engine.pool).__name__)
+
+    return engine
+
+
+def pool_status(engine: sqlalchemy.engine.Engine) -> dict:
+    """Report the state of the connection pool of an engine
+    Args:
+        engine (`sqlalchemy.engine.Engine`): Engine created by `get_engine`
+    Returns:
+        status (dict): Pool class, size, checked in/out and overflow connections, and checkout wait times
+    """
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(),
+                      overflow=pool.overflow())
+    if isinstance(pool, TimedQueuePool):
+        status.update(checkouts=pool.checkouts, wait_seconds_total=pool.wait_seconds,
+                      wait_seconds_max=pool.max_wait_seconds)
+
+    return status
@@ -1,73 +1,97 @@
+import itertools
+import json
 import logging
+import pickle
+import time
+import typing
 
+import numpy as np
 import pandas as pd
-import sklearn
+
+from src.artifact_io import artifact_path, config_format, iter_table, open_file, read_table
+from src.metrics import bootstrap_metrics, compute_metrics, compute_metrics_chunks
+from src.model_backends import get_backend
 
 logger = logging.getLogger(__name__)
 
 
-def model_evaluate(y_test: pd.DataFrame, y_pred: pd.DataFrame, save_path: str) -> None:
+def model_evaluate(y_test: pd.DataFrame, y_pred: pd.DataFrame, save_path: typing.Optional[str] = None,
+                   n_features: typing.Optional[int] = None, bootstrap: typing.Optional[dict] = None) -> dict:
     """Evaluate performance of model
         Args:
             y_test (`pd.DataFrame`): y_test data
             y_pred (`pd.DataFrame`): Prediction results
-            save_path (`str`): The path to save evaluation results
+            save_path (`str`): The path to save evaluation results, None to keep them in memory only
+            n_features (`int`): Number of features of the model, for the adjusted R squared
+            bootstrap (`dict`): Arguments of `src.metrics.bootstrap_metrics`, e.g. `replicates` and
+                                `confidence`, None to skip the confidence intervals
         Returns:
-            None
+            metrics (`dict`): MSE, RMSE, MAE, MAPE, R squared and adjusted R squared on test, and their
+                              `confidence_intervals` if `bootstrap` is given
     """
-
-    # calculate the MSE
     try:
-        mean_squared_error = sklearn.metrics.mean_squared_error(y_test, y_pred)
-    except TypeError as e:
-        logger.error(e)
-        raise e
+        metrics = compute_metrics(y_test, y_pred, n_features)
     except ValueError as e:
         logger.error(e)
         raise e
     else:
-        logger.info("Successfully calculate the MSE. The MSE was %0.2f", mean_squared_error)
+        logger.info("Successfully calculate the metrics on %d rows: %s", len(y_test),
+                    ", ".join("%s %0.2f" % item for item in metrics.items()))
 
-    # calculate the RMSE
-    try:
-        rmse = sklearn.metrics.mean_squared_error(y_test, y_pred, squared=False)
-    except TypeError as e:
-        logger.error(e)
-    except ValueError as e:
-        logger.error(e)
-        raise e
-    else:
-        logger.info("Successfully calculate the RMSE. The RMSE was %0.2f", rmse)
+    if bootstrap:
+        metrics["confidence_intervals"] = bootstrap_metrics(y_test, y_pred, n_features, **bootstrap)
+        for name, (lower, upper) in metrics["confidence_intervals"].items():
+            logger.info("%s %0.3f, %g%% confidence interval [%0.3f, %0.3f]", name, metrics[name],
+                        bootstrap.get("confidence", 0.95) * 100, lower, upper)
 
-    # calculate the MAPE
-    try:
-        mean_absolute_percentage_error = sklearn.metrics.mean_absolute_percentage_error(y_test, y_pred)
-    except TypeError as e:
-        logger.error(e)
-    except ValueError as e:
-        logger.error(e)
-        raise e
-    else:
-        logger.info("Successfully calculate the MAPE. The MAPE was %0.2f", mean_absolute_percentage_error)
+    if save_path is not None:
+        save_metrics(metrics, save_path)
 
-    # calculate the R^2
-    try:
-        rsquared = sklearn.metrics.r2_score(y_test, y_pred)
-    except TypeError as e:
-        logger.error(e)
-    except ValueError as e:
-        logger.error(e)
-        raise e
-    else:
-        logger.info("Successfully calculate the R squared. The R squared was %0.2f", rsquared)
+    return metrics
+
+
+def evaluate_chunks(test_path: str, prediction_path: str, chunksize: int, n_features: typing.Optional[int] = None,
+                    fmt: typing.Optional[str] = None) -> dict:
+    """Evaluate performance of model on targets and predictions read in chunks, without loading them
+        Args:
+            test_path (`str`): The path of the y_test data
+            prediction_path (`str`): The path of the predictions, one per line
+            chunksize (`int`): Number of rows read at once
+            n_features (`int`): Number of features of the model, for the adjusted R squared
+            fmt (`str`): Artifact format of the y_test data, inferred from its extension if None
+        Returns:
+            metrics (`dict`): Output of `model_evaluate`, with the number of `rows` and `chunks`
+    """
+    def pairs():
+        try:
+            file = open_file(prediction_path, "r")
+        except FileNotFoundError as e:
+            logger.error("The file does not exist at the specified location %s", prediction_path)
+            raise e
+        with file:
+            predictions = pd.read_csv(file, header=None, chunksize=chunksize)
+            for y_true, y_pred in itertools.zip_longest(iter_table(test_path, chunksize, fmt), predictions):
+                if y_true is None or y_pred is None:
+                    raise ValueError("%s and %s do not have the same number of rows" % (test_path, prediction_path))
+                yield y_true, y_pred
 
-    # save the performance metrics
+    metrics = compute_metrics_chunks(pairs(), n_features)
+    logger.info("Successfully calculate the metrics on %d rows in %d chunks", metrics["rows"], metrics["chunks"])
+
+    return metrics
+
+
+def save_metrics(metrics: dict, save_path: str) -> None:
+    """Save the performance metrics as JSON
+        Args:
+            metrics (`dict`): Output of `model_evaluate`
+            save_path (`str`): The path to save evaluation results
+        Returns:
+            None
+    """
     try:
-        with open(save_path, "w") as file:
-            file.write("MSE on test: %0.3f \n" % mean_squared_error)
-            file.write("RMSE on test: %0.3f \n" % rmse)
-            file.write("MAPE on test: %0.3f \n" % mean_absolute_percentage_error)
-            file.write("R-squared on test: %0.3f \n" % rsquared)
+        with open_file(save_path, "w") as file:
+            json.dump(metrics, file, indent=2)
     except FileNotFoundError as e:
         logger.error("The specified path %s does not exist", save_path)
         raise e
@@ -78,6 +102,110 @@ def model_evaluate(y_test: pd.DataFrame, y_pred: pd.DataFrame, save_path: str) -
         logger.info("Successfully write and save the evaluation result as %s", save_path)
 
 
+def profile_backend(model_type: str, params: dict, x_train: pd.DataFrame, y_train: pd.DataFrame,
+                    x_test: pd.DataFrame, y_test: pd.DataFrame, scaler, initial_features: typing.List[str],
+                    random_state: typing.Optional[int] = None, batch_size: int = 1000, repeats: int = 200) -> dict:
+    """Train a model of one backend and measure its accuracy, training time and serving cost
+        Args:
+            model_type (`str`): Name of the backend, one of `src.model_backends.BACKENDS`
+            params (`dict`): Hyperparameters of the model
+            x_train (`pd.DataFrame`): Scaled features for training dataset
+            y_train (`pd.DataFrame`): True target values for training dataset
+            x_test (`pd.DataFrame`): Scaled features for testing dataset
+            y_test (`pd.DataFrame`): True target values for testing dataset
+            scaler (`sklearn.preprocessing.StandardScaler`): Scaler the features were scaled with
+            initial_features (`list` of `str`): List of features to train on
+            random_state (`int`): Random state to make model training reproducible
+            batch_size (`int`): Number of rows of the batch the throughput is measured on
+            repeats (`int`): Number of single row predictions the latency is measured on
+        Returns:
+            profile (`dict`): The backend and its parameters, its metrics on test as `model_evaluate` computes
+                              them, the training time in seconds, the median latency of a single row
+                              prediction in milliseconds and the batch throughput in rows per second
+    """
+    backend = get_backend(model_type)
+    start = time.perf_counter()
+    model = backend.fit(x_train[initial_features], y_train, random_state=random_state, **params)
+    fit_seconds = time.perf_counter() - start
+    metrics = model_evaluate(y_test, backend.predict(model, x_test[initial_features]),
+                             n_features=len(initial_features))
+
+    # the web app scores raw measurements with the scaler folded in, so the serving cost is measured on those
+    scorer = backend.scorer(model, scaler)
+    raw = x_test[initial_features].to_numpy(dtype=float) * scaler.scale_ + scaler.mean_
+    rows = raw.tolist()
+    latencies = []
+    for index in range(repeats):
+        start = time.perf_counter()
+        scorer.predict_one(rows[index % len(rows)])
+        latencies.append(time.perf_counter() - start)
+    batch = np.resize(raw, (batch_size, raw.shape[1]))
+    batch_seconds = []
+    for _ in range(3):
+        start = time.perf_counter()
+        scorer.predict(batch)
+        batch_seconds.append(time.perf_counter() - start)
+
+    profile = dict(model_type=model_type, params=params, fit_seconds=fit_seconds, **metrics,
+                   latency_ms=float(np.median(latencies)) * 1e3,
+                   throughput_rows_per_second=batch_size / min(batch_seconds))
+    logger.info("%s trained in %.3f s, %.3f ms per row, %.0f rows/s in batches", model_type, fit_seconds,
+                profile["latency_ms"], profile["throughput_rows_per_second"])
+
+    return profile
+
+
+def compare_backends(backends: dict, x_train: pd.DataFrame, y_train: pd.DataFrame, x_test: pd.DataFrame,
+                     y_test: pd.DataFrame, scaler, initial_features: typing.List[str],
+                     random_state: typing.Optional[int] = None, batch_size: int = 1000,
+                     repeats: int = 200) -> typing.List[dict]:
+    """Profile several backends on the same train and test split
+        Args:
+            backends (`dict`): Hyperparameters of the model of every backend to compare, by backend name
+            x_train, y_train, x_test, y_test, scaler, initial_features, random_state, batch_size, repeats:
+                see `profile_backend`
+        Returns:
+            profiles (`list` of `dict`): Output of `profile_backend` for every backend
+    """
+    return [profile_backend(model_type, dict(params or {}), x_train, y_train, x_test, y_test, scaler,
+                            initial_features, random_state, batch_size, repeats)
+            for model_type, params in backends.items()]
+
+
+def format_comparison(profiles: typing.List[dict]) -> str:
+    """Format the profiles of the backends as a table
+        Args:
+            profiles (`list` of `dict`): Output of `compare_backends`
+        Returns:
+            table (`str`): One line per backend
+    """
+    lines = ["%-12s %8s %8s %8s %12s %14s %18s" % ("model_type", "RMSE", "MAPE", "R2", "fit (s)",
+                                                   "latency (ms)", "batch (rows/s)")]
+    for profile in profiles:
+        lines.append("%-12s %8.3f %8.3f %8.3f %12.4f %14.4f %18.0f" % (
+            profile["model_type"], profile["RMSE"], profile["MAPE"], profile["R-squared"], profile["fit_seconds"],
+            profile["latency_ms"], profile["throughput_rows_per_second"]))
+    return "\n".join(lines)
+
+
+def save_comparison(profiles: typing.List[dict], save_path: str) -> None:
+    """Save the profiles of the backends as JSON
+        Args:
+            profiles (`list` of `dict`): Output of `compare_backends`
+            save_path (`str`): The path to save the profiles
+        Returns:
+            None
+    """
+    try:
+        with open_file(save_path, "w") as file:
+            json.dump(profiles, file, indent=2)
+    except FileNotFoundError as e:
+        logger.error("The specified path %s does not exist", save_path)
+        raise e
+    else:
+        logger.info("Successfully save the backend comparison as %s", save_path)
+
+
 def evaluate(config: dict) -> None:
     """ Evaluate performance of model
              Args:
@@ -86,27 +214,61 @@ def evaluate(config: dict) -> None:
              Returns:
                 None
     """
-    # load y_test data
-    try:
-        load_path = config["evaluate"]["test_path"]
-        y_test = pd.read_csv(load_path)
-    except FileNotFoundError as e:
-        logger.error("The file does not exist at the specified location %s", load_path)
-        raise e
-    else:
-        logger.info("Successfully load the y_test data from %s", load_path)
-        logger.debug("The shape of y_test is %s", str(y_test.shape))
+    fmt = config_format(config)
+    load_path = artifact_path(config["evaluate"]["test_path"], fmt)
+    prediction_path = config["evaluate"]["prediction_path"]
+    n_features = len(config["train"]["model_train"]["initial_features"])
 
-    # load predictions
-    try:
-        prediction_path = config["evaluate"]["prediction_path"]
-        y_pred = pd.read_csv(prediction_path, header=None)
-    except FileNotFoundError as e:
-        logger.error("The file does not exist at the specified location %s", prediction_path)
-        raise e
+    # evaluate chunk by chunk, for predictions that do not fit in memory
+    if config["evaluate"].get("chunksize"):
+        if config["evaluate"].get("bootstrap"):
+            raise ValueError("evaluate.bootstrap resamples the predictions in memory and cannot be combined "
+                             "with evaluate.chunksize")
+        metrics = evaluate_chunks(load_path, prediction_path, config["evaluate"]["chunksize"], n_features)
+        save_metrics(metrics, config["evaluate"]["save_path"])
+        y_test = None
     else:
-        logger.info("Successfully load the class prediction from %s", prediction_path)
-        logger.debug("The shape of class prediction is %s", str(y_pred.shape))
+        # load y_test data
+        try:
+            y_test = read_table(load_path)
+        except FileNotFoundError as e:
+            logger.error("The file does not exist at the specified location %s", load_path)
+            raise e
+        else:
+            logger.info("Successfully load the y_test data from %s", load_path)
+            logger.debug("The shape of y_test is %s", str(y_test.shape))
+
+        # load predictions
+        try:
+            y_pred = read_table(prediction_path, "csv", header=None)
+        except FileNotFoundError as e:
+            logger.error("The file does not exist at the specified location %s", prediction_path)
+            raise e
+        else:
+            logger.info("Successfully load the class prediction from %s", prediction_path)
+            logger.debug("The shape of class prediction is %s", str(y_pred.shape))
+
+        # evaluate model
+        model_evaluate(y_test, y_pred, config["evaluate"]["save_path"], n_features,
+                       config["evaluate"].get("bootstrap"))
 
-    # evaluate model
-    model_evaluate(y_test, y_pred, config["evaluate"]["save_path"])
+    # compare the training time and serving cost of other backends on the same split
+    compare = config["evaluate"].get("compare_backends")
+    if compare:
+        fmt = config_format(config)
+        try:
+            x_train, y_train, x_test = [read_table(artifact_path(compare[key], fmt))
+                                        for key in ("x_train_path", "y_train_path", "x_test_path")]
+            with open_file(compare["scaler_path"], "rb") as file:
+                scaler = pickle.load(file)
+        except FileNotFoundError as e:
+            logger.error("The train and test data or the scaler do not exist, run train first")
+            raise e
+        if y_test is None:
+            y_test = read_table(load_path)
+        profiles = compare_backends(compare["backends"], x_train, y_train, x_test, y_test, scaler,
+                                    config["train"]["model_train"]["initial_features"],
+                                    config["train"]["model_train"].get("random_state"),
+                                    compare.get("batch_size", 1000), compare.get("repeats", 200))
+        logger.info("Comparison of the model backends:\n%s", format_comparison(profiles))
+        save_comparison(profiles, compare["save_path"])
@@ -1,10 +1,16 @@
+import hashlib
+import json
 import logging
 import pickle
+import time
 import typing
 
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 
+from src.artifact_io import (TableWriter, artifact_path, config_format, iter_table, open_file, read_table,
+                             write_table)
+
 logger = logging.getLogger(__name__)
 
 
@@ -49,14 +55,14 @@ def extract_target(data: pd.DataFrame, target_column: str) -> pd.DataFrame:
     return target
 
 
-def scale_feature(feature: pd.DataFrame, scaler_path: str) -> pd.DataFrame:
-    """ Extract features from dataframe
+def fit_scaler(feature: pd.DataFrame) -> typing.Tuple[pd.DataFrame, StandardScaler]:
+    """ Fit a standard scaler on the features and scale them
     Args:
        feature (`:obj:`pd.DataFrame`): The feature dataframe
-       scaler_path (`str`): The path to save the scaler
 
     Returns:
        scaled_feature (`:obj:`pd.DataFrame`): The scaled feature dataframe
+       scaler (`sklearn.preprocessing.StandardScaler`): The fitted scaler
     """
     # standardize features
     scaler = StandardScaler()
@@ -69,16 +75,40 @@ def scale_feature(feature: pd.DataFrame, scaler_path: str) -> pd.DataFrame:
         logger.info("Successfully scale features")
 
     # convert to dataframe
-    scaled_feature_df = pd.DataFrame(scaled_feature, columns=feature.columns)
+    return pd.DataFrame(scaled_feature, columns=feature.columns), scaler
+
 
+def save_scaler(scaler: StandardScaler, scaler_path: str) -> None:
+    """ Save the fitted scaler to the specified path
+    Args:
+       scaler (`sklearn.preprocessing.StandardScaler`): The fitted scaler
+       scaler_path (`str`): The path to save the scaler
+
+    Returns:
+       None
+    """
     # save the scaler at the scaler_path
     try:
-        pickle.dump(scaler, open(scaler_path, "wb"))
-    except FileNotFoundError as e:
+        with open_file(scaler_path, "wb") as file:
+            pickle.dump(scaler, file)
+    except FileNotFoundError:
         logger.error("The specified path %s does not exist", scaler_path)
     else:
         logger.info("Successfully save the scaler as %s", scaler_path)
 
+
+def scale_feature(feature: pd.DataFrame, scaler_path: str) -> pd.DataFrame:
+    """ Extract features from dataframe
+    Args:
+       feature (`:obj:`pd.DataFrame`): The feature dataframe
+       scaler_path (`str`): The path to save the scaler
+
+    Returns:
+       scaled_feature (`:obj:`pd.DataFrame`): The scaled feature dataframe
+    """
+    scaled_feature_df, scaler = fit_scaler(feature)
+    save_scaler(scaler, scaler_path)
+
     return scaled_feature_df
 
 
@@ -86,14 +116,14 @@ def save_data(data: pd.DataFrame, save_path: str) -> None:
     """ Save data to the specified path
      Args:
         data (`:obj:`pd.DataFrame`): Cleaned dataframe
-        save_path (`str`): The path to save the cleaned data
+        save_path (`str`): The path to save the cleaned data, its extension selects the format
 
      Returns:
         None
     """
     # save the data to the save_path
     try:
-        data.to_csv(save_path, index=False)
+        write_table(data, save_path)
     except FileNotFoundError as e:
         logger.error("The specified path %s does not exist", save_path)
         raise e
@@ -102,18 +132,187 @@ def save_data(data: pd.DataFrame, save_path: str) -> None:
         logger.debug("The shape of the data is %s", str(data.shape))
 
 
-def get_features(config: dict) -> pd.DataFrame:
+def load_scaler_state(scaler_path: str, state_path: str, features_column: typing.List[str]) \
+        -> typing.Tuple[typing.Optional[StandardScaler], int, typing.Optional[str]]:
+    """ Load an incrementally fitted scaler, the number of rows it has seen and their fingerprint
+    Args:
+       scaler_path (`str`): The path of the pickled scaler
+       state_path (`str`): The path of the JSON state saved next to the scaler
+       features_column (`list` of `str`): Column names for features, the state is discarded if they changed
+
+    Returns:
+       scaler (`sklearn.preprocessing.StandardScaler`): The scaler, None if there is no usable state
+       rows (`int`): Number of rows of the cleaned data already folded into the scaler
+       fingerprint (`str`): Hash of the features of those rows, None if the state has none
+    """
+    try:
+        with open_file(state_path, "r") as file:
+            state = json.load(file)
+        with open_file(scaler_path, "rb") as file:
+            scaler = pickle.load(file)
+    except FileNotFoundError:
+        logger.info("No scaler state at %s, fitting the scaler from scratch", state_path)
+        return None, 0, None
+
+    if state.get("features_column") != list(features_column):
+        logger.info("The features changed since the scaler state was saved, fitting the scaler from scratch")
+        return None, 0, None
+
+    return scaler, state["rows"], state.get("fingerprint")
+
+
+def _row_hashes(chunk: pd.DataFrame) -> bytes:
+    # as floats, so that a column parsed as integers in one chunk and as floats in another hashes the same
+    return pd.util.hash_pandas_object(chunk.astype(float), index=False).values.tobytes()
+
+
+def update_scaler(scaler: typing.Optional[StandardScaler], load_path: str, features_column: typing.List[str],
+                  rows: int, chunksize: int, fingerprint: typing.Optional[str] = None) \
+        -> typing.Tuple[StandardScaler, int, str]:
+    """ Fold the rows of the cleaned data past the watermark into the running mean and variance of a scaler
+
+    The rows before the watermark are hashed and compared with `fingerprint`. If the cleaned data was rebuilt
+    rather than appended to, e.g. by rerunning preprocess on the raw file, they no longer match even when the
+    number of rows did not shrink, and the scaler is fitted from scratch.
+    Args:
+       scaler (`sklearn.preprocessing.StandardScaler`): Scaler fitted on the first `rows` rows, None to start over
+       load_path (`str`): The path of the cleaned data
+       features_column (`list` of `str`): Column names for features
+       rows (`int`): Watermark, the number of rows already folded into the scaler
+       chunksize (`int`): Number of rows read at a time
+       fingerprint (`str`): Fingerprint of the first `rows` rows returned by the previous update, the scaler is
+                            fitted from scratch if None
+
+    Returns:
+       scaler (`sklearn.preprocessing.StandardScaler`): The updated scaler
+       rows (`int`): The new watermark
+       fingerprint (`str`): Fingerprint of the rows up to the new watermark
+    """
+    if scaler is None or fingerprint is None:
+        if scaler is not None:
+            logger.warning("The scaler state has no fingerprint of the rows it has seen, fitting it from scratch")
+        scaler, rows = StandardScaler(), 0
+
+    digest = hashlib.sha256()
+    seen = 0
+    verified = rows == 0
+    for chunk in iter_table(load_path, chunksize, columns=features_column):
+        old = chunk.iloc[:max(rows - seen, 0)]
+        digest.update(_row_hashes(old))
+        if not verified and seen + len(old) == rows:
+            verified = digest.hexdigest() == fingerprint
+            if not verified:
+                break
+        new = chunk.iloc[len(old):]
+        if len(new):
+            scaler.partial_fit(new)
+            digest.update(_row_hashes(new))
+        seen += len(chunk)
+
+    if not verified:
+        # the cleaned data was rebuilt rather than appended to, the running statistics no longer apply
+        logger.warning("The first %d rows of the cleaned data changed since the scaler saw them, fitting it "
+                       "from scratch", rows)
+        return update_scaler(None, load_path, features_column, 0, chunksize)
+    logger.info("Folded %d new rows into the scaler, which has now seen %d", seen - rows, seen)
+
+    return scaler, seen, digest.hexdigest()
+
+
+def save_scaler_state(scaler: StandardScaler, scaler_path: str, state_path: str,
+                      features_column: typing.List[str], rows: int, fingerprint: str) -> None:
+    """ Save an incrementally fitted scaler together with its watermark
+    Args:
+       scaler (`sklearn.preprocessing.StandardScaler`): The scaler
+       scaler_path (`str`): The path to save the scaler
+       state_path (`str`): The path to save the JSON state
+       features_column (`list` of `str`): Column names for features
+       rows (`int`): Number of rows of the cleaned data folded into the scaler
+       fingerprint (`str`): Fingerprint of those rows, see `update_scaler`
+
+    Returns:
+       None
+    """
+    save_scaler(scaler, scaler_path)
+    try:
+        with open_file(state_path, "w") as file:
+            json.dump({"rows": rows, "fingerprint": fingerprint, "features_column": list(features_column)}, file)
+    except FileNotFoundError as e:
+        logger.error("The specified path %s does not exist", state_path)
+        raise e
+    else:
+        logger.info("Successfully save the scaler state as %s", state_path)
+
+
+def transform_chunks(scaler: StandardScaler, load_path: str, features_column: typing.List[str],
+                     target_column: str, feature_path: str, target_path: str, chunksize: int) -> int:
+    """ Scale the features and extract the target of the cleaned data chunk by chunk
+    Args:
+       scaler (`sklearn.preprocessing.StandardScaler`): The fitted scaler
+       load_path (`str`): The path of the cleaned data
+       features_column (`list` of `str`): Column names for features
+       target_column (`str`): Column name for target
+       feature_path (`str`): The path to save the scaled features
+       target_path (`str`): The path to save the target
+       chunksize (`int`): Number of rows read at a time
+
+    Returns:
+       rows (`int`): Number of rows written
+    """
+    with TableWriter(feature_path) as feature_writer, TableWriter(target_path) as target_writer:
+        for chunk in iter_table(load_path, chunksize, columns=list(features_column) + [target_column]):
+            features = extract_features(chunk, features_column)
+            feature_writer.write(pd.DataFrame(scaler.transform(features), columns=features.columns))
+            target_writer.write(extract_target(chunk, target_column).to_frame())
+    logger.info("Successfully save %d rows of scaled features as %s and target as %s", feature_writer.rows,
+                feature_path, target_path)
+
+    return feature_writer.rows
+
+
+def get_features_incremental(config: dict) -> StandardScaler:
+    """ Update the scaler with the rows added to the cleaned data since the last run and rescale all rows,
+    chunk by chunk
+        Args:
+            config (`dict`): Dictionary of configurations, with `get_features.incremental` holding the
+                             `state_path` of the scaler state and the `chunksize`
+        Returns:
+            scaler (`sklearn.preprocessing.StandardScaler`): The updated scaler
+    """
+    cfg = config["get_features"]
+    fmt = config_format(config)
+    state_path, chunksize = cfg["incremental"]["state_path"], cfg["incremental"].get("chunksize", 10000)
+    load_path = artifact_path(cfg["load_path"], fmt)
+
+    start = time.perf_counter()
+    scaler, rows, fingerprint = load_scaler_state(cfg["scaler_path"], state_path, cfg["features_column"])
+    scaler, rows, fingerprint = update_scaler(scaler, load_path, cfg["features_column"], rows, chunksize, fingerprint)
+    save_scaler_state(scaler, cfg["scaler_path"], state_path, cfg["features_column"], rows, fingerprint)
+    logger.info("Updated the scaler in %0.3f seconds", time.perf_counter() - start)
+
+    transform_chunks(scaler, load_path, cfg["features_column"], cfg["target_column"],
+                     artifact_path(cfg["feature_path"], fmt), artifact_path(cfg["target_path"], fmt), chunksize)
+
+    return scaler
+
+
+def get_features(config: dict) -> typing.Optional[pd.DataFrame]:
     """Applies featurization operations to input data.
         Args:
-            config (`dict`): Dictionary of configurations
+            config (`dict`): Dictionary of configurations. If `get_features.incremental` is set, the scaler
+                             is updated with the new rows only, see `get_features_incremental`
         Returns:
-            features(`:obj:`pd.DataFrame`):dataset with features
+            features(`:obj:`pd.DataFrame`):dataset with features, None in incremental mode
     """
+    if config["get_features"].get("incremental"):
+        get_features_incremental(config)
+        return None
 
+    fmt = config_format(config)
     # load the processed data
     try:
-        path = config["get_features"]["load_path"]
-        cleaned = pd.read_csv(path)
+        path = artifact_path(config["get_features"]["load_path"], fmt)
+        cleaned = read_table(path)
     except FileNotFoundError:
         logger.error("The specified path %s does not contain the file", path)
     else:
@@ -126,8 +325,8 @@ def get_features(config: dict) -> pd.DataFrame:
     # extract target
     target = extract_target(cleaned, config["get_features"]["target_column"])
     # save scale features at the specified path
-    save_data(scaled_features, config["get_features"]["feature_path"])
+    save_data(scaled_features, artifact_path(config["get_features"]["feature_path"], fmt))
     # save target at the specified path
-    save_data(target, config["get_features"]["target_path"])
+    save_data(target, artifact_path(config["get_features"]["target_path"], fmt))
 
     return features
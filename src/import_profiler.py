@@ -0,0 +1,68 @@
+import logging
+import re
+import typing
+
+logger = logging.getLogger(__name__)
+
+# Line written by `python -X importtime` for every imported module
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def parse_importtime(lines: typing.Iterable[str]) -> typing.List[dict]:
+    """Parse the import times reported by `python -X importtime`
+    Args:
+        lines (`list` of `str`): Lines written to stderr by the interpreter
+    Returns:
+        imports (`list` of `dict`): Module name, nesting depth, self and cumulative microseconds of every import
+    """
+    imports = []
+    for line in lines:
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imports.append({"module": match.group(4),
+                            "depth": (len(match.group(3)) - 1) // 2,
+                            "self_us": int(match.group(1)),
+                            "cumulative_us": int(match.group(2))})
+
+    return imports
+
+
+def summarize_imports(imports: typing.List[dict], top: int = 10) -> dict:
+    """Summarize parsed import times into totals and the slowest modules
+    Args:
+        imports (`list` of `dict`): Output of `parse_importtime`
+        top (int): Number of modules to keep in each ranking
+    Returns:
+        summary (dict): Total import time, the top level imports by cumulative time, the self time
+                        of every top level package and the modules with the highest self time
+    """
+    top_level = [entry for entry in imports if entry["depth"] == 0]
+    packages: typing.Dict[str, int] = {}
+    for entry in imports:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+
+    return {"total_ms": sum(entry["cumulative_us"] for entry in top_level) / 1000,
+            "n_modules": len(imports),
+            "top_level": sorted(top_level, key=lambda entry: -entry["cumulative_us"])[:top],
+            "packages": [{"package": package, "self_us": self_us}
+                         for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]],
+            "slowest_self": sorted(imports, key=lambda entry: -entry["self_us"])[:top]}
+
+
+def format_summary(summary: dict) -> str:
+    """Format an import time summary as a table
+    Args:
+        summary (dict): Output of `summarize_imports`
+    Returns:
+        report (str): Human readable report
+    """
+    lines = ["Imported %d modules in %.1f ms" % (summary["n_modules"], summary["total_ms"]),
+             "%-50s %12s" % ("top level import", "cumulative")]
+    lines += ["%-50s %9.1f ms" % (entry["module"], entry["cumulative_us"] / 1000) for entry in summary["top_level"]]
+    lines += ["%-50s %12s" % ("package", "self")]
+    lines += ["%-50s %9.1f ms" % (entry["package"], entry["self_us"] / 1000) for entry in summary["packages"]]
+    lines += ["%-50s %12s" % ("module", "self")]
+    lines += ["%-50s %9.1f ms" % (entry["module"], entry["self_us"] / 1000) for entry in summary["slowest_self"]]
+
+    return "\n".join(lines)
@@ -0,0 +1,104 @@
+import logging
+import typing
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LinearScorer:
+    """Scores body measurements with a standard scaler and a linear model folded into one set of weights.
+
+    For a scaler with mean `m` and scale `s` and a linear model with coefficients `c` and intercept `b`,
+    the prediction `c . ((x - m) / s) + b` equals `w . x + b'` with `w = c / s` and `b' = b - w . m`.
+    Features whose coefficient is zero are dropped from the weights entirely.
+    """
+
+    def __init__(self, weights: np.ndarray, intercept: float,
+                 feature_names: typing.Optional[typing.List[str]] = None):
+        """
+            Args:
+                weights (`np.ndarray`): Weight of every feature in raw (unscaled) units
+                intercept (`float`): Intercept in raw units
+                feature_names (`list` of `str`): Names of the features in input order
+        """
+        weights = np.ravel(np.asarray(weights, dtype=float))
+        self.n_features = weights.shape[0]
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.weights = weights
+        self.intercept = float(intercept)
+
+        # only the features with a non zero weight take part in a prediction
+        self.active = np.flatnonzero(weights)
+        self.active_weights = weights[self.active]
+        self._pairs = list(zip(self.active.tolist(), self.active_weights.tolist()))
+
+    @classmethod
+    def from_arrays(cls, coef: np.ndarray, intercept: float, mean: np.ndarray, scale: np.ndarray,
+                    feature_names: typing.Optional[typing.List[str]] = None) -> "LinearScorer":
+        """Fold the statistics of a standard scaler into the coefficients of a linear model
+            Args:
+                coef (`np.ndarray`): Coefficients of the model on the scaled features
+                intercept (`float`): Intercept of the model
+                mean (`np.ndarray`): Mean the scaler subtracts from every feature
+                scale (`np.ndarray`): Scale the scaler divides every feature by
+                feature_names (`list` of `str`): Names of the features in input order
+            Returns:
+                scorer (`LinearScorer`): Scorer equivalent to the scaler followed by the model
+        """
+        weights = np.ravel(np.asarray(coef, dtype=float)) / np.asarray(scale, dtype=float)
+        intercept = float(intercept) - float(np.dot(weights, mean))
+        scorer = cls(weights, intercept, feature_names)
+        logger.info("Compiled the scaler and the model into %d of %d active weights",
+                    scorer.active.shape[0], scorer.n_features)
+
+        return scorer
+
+    @classmethod
+    def from_estimators(cls, scaler, model) -> "LinearScorer":
+        """Fold a fitted `StandardScaler` into a fitted single-target linear model
+            Args:
+                scaler (`sklearn.preprocessing.StandardScaler`): Fitted scaler
+                model (`sklearn.linear_model.Lasso`): Linear model fitted on the scaled features
+            Returns:
+                scorer (`LinearScorer`): Scorer equivalent to `model.predict(scaler.transform(x))`
+        """
+        coef = np.asarray(model.coef_, dtype=float)
+        if coef.ndim > 1 and coef.shape[0] != 1:
+            raise ValueError("Only single target linear models can be compiled, got coefficients "
+                             "of shape %s" % str(coef.shape))
+        coef = np.ravel(coef)
+        mean = scaler.mean_ if getattr(scaler, "mean_", None) is not None else np.zeros_like(coef)
+        scale = scaler.scale_ if getattr(scaler, "scale_", None) is not None else np.ones_like(coef)
+
+        return cls.from_arrays(coef, np.ravel(model.intercept_)[0], mean, scale,
+                               getattr(scaler, "feature_names_in_", None))
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Generate predictions for a matrix of raw measurements with one dot product
+            Args:
+                features (`np.ndarray`): N x n_features matrix of raw measurements
+            Returns:
+                predictions (`np.ndarray`): N predictions
+        """
+        features = np.asarray(features, dtype=float)
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError("Expected an N x %d matrix, got shape %s" % (self.n_features, str(features.shape)))
+
+        return features[:, self.active] @ self.active_weights + self.intercept
+
+    def predict_one(self, row: typing.Sequence[float]) -> float:
+        """Generate the prediction for a single row of raw measurements in pure Python
+            Args:
+                row (`list` of `float`): n_features raw measurements
+            Returns:
+                prediction (`float`): Prediction for the row
+        """
+        if len(row) != self.n_features:
+            raise ValueError("Expected %d measurements, got %d" % (self.n_features, len(row)))
+
+        prediction = self.intercept
+        for index, weight in self._pairs:
+            prediction += weight * row[index]
+
+        return prediction
@@ -0,0 +1,218 @@
+import concurrent.futures
+import logging
+import os
+import typing
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Smallest denominator of the percentage error, as in `sklearn.metrics.mean_absolute_percentage_error`
+EPSILON = np.finfo(np.float64).eps
+
+# Maximum number of resampled values of one block of bootstrap replicates, which bounds its memory
+BOOTSTRAP_BLOCK_VALUES = 1 << 20
+
+
+def as_array(values) -> np.ndarray:
+    """Convert a target or prediction column to a contiguous 1-d float array
+    Args:
+        values (`pd.DataFrame`, `pd.Series`, `np.ndarray` or `list`): Single column of values
+    Returns:
+        values (`np.ndarray`): Contiguous float64 array, without a copy if `values` already is one
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 2 and values.shape[1] == 1:
+        values = values[:, 0]
+    if values.ndim != 1:
+        raise ValueError("Expected a single column of values, got shape %s" % str(values.shape))
+    return np.ascontiguousarray(values)
+
+
+class RegressionMetrics:
+    """Accumulates the regression metrics of predictions given chunk by chunk.
+
+    Every chunk is reduced to a few sums: of the squared, absolute and absolute percentage errors, and
+    the count, mean and sum of squared deviations of the target, which are merged with those of the
+    earlier chunks. The metrics of all chunks are therefore exact without keeping any of them, and equal
+    to those of scikit-learn on the concatenated data up to rounding.
+    """
+
+    def __init__(self, n_features: typing.Optional[int] = None):
+        """
+            Args:
+                n_features (`int`): Number of features of the model, for the adjusted R squared. It is left
+                                    out if None
+        """
+        self.n_features = n_features
+        self.rows = 0
+        self.sum_squared_error = 0.
+        self.sum_absolute_error = 0.
+        self.sum_percentage_error = 0.
+        self.target_mean = 0.
+        self.target_m2 = 0.
+
+    def update(self, y_true, y_pred) -> "RegressionMetrics":
+        """Add a chunk of targets and predictions
+        Args:
+            y_true (`pd.DataFrame` or `np.ndarray`): True target values of the chunk
+            y_pred (`pd.DataFrame` or `np.ndarray`): Predictions of the chunk, in the same order
+        Returns:
+            self (`RegressionMetrics`): The updated metrics
+        """
+        y_true, y_pred = as_array(y_true), as_array(y_pred)
+        if y_true.shape != y_pred.shape:
+            raise ValueError("Found %d target values and %d predictions" % (len(y_true), len(y_pred)))
+        rows = len(y_true)
+        if rows == 0:
+            return self
+
+        residual = y_true - y_pred
+        absolute = np.abs(residual)
+        self.sum_squared_error += float(residual @ residual)
+        self.sum_absolute_error += float(absolute.sum())
+        self.sum_percentage_error += float((absolute / np.maximum(np.abs(y_true), EPSILON)).sum())
+
+        # merge the mean and sum of squared deviations of the chunk with the running ones (Chan et al.)
+        mean = float(y_true.mean())
+        deviation = y_true - mean
+        total = self.rows + rows
+        delta = mean - self.target_mean
+        self.target_m2 += float(deviation @ deviation) + delta ** 2 * self.rows * rows / total
+        self.target_mean += delta * rows / total
+        self.rows = total
+
+        return self
+
+    def result(self) -> dict:
+        """Compute the metrics of all chunks added so far
+        Returns:
+            metrics (`dict`): MSE, RMSE, MAE, MAPE, R squared and, if `n_features` is known and smaller
+                              than the number of rows minus one, adjusted R squared
+        """
+        if self.rows == 0:
+            raise ValueError("No predictions to evaluate")
+
+        return {name: float(value) for name, value in _metrics_from_sums(
+            self.rows, self.sum_squared_error, self.sum_absolute_error, self.sum_percentage_error,
+            self.target_m2, self.n_features).items()}
+
+
+def _metrics_from_sums(rows: int, sum_squared_error, sum_absolute_error, sum_percentage_error, target_m2,
+                       n_features: typing.Optional[int] = None) -> dict:
+    """Derive the metrics from the sums of `RegressionMetrics`, given as scalars or as arrays of replicates"""
+    sum_squared_error, target_m2 = np.asarray(sum_squared_error, dtype=float), np.asarray(target_m2, dtype=float)
+    mse = sum_squared_error / rows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # a constant target is scored like scikit-learn
+        rsquared = np.where(target_m2 > 0, 1 - sum_squared_error / target_m2,
+                            np.where(sum_squared_error == 0, 1., 0.))
+    metrics = {"MSE": mse, "RMSE": np.sqrt(mse), "MAE": sum_absolute_error / rows,
+               "MAPE": sum_percentage_error / rows, "R-squared": rsquared}
+    if n_features is not None and rows - n_features - 1 > 0:
+        metrics["Adjusted R-squared"] = 1 - (1 - rsquared) * (rows - 1) / (rows - n_features - 1)
+
+    return metrics
+
+
+def compute_metrics(y_true, y_pred, n_features: typing.Optional[int] = None) -> dict:
+    """Compute all regression metrics of predictions held in memory
+    Args:
+        y_true (`pd.DataFrame` or `np.ndarray`): True target values
+        y_pred (`pd.DataFrame` or `np.ndarray`): Predictions, in the same order
+        n_features (`int`): Number of features of the model, for the adjusted R squared
+    Returns:
+        metrics (`dict`): Output of `RegressionMetrics.result`
+    """
+    return RegressionMetrics(n_features).update(y_true, y_pred).result()
+
+
+def compute_metrics_chunks(chunks: typing.Iterable[typing.Tuple[typing.Any, typing.Any]],
+                           n_features: typing.Optional[int] = None) -> dict:
+    """Compute all regression metrics of predictions read in chunks
+    Args:
+        chunks (`iterator` of `tuple`): Pairs of true target values and predictions
+        n_features (`int`): Number of features of the model, for the adjusted R squared
+    Returns:
+        metrics (`dict`): Output of `RegressionMetrics.result`, with the number of `rows` and `chunks`
+    """
+    metrics = RegressionMetrics(n_features)
+    count = 0
+    for y_true, y_pred in chunks:
+        metrics.update(y_true, y_pred)
+        count += 1
+
+    return dict(metrics.result(), rows=metrics.rows, chunks=count)
+
+
+def _bootstrap_block(terms: np.ndarray, replicates: int, seed: np.random.SeedSequence,
+                     n_features: typing.Optional[int] = None) -> dict:
+    """Compute the metrics of a block of bootstrap replicates at once, one replicate per row of a matrix
+    of resampled row indices, from the per row terms of the sums the metrics are derived from"""
+    rows = terms.shape[1]
+    index = np.random.default_rng(seed).integers(0, rows, size=(replicates, rows))
+    squared, absolute, percentage, centered, centered_squared = [np.take(term, index).sum(axis=1) for term in terms]
+
+    return _metrics_from_sums(rows, squared, absolute, percentage, centered_squared - centered ** 2 / rows,
+                              n_features)
+
+
+def _bootstrap_task(task: tuple) -> dict:
+    return _bootstrap_block(*task)
+
+
+def bootstrap_metrics(y_true, y_pred, n_features: typing.Optional[int] = None, replicates: int = 2000,
+                      confidence: float = 0.95, random_state: typing.Optional[int] = None,
+                      n_jobs: typing.Optional[int] = 1) -> dict:
+    """Estimate percentile bootstrap confidence intervals of every regression metric
+    The replicates are drawn in blocks, each one a matrix of resampled row indices whose metrics are
+    computed with array operations over its rows. The blocks and their seeds only depend on the data size
+    and `random_state`, so the intervals are the same for any `n_jobs`.
+    Args:
+        y_true (`pd.DataFrame` or `np.ndarray`): True target values
+        y_pred (`pd.DataFrame` or `np.ndarray`): Predictions, in the same order
+        n_features (`int`): Number of features of the model, for the adjusted R squared
+        replicates (`int`): Number of bootstrap replicates
+        confidence (`float`): Confidence level of the intervals
+        random_state (`int`): Seed of the resampling, None for a random one
+        n_jobs (`int`): Number of processes the blocks are spread across, -1 for one per CPU, 1 or None to
+                        compute them in this process
+    Returns:
+        intervals (`dict`): Lower and upper bound of every metric of `compute_metrics`, as `[lower, upper]`
+    """
+    y_true, y_pred = as_array(y_true), as_array(y_pred)
+    if y_true.shape != y_pred.shape:
+        raise ValueError("Found %d target values and %d predictions" % (len(y_true), len(y_pred)))
+    if not 0 < confidence < 1:
+        raise ValueError("The confidence level must be in (0, 1), got %s" % confidence)
+    if replicates < 1 or len(y_true) == 0:
+        raise ValueError("Bootstrapping needs at least one replicate and one prediction")
+
+    # every metric is a function of sums over the rows of a replicate, so the terms of these sums are
+    # computed once and each replicate only gathers and adds up its rows of them
+    residual = np.abs(y_true - y_pred)
+    centered = y_true - y_true.mean()
+    terms = np.stack([residual ** 2, residual, residual / np.maximum(np.abs(y_true), EPSILON), centered,
+                      centered ** 2])
+
+    block = max(1, min(replicates, BOOTSTRAP_BLOCK_VALUES // len(y_true)))
+    sizes = [min(block, replicates - start) for start in range(0, replicates, block)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+    tasks = [(terms, size, seed, n_features) for size, seed in zip(sizes, seeds)]
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if n_jobs and n_jobs > 1 and len(tasks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(min(n_jobs, len(tasks))) as executor:
+            blocks = list(executor.map(_bootstrap_task, tasks))
+    else:
+        blocks = [_bootstrap_task(task) for task in tasks]
+
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name in blocks[0]:
+        values = np.concatenate([block[name] for block in blocks])
+        intervals[name] = np.percentile(values, [tail, 100 - tail]).tolist()
+    logger.info("Computed the %g%% confidence intervals of %d bootstrap replicates in %d blocks",
+                confidence * 100, replicates, len(tasks))
+
+    return intervals
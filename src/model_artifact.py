@@ -0,0 +1,85 @@
+import datetime
+import json
+import logging
+import sys
+import typing
+
+import numpy as np
+
+from src.linear_scorer import LinearScorer
+
+logger = logging.getLogger(__name__)
+
+# Version of the layout of the exported file, bumped on incompatible changes
+FORMAT_VERSION = 1
+
+
+def _open(path: str, mode: str) -> typing.IO:
+    """Open a local file, or an s3:// URI through `artifact_io`, imported only then since it imports pandas"""
+    if path.startswith("s3://"):
+        from src.artifact_io import open_file
+
+        return open_file(path, mode)
+    return open(path, mode)
+
+
+def export_linear_model(scaler, model, feature_names: typing.List[str], save_path: str,
+                        metadata: typing.Optional[dict] = None) -> None:
+    """Save a fitted scaler and linear model as a `.npz` file that loads with NumPy only
+    Args:
+        scaler (`sklearn.preprocessing.StandardScaler`): Fitted scaler
+        model (`sklearn.linear_model.Lasso`): Linear model fitted on the scaled features
+        feature_names (`list` of `str`): Names of the features in the order the model expects them
+        save_path (`str`): The path to save the exported model
+        metadata (`dict`): Extra information to store with the model, e.g. training parameters
+    Returns:
+        None
+    """
+    coef = np.ravel(np.asarray(model.coef_, dtype=float))
+    info = {"format_version": FORMAT_VERSION,
+            "model_type": type(model).__name__,
+            "sklearn_version": getattr(sys.modules.get("sklearn"), "__version__", None),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+    info.update(metadata or {})
+
+    try:
+        with _open(save_path, "wb") as file:
+            np.savez(file,
+                     coef=coef,
+                     intercept=np.ravel(np.asarray(model.intercept_, dtype=float))[:1],
+                     mean=np.asarray(scaler.mean_, dtype=float),
+                     scale=np.asarray(scaler.scale_, dtype=float),
+                     feature_names=np.array(feature_names, dtype=str),
+                     metadata=np.array(json.dumps(info)))
+    except FileNotFoundError as e:
+        logger.error("The specified path %s does not exist", save_path)
+        raise e
+    else:
+        logger.info("Successfully export the model as %s", save_path)
+
+
+def load_linear_model(load_path: typing.Union[str, typing.BinaryIO]) -> typing.Tuple[LinearScorer, np.ndarray, dict]:
+    """Load a model exported by `export_linear_model` without scikit-learn
+    Args:
+        load_path (`str`): The path of the exported model, or a binary file object holding it
+    Returns:
+        scorer (`LinearScorer`): Scorer of raw measurements
+        mean (`np.ndarray`): Mean of every feature in the training data
+        metadata (`dict`): Information stored with the model
+    """
+    try:
+        with np.load(load_path, allow_pickle=False) as artifact:
+            metadata = json.loads(str(artifact["metadata"]))
+            if metadata.get("format_version") != FORMAT_VERSION:
+                raise ValueError("Unsupported model format version %s" % metadata.get("format_version"))
+            mean = artifact["mean"]
+            scorer = LinearScorer.from_arrays(artifact["coef"], artifact["intercept"][0], mean,
+                                              artifact["scale"], artifact["feature_names"].tolist())
+    except FileNotFoundError as e:
+        logger.error("The model file does not exist at %s", load_path)
+        raise e
+    else:
+        logger.info("Successfully load the %s model exported at %s", metadata.get("model_type"),
+                    metadata.get("created_at"))
+
+    return scorer, mean, metadata
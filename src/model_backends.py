@@ -0,0 +1,191 @@
+import importlib
+import logging
+import typing
+
+import numpy as np
+
+from src.linear_scorer import LinearScorer
+
+logger = logging.getLogger(__name__)
+
+
+class EstimatorScorer:
+    """Scores raw body measurements with a fitted scaler followed by any fitted estimator.
+
+    It has the `predict` and `predict_one` methods of `LinearScorer`, for the models whose prediction
+    cannot be folded into one set of weights.
+    """
+
+    def __init__(self, scaler, model):
+        """
+            Args:
+                scaler (`sklearn.preprocessing.StandardScaler`): Fitted scaler
+                model (`sklearn.base.RegressorMixin`): Model fitted on the scaled features
+        """
+        self.model = model
+        self.mean = np.asarray(scaler.mean_, dtype=float)
+        self.scale = np.asarray(scaler.scale_, dtype=float)
+        self.n_features = self.mean.shape[0]
+        names = getattr(model, "feature_names_in_", None)
+        self.feature_names = list(names) if names is not None else None
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Generate predictions for a matrix of raw measurements
+            Args:
+                features (`np.ndarray`): N x n_features matrix of raw measurements
+            Returns:
+                predictions (`np.ndarray`): N predictions
+        """
+        features = np.asarray(features, dtype=float)
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError("Expected an N x %d matrix, got shape %s" % (self.n_features, str(features.shape)))
+        scaled = (features - self.mean) / self.scale
+        if self.feature_names is not None:
+            # the model was fitted on a DataFrame and checks the names of the columns it gets
+            import pandas as pd
+
+            scaled = pd.DataFrame(scaled, columns=self.feature_names)
+
+        return np.ravel(self.model.predict(scaled))
+
+    def predict_one(self, row: typing.Sequence[float]) -> float:
+        """Generate the prediction for a single row of raw measurements
+            Args:
+                row (`list` of `float`): n_features raw measurements
+            Returns:
+                prediction (`float`): Prediction for the row
+        """
+        if len(row) != self.n_features:
+            raise ValueError("Expected %d measurements, got %d" % (self.n_features, len(row)))
+
+        return float(self.predict(np.asarray(row, dtype=float).reshape(1, -1))[0])
+
+
+class ModelBackend:
+    """A kind of model the pipeline can train, score, export and serve under one name.
+
+    The scikit-learn estimator is only imported when a model is built or recognized, so that the web app
+    can serve an exported linear model without scikit-learn. Linear backends fold the scaler into their
+    coefficients for serving and export to the NumPy-only format of `src.model_artifact`; the others are
+    served from the pickled model and scaler.
+    """
+
+    def __init__(self, name: str, estimator: str, linear: bool):
+        """
+            Args:
+                name (`str`): Name of the backend in `train.model_train.model_type`
+                estimator (`str`): Import path of the estimator class, as `module:class`
+                linear (`bool`): Whether the fitted model has the `coef_` and `intercept_` of a linear model
+        """
+        self.name = name
+        self.estimator = estimator
+        self.linear = linear
+
+    @property
+    def estimator_class(self) -> type:
+        """The estimator class, imported on first use"""
+        module_name, class_name = self.estimator.split(":")
+        return getattr(importlib.import_module(module_name), class_name)
+
+    def build(self, **params):
+        """Create an unfitted model
+            Args:
+                **params: Hyperparameters of the estimator, e.g. `alpha` or `random_state`
+            Returns:
+                model (`sklearn.base.RegressorMixin`): Unfitted model
+        """
+        try:
+            return self.estimator_class(**params)
+        except TypeError as e:
+            logger.error("Invalid hyperparameters %s for the %s backend", list(params), self.name)
+            raise e
+
+    def fit(self, x_train, y_train, **params):
+        """Create and fit a model
+            Args:
+                x_train (`pd.DataFrame`): Features to fit on
+                y_train (`pd.Series`): Target to fit on, a single column DataFrame is flattened
+                **params: Hyperparameters of the estimator
+            Returns:
+                model (`sklearn.base.RegressorMixin`): Fitted model
+        """
+        return self.build(**params).fit(x_train, np.ravel(y_train))
+
+    @staticmethod
+    def predict(model, x) -> np.ndarray:
+        """Generate predictions for scaled features
+            Args:
+                model (`sklearn.base.RegressorMixin`): Fitted model
+                x (`pd.DataFrame`): Scaled features, in the columns the model was fitted on
+            Returns:
+                y_pred (`np.ndarray`): One prediction per row
+        """
+        return np.ravel(model.predict(x))
+
+    def scorer(self, model, scaler) -> typing.Union[LinearScorer, EstimatorScorer]:
+        """Build the scorer of raw measurements the web app serves the model with
+            Args:
+                model (`sklearn.base.RegressorMixin`): Fitted model
+                scaler (`sklearn.preprocessing.StandardScaler`): Scaler the model's features were scaled with
+            Returns:
+                scorer (`LinearScorer` or `EstimatorScorer`): Scorer with `predict` and `predict_one`
+        """
+        if self.linear:
+            return LinearScorer.from_estimators(scaler, model)
+        return EstimatorScorer(scaler, model)
+
+    def export(self, model, scaler, feature_names: typing.List[str], save_path: str,
+               metadata: typing.Optional[dict] = None) -> None:
+        """Save the model with its scaler in the NumPy-only serving format
+            Args:
+                model (`sklearn.base.RegressorMixin`): Fitted model
+                scaler (`sklearn.preprocessing.StandardScaler`): Scaler the model's features were scaled with
+                feature_names (`list` of `str`): Names of the features in the order the model expects them
+                save_path (`str`): The path to save the exported model
+                metadata (`dict`): Extra information to store with the model
+            Returns:
+                None
+        """
+        if not self.linear:
+            raise ValueError("The %s backend cannot be exported to the NumPy-only format, remove train.export "
+                             "and serve the pickled model and scaler instead" % self.name)
+        from src.model_artifact import export_linear_model
+
+        export_linear_model(scaler, model, feature_names, save_path,
+                            metadata=dict(metadata or {}, backend=self.name))
+
+
+# Backends by the name used in `train.model_train.model_type`
+BACKENDS = {backend.name: backend for backend in [
+    ModelBackend("lasso", "sklearn.linear_model:Lasso", linear=True),
+    ModelBackend("elasticnet", "sklearn.linear_model:ElasticNet", linear=True),
+    ModelBackend("ridge", "sklearn.linear_model:Ridge", linear=True),
+    ModelBackend("gbt", "sklearn.ensemble:HistGradientBoostingRegressor", linear=False),
+]}
+
+
+def get_backend(name: str) -> ModelBackend:
+    """Look up a backend by name
+    Args:
+        name (`str`): One of `BACKENDS`
+    Returns:
+        backend (`ModelBackend`): The backend
+    """
+    try:
+        return BACKENDS[name]
+    except KeyError as e:
+        logger.error("Unknown model type %s, expected one of %s", name, list(BACKENDS))
+        raise e
+
+
+def backend_for_model(model) -> ModelBackend:
+    """Find the backend a fitted model was built by
+    Args:
+        model (`sklearn.base.RegressorMixin`): Fitted model, e.g. unpickled from `train.model_train.save_path`
+    Returns:
+        backend (`ModelBackend`): The backend whose estimator class is the class of the model
+    """
+    for backend in BACKENDS.values():
+        if type(model).__name__ == backend.estimator.split(":")[1] and type(model) is backend.estimator_class:
+            return backend
+    raise ValueError("No model backend for a %s model, expected one of %s" % (type(model).__name__, list(BACKENDS)))
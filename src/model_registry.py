@@ -0,0 +1,148 @@
+import hashlib
+import io
+import logging
+import os
+import pickle
+import threading
+import time
+import typing
+
+import numpy as np
+
+from src.linear_scorer import LinearScorer
+from src.model_artifact import load_linear_model
+from src.model_backends import EstimatorScorer, backend_for_model
+
+logger = logging.getLogger(__name__)
+
+
+class ModelVersion(typing.NamedTuple):
+    """A loaded scorer together with the fingerprint of the files it was loaded from."""
+    scorer: typing.Union[LinearScorer, EstimatorScorer]
+    version: str
+    loaded_at: float
+    model_type: str
+
+
+class ModelRegistry:
+    """Serves the current model and swaps in a new one when the model files change on disk.
+
+    A background thread polls the files every `poll_interval` seconds. A change is only loaded once
+    the files have stayed the same for one more poll, so half written files are not picked up. The new
+    model must pass a smoke prediction before it replaces the current one; otherwise the current one
+    keeps serving. Readers take `registry.current` once per request and are never blocked by a reload.
+    """
+
+    def __init__(self, model_path: str, scaler_path: typing.Optional[str] = None, poll_interval: float = 5.0):
+        """
+            Args:
+                model_path (str): Path to the pickled model of any backend in `src.model_backends`, or to
+                                  a `.npz` model exported by `src.model_artifact`, which holds the scaler too
+                scaler_path (str): Path to the pickled StandardScaler, unused for a `.npz` model
+                poll_interval (float): Number of seconds between two checks of the files, 0 disables reloading
+        """
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.exported = model_path.endswith(".npz")
+        self.paths = [model_path] if self.exported else [model_path, scaler_path]
+        self.poll_interval = poll_interval
+        self._listeners: typing.List[typing.Callable[[str], None]] = []
+
+        self._signature = self._file_signature()
+        self._pending = self._signature
+        self.current = self._load()
+        logger.info("Serving %s model version %s", self.current.model_type, self.current.version)
+
+        self._stop = threading.Event()
+        self._thread = None
+        if poll_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="ModelRegistry", daemon=True)
+            self._thread.start()
+
+    @property
+    def version(self) -> str:
+        """Fingerprint of the model that is serving"""
+        return self.current.version
+
+    def add_listener(self, listener: typing.Callable[[str], None]) -> None:
+        """Register a function called with the new version after every swap
+        Args:
+            listener (callable): Function taking the new version
+        Returns: None
+        """
+        self._listeners.append(listener)
+
+    def _file_signature(self) -> typing.Optional[tuple]:
+        try:
+            return tuple((stat.st_mtime_ns, stat.st_size) for stat in map(os.stat, self.paths))
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> ModelVersion:
+        contents = []
+        for path in self.paths:
+            try:
+                with open(path, "rb") as file:
+                    contents.append(file.read())
+            except FileNotFoundError as e:
+                logger.error("The model file does not exist at %s", path)
+                raise e
+        version = hashlib.sha256(b"".join(contents)).hexdigest()[:12]
+
+        if self.exported:
+            scorer, mean, metadata = load_linear_model(io.BytesIO(contents[0]))
+            model_type = metadata.get("backend", metadata.get("model_type", "").lower())
+        else:
+            scaler, model = pickle.loads(contents[1]), pickle.loads(contents[0])
+            backend = backend_for_model(model)
+            scorer, mean, model_type = backend.scorer(model, scaler), scaler.mean_, backend.name
+
+        # smoke prediction for an average user must be a plausible body fat percentage
+        smoke = scorer.predict(np.asarray(mean, dtype=float).reshape(1, -1))[0]
+        if not 0 <= smoke <= 100:
+            raise ValueError("Smoke prediction of model version %s is %s" % (version, smoke))
+
+        return ModelVersion(scorer, version, time.time(), model_type)
+
+    def check(self) -> bool:
+        """Load and swap in the model files if they changed and have stayed the same since the last check
+        Returns:
+            swapped (bool): Whether a new model is now serving
+        """
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            self._pending = signature
+            return False
+        if signature != self._pending:
+            # the files are still changing, wait for them to settle
+            self._pending = signature
+            return False
+
+        try:
+            candidate = self._load()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to load the changed model files, version %s keeps serving: %s",
+                         self.current.version, e)
+            self._signature = signature
+            return False
+        self._signature = signature
+        if candidate.version == self.current.version:
+            return False
+
+        previous, self.current = self.current, candidate
+        logger.info("Swapped model version %s for version %s", previous.version, candidate.version)
+        for listener in self._listeners:
+            listener(candidate.version)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def close(self) -> None:
+        """Stop watching the model files
+        Returns: None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
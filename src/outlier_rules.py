@@ -0,0 +1,184 @@
+import logging
+import typing
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Parameters of every rule type, with their defaults. `range` and `ratio` have fixed bounds, the
+# others derive theirs from statistics of the column fitted on the data
+RULE_TYPES = {"range": {"minimum": -np.inf, "maximum": np.inf},
+              "iqr": {"k": 1.5},
+              "zscore": {"threshold": 3.},
+              "mad": {"threshold": 3.5},
+              "ratio": {"minimum": -np.inf, "maximum": np.inf}}
+
+
+def rules_from_config(preprocess_config: dict) -> typing.List[dict]:
+    """Collect the outlier rules of the preprocess configuration
+    Args:
+        preprocess_config (`dict`): The `preprocess` section of the configuration. The single column rule
+                                    of `remove_outliers` becomes a `range` rule in front of `outlier_rules`
+    Returns:
+        rules (`list` of `dict`): Outlier rules
+    """
+    rules = []
+    if preprocess_config.get("remove_outliers"):
+        legacy = preprocess_config["remove_outliers"]
+        rules.append({"type": "range", "column": legacy["column_name"], "minimum": legacy["minimum"],
+                      "maximum": legacy["maximum"]})
+    rules.extend(preprocess_config.get("outlier_rules") or [])
+
+    return rules
+
+
+class OutlierRules:
+    """Compiles outlier rules into bounds and evaluates all of them as one boolean mask.
+
+    Every rule rejects the rows whose value is below its lower bound or above its upper bound, where the
+    value is a column, or the ratio of two columns for a `ratio` rule. Missing values are never rejected.
+    A rule is given as a dict, for example
+
+        {"type": "range", "column": "BodyFat", "minimum": 5, "maximum": 50}
+        {"type": "iqr", "column": "Weight", "k": 3}
+        {"type": "zscore", "column": "Height", "threshold": 4}
+        {"type": "mad", "column": "Neck", "threshold": 5}
+        {"type": "ratio", "numerator": "Abdomen", "denominator": "Hip", "minimum": 0.7, "maximum": 1.3}
+
+    The bounds of `iqr`, `zscore` and `mad` rules come from `fit`, those of the others are known upfront.
+    `mask` counts the rows every rule rejects; a row that breaks several rules counts for each of them.
+    """
+
+    def __init__(self, rules: typing.List[dict]):
+        """
+            Args:
+                rules (`list` of `dict`): Outlier rules, each with a `type` from `RULE_TYPES`, the columns it
+                                          checks, its parameters and optionally a `name`
+        """
+        self.rules = []
+        for rule in rules:
+            rule_type = rule.get("type")
+            if rule_type not in RULE_TYPES:
+                raise ValueError("Unknown outlier rule type %s, expected one of %s" % (rule_type, list(RULE_TYPES)))
+            rule = dict(RULE_TYPES[rule_type], **rule)
+            if rule_type == "ratio":
+                rule.setdefault("name", "ratio(%s/%s)" % (rule["numerator"], rule["denominator"]))
+                rule["lower"], rule["upper"] = rule["minimum"], rule["maximum"]
+            else:
+                rule.setdefault("name", "%s(%s)" % (rule_type, rule["column"]))
+                if rule_type == "range":
+                    rule["lower"], rule["upper"] = rule["minimum"], rule["maximum"]
+            self.rules.append(rule)
+
+        names = [rule["name"] for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Outlier rule names must be unique, got %s" % names)
+        self.counts = dict.fromkeys(names, 0)
+        self.rows = 0
+        self.kept = 0
+
+    @property
+    def fitted(self) -> bool:
+        """Whether the bounds of every rule are known"""
+        return all("lower" in rule for rule in self.rules)
+
+    @property
+    def columns(self) -> typing.List[str]:
+        """Columns whose statistics the rules are fitted on"""
+        return list(dict.fromkeys(rule["column"] for rule in self.rules if "lower" not in rule))
+
+    def fit(self, data: pd.DataFrame) -> "OutlierRules":
+        """Compute the bounds of the rules that depend on statistics of the data
+        Args:
+            data (`:obj:`pd.DataFrame`): The data, only the columns in `columns` are read
+        Returns:
+            self (`OutlierRules`): The fitted rules
+        """
+        return self.fit_chunks([data[self.columns]])
+
+    def fit_chunks(self, chunks: typing.Iterable[pd.DataFrame]) -> "OutlierRules":
+        """Compute the bounds of the rules that depend on statistics of data read in chunks
+        Args:
+            chunks (`iterator` of `:obj:`pd.DataFrame`): The data, each chunk holding at least the columns
+                                                        in `columns`
+        Returns:
+            self (`OutlierRules`): The fitted rules
+        """
+        columns = self.columns
+        if not columns:
+            return self
+
+        # quantiles and medians need every value, but only of the columns the rules fit on
+        pieces: typing.Dict[str, list] = {column: [] for column in columns}
+        for chunk in chunks:
+            for column in columns:
+                pieces[column].append(chunk[column].to_numpy(dtype=float))
+        values = {column: np.concatenate(pieces[column]) if pieces[column] else np.empty(0) for column in columns}
+
+        for rule in self.rules:
+            if "lower" in rule:
+                continue
+            x = values[rule["column"]]
+            if rule["type"] == "iqr":
+                q1, q3 = np.nanpercentile(x, [25, 75])
+                center, spread = (q1 + q3) / 2, (q3 - q1) * (0.5 + rule["k"])
+            elif rule["type"] == "zscore":
+                center, spread = np.nanmean(x), np.nanstd(x) * rule["threshold"]
+            else:
+                center = np.nanmedian(x)
+                # scaled so that the MAD of normal data estimates its standard deviation
+                spread = 1.4826 * np.nanmedian(np.abs(x - center)) * rule["threshold"]
+            rule["lower"], rule["upper"] = float(center - spread), float(center + spread)
+            logger.debug("Fitted outlier rule %s to [%f, %f]", rule["name"], rule["lower"], rule["upper"])
+
+        return self
+
+    def mask(self, data: pd.DataFrame) -> np.ndarray:
+        """Evaluate every rule on the data and combine them into one mask of the rows to keep
+        Args:
+            data (`:obj:`pd.DataFrame`): The data
+        Returns:
+            keep (`np.ndarray`): Boolean array, True for the rows no rule rejects
+        """
+        if not self.fitted:
+            raise ValueError("The outlier rules %s must be fitted first" % [rule["name"] for rule in self.rules
+                                                                            if "lower" not in rule])
+        keep = np.ones(len(data), dtype=bool)
+        for rule in self.rules:
+            try:
+                if rule["type"] == "ratio":
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        x = data[rule["numerator"]].to_numpy(dtype=float) / data[rule["denominator"]].to_numpy(
+                            dtype=float)
+                else:
+                    x = data[rule["column"]].to_numpy(dtype=float)
+            except KeyError as e:
+                logger.error("The key %s does not exist in the data", str(e))
+                raise e
+            rejected = (x < rule["lower"]) | (x > rule["upper"])
+            self.counts[rule["name"]] += int(np.count_nonzero(rejected))
+            keep &= ~rejected
+
+        self.rows += len(data)
+        self.kept += int(np.count_nonzero(keep))
+
+        return keep
+
+    def apply(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Remove the rows any rule rejects
+        Args:
+            data (`:obj:`pd.DataFrame`): The data
+        Returns:
+            data (`:obj:`pd.DataFrame`): The data without outliers, with its original index
+        """
+        return data[self.mask(data)]
+
+    def report(self) -> dict:
+        """Report how many rows every rule rejected so far
+        Returns:
+            report (`dict`): Number of rows checked and kept, and rejections and bounds per rule
+        """
+        return {"rows": self.rows, "kept": self.kept,
+                "rules": [{"name": rule["name"], "rejected": self.counts[rule["name"]],
+                           "lower": rule.get("lower"), "upper": rule.get("upper")} for rule in self.rules]}
@@ -0,0 +1,275 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import time
+import typing
+
+import numpy as np
+import pandas as pd
+
+from src import evaulate_model, generate_features, preprocess_data, score_model, train_model
+from src.artifact_io import artifact_format, artifact_path, config_format, open_file, read_table
+from src.outlier_rules import rules_from_config
+
+logger = logging.getLogger(__name__)
+
+# Directory of the src package, all of whose code is hashed into the cache keys
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Settings of the step by step pipeline that `run.py all` does not apply, and what it does instead
+IGNORED_SETTINGS = {("preprocess", "chunksize"): "the raw data is filtered in memory",
+                    ("get_features", "incremental"): "the scaler is refitted on all rows",
+                    ("predict", "batch"): "only the test split is scored, run `run.py predict` to score the batch",
+                    ("evaluate", "chunksize"): "the predictions are evaluated in memory"}
+
+
+class Stage(typing.NamedTuple):
+    """A step of the pipeline, the values it reads from earlier stages and the values it produces."""
+    name: str
+    inputs: typing.Tuple[str, ...]
+    outputs: typing.Tuple[str, ...]
+    run: typing.Callable[[dict, dict], dict]
+    persist: typing.Callable[[dict, dict], None]
+
+
+def fingerprint(value) -> str:
+    """Hash the content of a value passed between stages
+    Args:
+        value: DataFrame, Series, array, raw bytes or any picklable object
+    Returns:
+        fingerprint (`str`): Hex digest of the content
+    """
+    digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+        digest.update(repr(list(value.columns)).encode())
+    elif isinstance(value, pd.Series):
+        digest.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+        digest.update(repr(value.name).encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(np.ascontiguousarray(value).tobytes())
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+    elif isinstance(value, bytes):
+        digest.update(value)
+    else:
+        digest.update(pickle.dumps(value))
+
+    return digest.hexdigest()
+
+
+def source_fingerprint(directory: str = SOURCE_DIR) -> str:
+    """Hash the code of every module of a package
+    Args:
+        directory (`str`): Directory of the package
+    Returns:
+        fingerprint (`str`): Hex digest of the names and contents of its Python files
+    """
+    code = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            code.update(name.encode())
+            with open(os.path.join(directory, name), "rb") as file:
+                code.update(file.read())
+
+    return code.hexdigest()
+
+
+def stage_key(stage: Stage, config: dict, input_fingerprints: typing.Dict[str, str], code: str) -> str:
+    """Build the cache key of a stage from its config section, its inputs and the code that runs it
+    Args:
+        stage (`Stage`): The stage
+        config (`dict`): Dictionary of configurations
+        input_fingerprints (`dict`): Fingerprint of every input of the stage
+        code (`str`): Fingerprint of the code of the pipeline, see `source_fingerprint`. The whole src package is
+                      hashed, since the steps get much of their behavior from helper modules
+    Returns:
+        key (`str`): Short hex digest identifying the outputs of the stage
+    """
+    payload = json.dumps({"stage": stage.name,
+                          "config": config.get(stage.name),
+                          "inputs": input_fingerprints,
+                          "code": code}, sort_keys=True, default=str)
+
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _path(config: dict, path: str) -> str:
+    return artifact_path(path, config_format(config))
+
+
+def _run_preprocess(config: dict, values: dict) -> dict:
+    raw = read_table(io.BytesIO(values["raw"]), fmt=artifact_format(config["preprocess"]["load_path"]))
+    return {"cleaned": preprocess_data.filter_outliers(raw, rules_from_config(config["preprocess"]))}
+
+
+def _persist_preprocess(config: dict, values: dict) -> None:
+    preprocess_data.save_cleaned_data(values["cleaned"], _path(config, config["preprocess"]["save_path"]))
+
+
+def _run_get_features(config: dict, values: dict) -> dict:
+    cfg = config["get_features"]
+    features = generate_features.extract_features(values["cleaned"], cfg["features_column"])
+    scaled_features, scaler = generate_features.fit_scaler(features)
+    # the target is read back from csv by the step-by-step pipeline, which drops the index
+    target = generate_features.extract_target(values["cleaned"], cfg["target_column"]).reset_index(drop=True)
+    return {"features": scaled_features, "target": target, "scaler": scaler}
+
+
+def _persist_get_features(config: dict, values: dict) -> None:
+    cfg = config["get_features"]
+    generate_features.save_scaler(values["scaler"], cfg["scaler_path"])
+    generate_features.save_data(values["features"], _path(config, cfg["feature_path"]))
+    generate_features.save_data(values["target"], _path(config, cfg["target_path"]))
+
+
+def _run_train(config: dict, values: dict) -> dict:
+    features, target = values["features"], values["target"].to_frame()
+    split = dict(config["train"]["data_split"], save_path=None)
+    x_train, x_test, y_train, y_test = train_model.data_split(features, target, features.columns, target.columns,
+                                                              **split)
+    model = train_model.model_train(x_train, y_train, **dict(config["train"]["model_train"], save_path=None))
+    return {"x_train": x_train, "x_test": x_test, "y_train": y_train, "y_test": y_test, "model": model}
+
+
+def _persist_train(config: dict, values: dict) -> None:
+    cfg = config["train"]
+    train_model.save_split(values["x_train"], values["x_test"], values["y_train"], values["y_test"],
+                           values["x_train"].columns, values["y_train"].columns, cfg["data_split"]["save_path"],
+                           config_format(config) or "csv")
+    train_model.save_model(values["model"], cfg["model_train"]["save_path"])
+    if "export" in cfg:
+        train_model.export_model(values["model"], cfg["model_train"]["initial_features"],
+                                 **dict(cfg["export"], scaler=values["scaler"]))
+
+
+def _run_predict(config: dict, values: dict) -> dict:
+    model_test = dict(config["predict"]["model_test"], save_path=None)
+    return {"predictions": score_model.model_test(values["model"], values["x_test"], **model_test)}
+
+
+def _persist_predict(config: dict, values: dict) -> None:
+    score_model.save_predictions(values["predictions"], config["predict"]["model_test"]["save_path"])
+
+
+def _run_evaluate(config: dict, values: dict) -> dict:
+    n_features = len(config["train"]["model_train"]["initial_features"])
+    outputs = {"metrics": evaulate_model.model_evaluate(values["y_test"], values["predictions"],
+                                                        n_features=n_features,
+                                                        bootstrap=config["evaluate"].get("bootstrap")),
+               "comparison": None}
+    compare = config["evaluate"].get("compare_backends")
+    if compare:
+        outputs["comparison"] = evaulate_model.compare_backends(
+            compare["backends"], values["x_train"], values["y_train"], values["x_test"], values["y_test"],
+            values["scaler"], config["train"]["model_train"]["initial_features"],
+            config["train"]["model_train"].get("random_state"), compare.get("batch_size", 1000),
+            compare.get("repeats", 200))
+    return outputs
+
+
+def _persist_evaluate(config: dict, values: dict) -> None:
+    evaulate_model.save_metrics(values["metrics"], config["evaluate"]["save_path"])
+    if values["comparison"] is not None:
+        evaulate_model.save_comparison(values["comparison"], config["evaluate"]["compare_backends"]["save_path"])
+
+
+# The stages of `run.py all` in the order they run. The train stage also reads the scaler, to export
+# it together with the model, and the evaluate stage reads the split to compare other model backends on it
+STAGES = [Stage("preprocess", ("raw",), ("cleaned",),
+                _run_preprocess, _persist_preprocess),
+          Stage("get_features", ("cleaned",), ("features", "target", "scaler"),
+                _run_get_features, _persist_get_features),
+          Stage("train", ("features", "target", "scaler"),
+                ("x_train", "x_test", "y_train", "y_test", "model"),
+                _run_train, _persist_train),
+          Stage("predict", ("model", "x_test"), ("predictions",),
+                _run_predict, _persist_predict),
+          Stage("evaluate", ("y_test", "predictions", "x_train", "y_train", "x_test", "scaler"),
+                ("metrics", "comparison"), _run_evaluate, _persist_evaluate)]
+
+
+def run_pipeline(config: dict, cache_dir: typing.Optional[str] = None, persist: bool = True) \
+        -> typing.Tuple[dict, typing.List[dict]]:
+    """Run every stage in one process, passing the outputs of a stage to the next ones in memory
+        Args:
+            config (`dict`): Dictionary of configurations
+            cache_dir (`str`): Directory of the stage cache, None disables the cache. A stage whose config
+                               section, inputs and code match a cached run is skipped and its outputs are
+                               loaded from the cache
+            persist (`bool`): Whether to write the artifacts of every stage, cached or not, to the paths in the
+                              configuration once all stages have run
+        Returns:
+            values (`dict`): Every value produced by the pipeline, keyed by name
+            report (`list` of `dict`): Stage name, status ("ran" or "cached"), cache key and wall time of every stage
+    """
+    if config["preprocess"].get("database"):
+        raise ValueError("run.py all reads the raw data file, run the steps one by one to read the UserInputs table")
+    for (section, setting), behavior in IGNORED_SETTINGS.items():
+        if (config.get(section) or {}).get(setting):
+            logger.warning("run.py all ignores %s.%s: %s", section, setting, behavior)
+    load_path = config["preprocess"]["load_path"]
+    try:
+        with open_file(load_path, "rb") as file:
+            values = {"raw": file.read()}
+    except FileNotFoundError as e:
+        logger.error("The specified path %s does not contain the file", load_path)
+        raise e
+    fingerprints = {"raw": fingerprint(values["raw"])}
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    code = source_fingerprint()
+    report = []
+    ran = []
+    for stage in STAGES:
+        start = time.perf_counter()
+        key = stage_key(stage, config, {name: fingerprints[name] for name in stage.inputs}, code)
+        cache_path = os.path.join(cache_dir, "%s-%s.pkl" % (stage.name, key)) if cache_dir is not None else None
+
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, "rb") as file:
+                entry = pickle.load(file)
+            status = "cached"
+        else:
+            outputs = stage.run(config, values)
+            entry = {"outputs": outputs, "fingerprints": {name: fingerprint(value) for name, value in outputs.items()}}
+            ran.append((stage, entry, cache_path))
+            status = "ran"
+
+        values.update(entry["outputs"])
+        fingerprints.update(entry["fingerprints"])
+        seconds = time.perf_counter() - start
+        report.append({"stage": stage.name, "status": status, "key": key, "seconds": seconds})
+        logger.info("Stage %s %s in %0.3f seconds (key %s)", stage.name, status, seconds, key)
+
+    # artifacts are written once every stage has succeeded
+    start = time.perf_counter()
+    for stage, entry, cache_path in ran:
+        if cache_path is not None:
+            with open(cache_path, "wb") as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+    # the outputs of cached stages are written too, the files may hold the outputs of another configuration
+    if persist:
+        for stage in STAGES:
+            stage.persist(config, values)
+    report.append({"stage": "persist", "status": "ran" if persist else "skipped", "key": None,
+                   "seconds": time.perf_counter() - start})
+
+    return values, report
+
+
+def format_report(report: typing.List[dict]) -> str:
+    """Format the stage report of `run_pipeline` as a table
+        Args:
+            report (`list` of `dict`): Output of `run_pipeline`
+        Returns:
+            table (`str`): Human readable report
+    """
+    lines = ["%-14s %-8s %10s" % ("stage", "status", "seconds")]
+    lines += ["%-14s %-8s %10.3f" % (entry["stage"], entry["status"], entry["seconds"]) for entry in report]
+    lines.append("%-14s %-8s %10.3f" % ("total", "", sum(entry["seconds"] for entry in report)))
+
+    return "\n".join(lines)
@@ -0,0 +1,110 @@
+import collections
+import logging
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """LRU cache of predictions with a time to live, keyed on the rounded measurements and the model fingerprint.
+
+    `invalidate` drops every cached prediction, the app calls it when the model registry swaps in a new model.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600, decimals: int = 2, fingerprint: str = ""):
+        """
+            Args:
+                maxsize (int): Maximum number of cached predictions, the least recently used is evicted first
+                ttl (float): Number of seconds a prediction stays valid
+                decimals (int): Number of decimals the measurements are rounded to in the key
+                fingerprint (str): Fingerprint of the serving model
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.decimals = decimals
+
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.fingerprint = fingerprint
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def invalidate(self, fingerprint: str) -> None:
+        """Drop every cached prediction and key new ones on a new model fingerprint
+        Args:
+            fingerprint (str): Fingerprint of the model that serves from now on
+        Returns: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.fingerprint = fingerprint
+            self.counters["invalidations"] += 1
+        logger.info("Prediction cache invalidated, model fingerprint is now %s", fingerprint)
+
+    def key(self, features: typing.Sequence[float], fingerprint: typing.Optional[str] = None) -> tuple:
+        """Build the cache key of a row of measurements
+        Args:
+            features (`list` of `float`): Raw measurements
+            fingerprint (str): Fingerprint of the model making the prediction, the current one by default
+        Returns:
+            key (tuple): Model fingerprint followed by the rounded measurements
+        """
+        fingerprint = self.fingerprint if fingerprint is None else fingerprint
+        return (fingerprint,) + tuple(round(value, self.decimals) for value in features)
+
+    def get(self, features: typing.Sequence[float], fingerprint: typing.Optional[str] = None) -> typing.Optional[float]:
+        """Look up the cached prediction of a row of measurements
+        Args:
+            features (`list` of `float`): Raw measurements
+            fingerprint (str): Fingerprint of the model making the prediction, the current one by default
+        Returns:
+            prediction (float): Cached prediction, or None if there is no valid one
+        """
+        now = time.monotonic()
+        key = self.key(features, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                self.counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[0]
+
+    def put(self, features: typing.Sequence[float], prediction: float,
+            fingerprint: typing.Optional[str] = None) -> None:
+        """Cache the prediction of a row of measurements
+        Args:
+            features (`list` of `float`): Raw measurements
+            prediction (float): Prediction of the model for the measurements
+            fingerprint (str): Fingerprint of the model that made the prediction, the current one by default.
+                               Predictions of a model that has since been replaced are not cached
+        Returns: None
+        """
+        if self.maxsize <= 0:
+            return
+        key = self.key(features, fingerprint)
+        with self._lock:
+            if key[0] != self.fingerprint:
+                return
+            self._entries[key] = (prediction, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Report the size, fingerprint and hit/miss counters of the cache
+        Returns:
+            stats (dict): Counters, current size, maximum size and model fingerprint
+        """
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, size=len(self._entries), maxsize=self.maxsize,
+                        hit_rate=self.counters["hits"] / lookups if lookups else 0.,
+                        fingerprint=self.fingerprint)
@@ -1,9 +1,22 @@
+import json
 import logging
+import os
+import time
+import typing
 
 import pandas as pd
 
+from src.artifact_io import (TableWriter, artifact_path, config_format, iter_table, open_file, path_exists, read_table,
+                             write_table)
+from src.outlier_rules import OutlierRules, rules_from_config
+
 logger = logging.getLogger(__name__)
 
+# Names of the columns of the raw data for the columns of the UserInputs and UserLabels tables
+DATABASE_COLUMNS = {"age": "Age", "weight": "Weight", "height": "Height", "neck": "Neck", "chest": "Chest",
+                    "abdomen": "Abdomen", "hip": "Hip", "thigh": "Thigh", "knee": "Knee", "ankle": "Ankle",
+                    "biceps": "Biceps", "forearm": "Forearm", "wrist": "Wrist", "body_fat": "BodyFat"}
+
 
 def remove_outliers(data: pd.DataFrame, column_name: str, minimum: float, maximum: float) -> pd.DataFrame:
     """ Remove outliers from the specified column based on minimum and maximum value specified
@@ -15,10 +28,10 @@ def remove_outliers(data: pd.DataFrame, column_name: str, minimum: float, maximu
              Returns:
                 data (`:obj:`pd.DataFrame`): Dataframe with no outlier
     """
-    # drop values smaller than the minimum and larger than the maximum
+    # drop values smaller than the minimum and larger than the maximum with a single mask
     try:
-        df = data.drop(data[data[column_name] < minimum].index)
-        df = df.drop(data[data[column_name] > maximum].index)
+        column = data[column_name]
+        df = data[~((column < minimum) | (column > maximum))]
     except KeyError as e:
         logger.error("The key %s does not exist in the data", str(e))
         raise e
@@ -28,18 +41,34 @@ def remove_outliers(data: pd.DataFrame, column_name: str, minimum: float, maximu
     return df
 
 
+def filter_outliers(data: pd.DataFrame, rules: typing.List[dict]) -> pd.DataFrame:
+    """ Remove the rows any of the outlier rules rejects, evaluating all rules as one mask
+             Args:
+                data (`:obj:`pd.DataFrame`): Dataframe
+                rules (`list` of `dict`): Outlier rules, see `src.outlier_rules.OutlierRules`
+
+             Returns:
+                data (`:obj:`pd.DataFrame`): Dataframe with no outlier
+    """
+    outliers = OutlierRules(rules).fit(data)
+    cleaned = outliers.apply(data)
+    log_outlier_report(outliers)
+
+    return cleaned
+
+
 def save_cleaned_data(data: pd.DataFrame, save_path: str) -> None:
     """ Save cleaned data to the specified path
              Args:
                 data (`:obj:`pd.DataFrame`): Cleaned dataframe
-                save_path (`str`): The path to save the cleaned data
+                save_path (`str`): The path to save the cleaned data, its extension selects the format
 
              Returns:
                 None
     """
     # save the data to the save_path
     try:
-        data.to_csv(save_path, index=False)
+        write_table(data, save_path)
     except FileNotFoundError as e:
         logger.error("The specified path %s does not exist", save_path)
         raise e
@@ -48,18 +77,152 @@ def save_cleaned_data(data: pd.DataFrame, save_path: str) -> None:
         logger.debug("The shape of the cleaned data is %s", str(data.shape))
 
 
-def preprocess_data(config: dict) -> pd.DataFrame:
+def log_outlier_report(outliers: OutlierRules) -> None:
+    """ Log how many rows every outlier rule rejected
+             Args:
+                outliers (`OutlierRules`): Rules applied to the data
+
+             Returns:
+                None
+    """
+    report = outliers.report()
+    for rule in report["rules"]:
+        logger.info("Outlier rule %s rejected %d of %d rows", rule["name"], rule["rejected"], report["rows"])
+    logger.info("Kept %d of %d rows after %d outlier rules", report["kept"], report["rows"], len(report["rules"]))
+
+
+def preprocess_chunks(load_path: str, save_path: str, rules: typing.List[dict], chunksize: int) -> dict:
+    """ Preprocess the raw data chunk by chunk, so that memory use does not grow with the size of the data
+             Args:
+                load_path (`str`): The path of the raw data
+                save_path (`str`): The path to save the cleaned data, its extension selects the format
+                rules (`list` of `dict`): Outlier rules, see `src.outlier_rules.OutlierRules`. Rules fitted on
+                                          statistics of the data take a first pass over their columns only
+                chunksize (`int`): Number of rows read at a time
+
+             Returns:
+                stats (`dict`): Number of rows read and kept, number of chunks, rows per second and the
+                                rejections of every outlier rule
+    """
+    start = time.perf_counter()
+    outliers = OutlierRules(rules)
+    if not outliers.fitted:
+        outliers.fit_chunks(iter_table(load_path, chunksize, columns=outliers.columns))
+
+    with TableWriter(save_path) as writer:
+        for chunk in iter_table(load_path, chunksize):
+            writer.write(outliers.apply(chunk))
+
+    seconds = time.perf_counter() - start
+    stats = {"read": outliers.rows, "kept": writer.rows, "chunks": writer.chunks, "seconds": seconds,
+             "rows_per_second": outliers.rows / seconds if seconds > 0 else float("inf"),
+             "rules": outliers.report()["rules"]}
+    log_outlier_report(outliers)
+    logger.info("Successfully preprocess %d rows in %d chunks, %0.0f rows per second, saved as %s",
+                outliers.rows, writer.chunks, stats["rows_per_second"], save_path)
+
+    return stats
+
+
+def preprocess_database(database_config: dict, save_path: str, rules: typing.List[dict]) -> dict:
+    """ Preprocess the rows added to the UserInputs table since the last run and append them to the cleaned data
+             Args:
+                database_config (`dict`): The `preprocess.database` section of the configuration, with the
+                                          `engine_string` (the SQLALCHEMY_DATABASE_URI environment variable
+                                          if null), whether to read `labeled` inputs only, the `chunksize`
+                                          and the `watermark_path` where the last id read is kept, the id
+                                          of the UserLabels row for labeled inputs
+                save_path (`str`): The path of the cleaned data, its extension selects the format
+                rules (`list` of `dict`): Outlier rules, see `src.outlier_rules.OutlierRules`. Rules fitted on
+                                          statistics of the data are fitted on the new rows only
+
+             Returns:
+                stats (`dict`): Number of rows read and kept, the ids read and the rejections of every
+                                outlier rule. A first run that keeps no rows, e.g. because no input is
+                                labeled yet, raises ValueError and saves no watermark
+    """
+    # the database layer is only imported when the pipeline reads from the database
+    from src.add_bodymeasurement import read_user_inputs
+
+    engine_string = database_config.get("engine_string") or os.environ.get("SQLALCHEMY_DATABASE_URI")
+    if not engine_string:
+        raise ValueError("Set preprocess.database.engine_string or the SQLALCHEMY_DATABASE_URI environment variable")
+    watermark_path = database_config["watermark_path"]
+
+    # without cleaned data to append to, every row is read again
+    since_id = 0
+    if path_exists(save_path) and path_exists(watermark_path):
+        with open_file(watermark_path, "r") as file:
+            since_id = json.load(file)["last_id"]
+
+    labeled = database_config.get("labeled", True)
+    key = "label_id" if labeled else "id"
+
+    def read(columns: typing.Optional[typing.List[str]] = None) -> typing.Iterator[pd.DataFrame]:
+        for chunk in read_user_inputs(engine_string, database_config.get("chunksize", 10000), since_id,
+                                      labeled, columns):
+            yield chunk.rename(columns=DATABASE_COLUMNS)
+
+    outliers = OutlierRules(rules)
+    if not outliers.fitted:
+        measurements = {raw: column for column, raw in DATABASE_COLUMNS.items() if column != "body_fat"}
+        outliers.fit_chunks(read([measurements[column] for column in outliers.columns if column in measurements]))
+
+    last_id = since_id
+    with TableWriter(save_path, append=since_id > 0) as writer:
+        for chunk in read():
+            last_id = int(chunk[key].iloc[-1])
+            writer.write(outliers.apply(chunk.drop(columns=["id", "label_id"], errors="ignore")))
+
+    # the watermark is only saved with cleaned data for the next steps to read
+    if since_id == 0 and writer.rows == 0:
+        logger.error("No row of the UserInputs table was kept (%d read, labeled only: %s), %s is not written",
+                     outliers.rows, labeled, save_path)
+        raise ValueError("No rows of the UserInputs table to preprocess yet, label some inputs first")
+
+    try:
+        with open_file(watermark_path, "w") as file:
+            json.dump({"last_id": last_id}, file)
+    except FileNotFoundError as e:
+        logger.error("The specified path %s does not exist", watermark_path)
+        raise e
+
+    stats = {"read": outliers.rows, "kept": writer.rows, "first_id": since_id + 1, "last_id": last_id,
+             "rules": outliers.report()["rules"]}
+    log_outlier_report(outliers)
+    logger.info("Successfully preprocess %d new rows of the UserInputs table, ids %d to %d, %s %s",
+                outliers.rows, since_id + 1, last_id, "appended to" if since_id else "saved as", save_path)
+
+    return stats
+
+
+def preprocess_data(config: dict) -> typing.Optional[pd.DataFrame]:
     """ Preprocess the data for model training
              Args:
-                config (`dict`): Dictionary of configurations
+                config (`dict`): Dictionary of configurations. If `preprocess.database` is set, the new rows of
+                                 the UserInputs table are read instead of the raw data file, see
+                                 `preprocess_database`. If `preprocess.chunksize` is set, the raw data is
+                                 processed in chunks of that many rows and never fully loaded
 
              Returns:
-                cleaned (`:obj:`pd.DataFrame`):Preprocessed dataset
+                cleaned (`:obj:`pd.DataFrame`):Preprocessed dataset, None when read from the database or
+                                                processed in chunks
     """
+    save_path = artifact_path(config["preprocess"]["save_path"], config_format(config))
+    if config["preprocess"].get("database"):
+        preprocess_database(config["preprocess"]["database"], save_path, rules_from_config(config["preprocess"]))
+        return None
+
+    chunksize = config["preprocess"].get("chunksize")
+    if chunksize:
+        preprocess_chunks(config["preprocess"]["load_path"], save_path, rules_from_config(config["preprocess"]),
+                          chunksize)
+        return None
+
     # load raw data
     try:
         path = config["preprocess"]["load_path"]
-        raw = pd.read_csv(path)
+        raw = read_table(path)
     except FileNotFoundError as e:
         logger.error("The specified path %s does not contain the file", path)
         return e
@@ -67,8 +230,8 @@ def preprocess_data(config: dict) -> pd.DataFrame:
         logger.info("Successfully load the raw data from path %s", path)
 
     # remove outliers
-    cleaned = remove_outliers(raw, **config["preprocess"]["remove_outliers"])
+    cleaned = filter_outliers(raw, rules_from_config(config["preprocess"]))
     # save preprocessed data at the specified path
-    save_cleaned_data(cleaned, config["preprocess"]["save_path"])
+    save_cleaned_data(cleaned, save_path)
 
     return cleaned
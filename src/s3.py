@@ -1,14 +1,36 @@
+import concurrent.futures
+import hashlib
+import io
 import logging.config
+import os
 import re
+import shutil
 import typing
 
 import boto3
 import botocore
+from boto3.s3.transfer import TransferConfig
 
 # Adapted from: https://github.com/MSIA/2022-msia423/blob/main/aws-s3/s3.py
 
 logger = logging.getLogger(__name__)
 
+# Part size of multipart transfers, smaller files are sent in a single request
+CHUNK_SIZE = 8 * 1024 * 1024
+# Parts of one file transferred at the same time
+MAX_CONCURRENCY = 10
+# Files of a prefix synced at the same time
+MAX_WORKERS = 8
+# User metadata key holding the MD5 digest of an uploaded file, its ETag is not an MD5 for multipart uploads
+MD5_METADATA = "md5"
+# Part sizes in MiB of common S3 clients, tried when comparing a file with the ETag of a multipart upload
+ETAG_PART_SIZES = (8, 16, 5)
+
+# One client per process and endpoint, boto3 clients are thread safe but cannot be shared with forked processes
+_clients = {}
+# Settings of the s3:// paths of the configuration, see `configure`
+_settings = {"cache_dir": None, "endpoint_url": None}
+
 
 def parse_s3(s3path: str) -> typing.Tuple[str, str]:
     """
@@ -28,45 +50,470 @@ def parse_s3(s3path: str) -> typing.Tuple[str, str]:
     return s3bucket, s3path
 
 
-def upload_file_to_s3(local_path: str, s3path: str) -> None:
+def get_client(endpoint_url: typing.Optional[str] = None):
+    """
+       Get the S3 client of this process, creating it on first use
+       Args:
+           endpoint_url (str): URL of an S3 compatible service, None for AWS
+       Returns:
+           client (:obj:`botocore.client.S3`): the S3 client
+       """
+    key = (os.getpid(), endpoint_url)
+    if key not in _clients:
+        _clients[key] = boto3.session.Session().client("s3", endpoint_url=endpoint_url)
+
+    return _clients[key]
+
+
+def transfer_config(chunk_size: int = CHUNK_SIZE, max_concurrency: int = MAX_CONCURRENCY) -> TransferConfig:
+    """
+       Build the multipart settings of a transfer
+       Args:
+           chunk_size (int): size in bytes of every part, smaller files are sent in one request
+           max_concurrency (int): number of threads transferring the parts of one file
+       Returns:
+           config (:obj:`TransferConfig`): the transfer settings
+       """
+    return TransferConfig(multipart_threshold=chunk_size, multipart_chunksize=chunk_size,
+                          max_concurrency=max_concurrency, use_threads=max_concurrency > 1)
+
+
+def file_md5(local_path: str, chunk_size: int = CHUNK_SIZE) -> typing.Tuple[str, typing.List[bytes]]:
     """
-       Upload the file in local path to s3
+       Hash a local file part by part
+       Args:
+           local_path (str): the path of the file
+           chunk_size (int): size in bytes of every part
+       Returns:
+           md5 (str): hex MD5 digest of the whole file
+           parts (list): MD5 digest of every part
+       """
+    digest = hashlib.md5()
+    parts = []
+    with open(local_path, "rb") as file:
+        for part in iter(lambda: file.read(chunk_size), b""):
+            digest.update(part)
+            parts.append(hashlib.md5(part).digest())
+
+    return digest.hexdigest(), parts
+
+
+def local_etag(local_path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+       Compute the ETag S3 gives a file uploaded with the given part size
+       Args:
+           local_path (str): the path of the file
+           chunk_size (int): size in bytes of every part
+       Returns:
+           etag (str): the MD5 of a file sent in one request, the MD5 of the part digests followed by the
+               number of parts otherwise
+       """
+    md5, parts = file_md5(local_path, chunk_size)
+    if os.path.getsize(local_path) < chunk_size:
+        return md5
+
+    return _multipart_etag(parts)
+
+
+def _multipart_etag(parts: typing.List[bytes]) -> str:
+    """Combine the MD5 digests of the parts of a multipart upload into its ETag"""
+    return "%s-%d" % (hashlib.md5(b"".join(parts)).hexdigest(), len(parts))
+
+
+def _head_object(client, s3bucket: str, s3_just_path: str) -> typing.Optional[dict]:
+    """Read the metadata of an object, None if it does not exist"""
+    try:
+        return client.head_object(Bucket=s3bucket, Key=s3_just_path)
+    except botocore.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise e
+
+
+def is_unchanged(local_path: str, head: typing.Optional[dict], chunk_size: int = CHUNK_SIZE) -> bool:
+    """
+       Check if a local file has the content of an S3 object
+       Args:
+           local_path (str): the path of the local file
+           head (dict): response of `head_object` for the S3 object, None if it does not exist
+           chunk_size (int): size in bytes of the parts the object was uploaded with
+       Returns:
+           unchanged (bool): True if both exist with the same size and the MD5 recorded at upload, or else the
+               ETag, matches the file
+       """
+    if head is None or not os.path.isfile(local_path) or head["ContentLength"] != os.path.getsize(local_path):
+        return False
+
+    md5 = head.get("Metadata", {}).get(MD5_METADATA)
+    if md5 is not None:
+        return file_md5(local_path, chunk_size)[0] == md5
+
+    etag = head["ETag"].strip('"')
+    if "-" not in etag:
+        return file_md5(local_path, chunk_size)[0] == etag
+    # the part size of an object uploaded by another client is unknown, try the usual ones giving as many parts
+    n_parts, mib = int(etag.rsplit("-", 1)[1]), 1024 * 1024
+    guess = -(-head["ContentLength"] // n_parts // mib) * mib
+    for part_size in dict.fromkeys([chunk_size] + [size * mib for size in ETAG_PART_SIZES] + [guess]):
+        if -(-head["ContentLength"] // part_size) == n_parts and \
+                _multipart_etag(file_md5(local_path, part_size)[1]) == etag:
+            return True
+
+    return False
+
+
+def upload_file_to_s3(local_path: str, s3path: str, chunk_size: int = CHUNK_SIZE,
+                      max_concurrency: int = MAX_CONCURRENCY, force: bool = False,
+                      endpoint_url: typing.Optional[str] = None) -> bool:
+    """
+       Upload the file in local path to s3, unless the object there already has its content
        Args:
            local_path (str): the path that points to the local data
            s3path (str): the s3 path that the data will be uploaded to
-       Returns: None
+           chunk_size (int): size in bytes of every part of a multipart upload
+           max_concurrency (int): number of parts uploaded at the same time
+           force (bool): upload even if the object is unchanged
+           endpoint_url (str): URL of an S3 compatible service, None for AWS
+       Returns:
+           uploaded (bool): False if the upload was skipped
        """
     s3bucket, s3_just_path = parse_s3(s3path)
-
-    s_3 = boto3.resource("s3")
-    bucket = s_3.Bucket(s3bucket)
+    client = get_client(endpoint_url)
 
     try:
-        bucket.upload_file(local_path, s3_just_path)
+        if not force and is_unchanged(local_path, _head_object(client, s3bucket, s3_just_path), chunk_size):
+            logger.info("%s is unchanged in %s, skipped the upload", local_path, s3path)
+            return False
+        md5 = file_md5(local_path, chunk_size)[0]
+        client.upload_file(local_path, s3bucket, s3_just_path, ExtraArgs={"Metadata": {MD5_METADATA: md5}},
+                           Config=transfer_config(chunk_size, max_concurrency))
     except botocore.exceptions.NoCredentialsError as e:
         logger.error("Please provide AWS credentials via AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY env variables.")
         raise e
     else:
         logger.info("Data uploaded from %s to %s", local_path, s3path)
+        return True
 
 
-def download_file_from_s3(local_path: str, s3path: str) -> None:
+def download_file_from_s3(local_path: str, s3path: str, chunk_size: int = CHUNK_SIZE,
+                          max_concurrency: int = MAX_CONCURRENCY, force: bool = False,
+                          endpoint_url: typing.Optional[str] = None) -> bool:
     """
-        Download a data file from s3
+        Download a data file from s3, unless the local file already has its content
         Args:
             local_path (str): the path that will store the downloaded data
             s3path (str): the s3 path that the data will be downloaded from
-        Returns: None
+            chunk_size (int): size in bytes of every part of a multipart download
+            max_concurrency (int): number of parts downloaded at the same time
+            force (bool): download even if the local file is unchanged
+            endpoint_url (str): URL of an S3 compatible service, None for AWS
+        Returns:
+            downloaded (bool): False if the download was skipped
         """
     s3bucket, s3_just_path = parse_s3(s3path)
-
-    s_3 = boto3.resource("s3")
-    bucket = s_3.Bucket(s3bucket)
+    client = get_client(endpoint_url)
 
     try:
-        bucket.download_file(s3_just_path, local_path)
+        if not force and is_unchanged(local_path, _head_object(client, s3bucket, s3_just_path), chunk_size):
+            logger.info("%s is unchanged in %s, skipped the download", local_path, s3path)
+            return False
+        if os.path.dirname(local_path):
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        client.download_file(s3bucket, s3_just_path, local_path, Config=transfer_config(chunk_size, max_concurrency))
     except botocore.exceptions.NoCredentialsError as e:
         logger.error("Please provide AWS credentials via AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY env variables.")
         raise e
     else:
         logger.info("Data downloaded from %s to %s", s3path, local_path)
+        return True
+
+
+def _list_prefix(client, s3bucket: str, prefix: str) -> typing.List[str]:
+    """List the keys of all objects under a prefix"""
+    keys = []
+    for page in client.get_paginator("list_objects_v2").paginate(Bucket=s3bucket, Prefix=prefix):
+        keys.extend(item["Key"] for item in page.get("Contents", []) if not item["Key"].endswith("/"))
+    return keys
+
+
+def sync_prefix(local_dir: str, s3path: str, direction: str = "upload", max_workers: int = MAX_WORKERS,
+                chunk_size: int = CHUNK_SIZE, max_concurrency: int = MAX_CONCURRENCY, force: bool = False,
+                endpoint_url: typing.Optional[str] = None) -> dict:
+    """
+       Upload every file of a local directory under an s3 prefix, or download every object of the prefix
+       into the directory, transferring several files at the same time and skipping unchanged ones
+       Args:
+           local_dir (str): the local directory
+           s3path (str): the s3 prefix, such as s3://bucket/data/artifacts/
+           direction (str): "upload" or "download"
+           max_workers (int): number of files transferred at the same time
+           chunk_size (int): size in bytes of every part of a multipart transfer
+           max_concurrency (int): number of parts of one file transferred at the same time
+           force (bool): transfer unchanged files as well
+           endpoint_url (str): URL of an S3 compatible service, None for AWS
+       Returns:
+           stats (dict): number of files transferred and skipped
+       """
+    if direction not in ("upload", "download"):
+        raise ValueError("Unknown sync direction %s, expected 'upload' or 'download'" % direction)
+    s3bucket, prefix = parse_s3(s3path)
+    prefix = prefix.rstrip("/") + "/"
+    client = get_client(endpoint_url)
+
+    if direction == "upload":
+        relative_paths = [os.path.relpath(os.path.join(root, name), local_dir)
+                          for root, _, names in os.walk(local_dir) for name in names]
+    else:
+        relative_paths = [key[len(prefix):] for key in _list_prefix(client, s3bucket, prefix)]
+    transfer = upload_file_to_s3 if direction == "upload" else download_file_from_s3
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(transfer, os.path.join(local_dir, relative_path),
+                                   "s3://%s/%s%s" % (s3bucket, prefix, relative_path.replace(os.sep, "/")),
+                                   chunk_size, max_concurrency, force, endpoint_url)
+                   for relative_path in sorted(relative_paths)]
+        transferred = [future.result() for future in futures]
+
+    stats = {"transferred": sum(transferred), "skipped": len(transferred) - sum(transferred)}
+    logger.info("Synced %s with %s (%s): %d transferred, %d skipped", local_dir, s3path, direction,
+                stats["transferred"], stats["skipped"])
+    return stats
+
+
+def configure(cache_dir: typing.Optional[str] = None, endpoint_url: typing.Optional[str] = None) -> None:
+    """
+       Set how the s3:// paths of the configuration are read and written
+       Args:
+           cache_dir (str): local directory keeping a copy of every object read, keyed by its ETag, None to
+               stream every read from S3
+           endpoint_url (str): URL of an S3 compatible service, None for AWS
+       Returns: None
+       """
+    _settings.update(cache_dir=cache_dir, endpoint_url=endpoint_url)
+
+
+class S3Reader(io.RawIOBase):
+    """Reads an S3 object with ranged GET requests of at least `block_size` bytes.
+
+    It is seekable, so Parquet and Feather readers only fetch the footer and the columns they need. Small sequential
+    reads, such as those of the CSV parser, are served from the last block fetched. Every request is conditional on
+    the ETag the object had when it was opened, so a concurrent overwrite fails the read instead of mixing two
+    versions.
+    """
+
+    def __init__(self, client, s3bucket: str, s3_just_path: str, head: dict, block_size: int = CHUNK_SIZE):
+        """
+           Args:
+               client (:obj:`botocore.client.S3`): the S3 client
+               s3bucket (str): the s3 bucket name
+               s3_just_path (str): the key of the object
+               head (dict): response of `head_object` for the object
+               block_size (int): smallest number of bytes fetched by one request
+           """
+        super().__init__()
+        self.client = client
+        self.s3bucket = s3bucket
+        self.s3_just_path = s3_just_path
+        self.size = head["ContentLength"]
+        self.etag = head["ETag"]
+        self.block_size = block_size
+        self.position = 0
+        self._block_start = 0
+        self._block = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(start + offset, 0)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+        if not self._block_start <= self.position < self._block_start + len(self._block):
+            self._block_start = self.position
+            self._block = self.client.get_object(
+                Bucket=self.s3bucket, Key=self.s3_just_path, IfMatch=self.etag,
+                Range="bytes=%d-%d" % (self.position, max(end, self.position + self.block_size) - 1))["Body"].read()
+        offset = self.position - self._block_start
+        data = self._block[offset:offset + end - self.position]
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class S3Writer(io.RawIOBase):
+    """Writes an S3 object as a stream of multipart upload parts, so the file is never staged on disk.
+
+    An object smaller than one part is sent with a single PUT on `close`. `abort` drops the parts sent so far,
+    and the object is only created by a successful `close`.
+    """
+
+    def __init__(self, client, s3bucket: str, s3_just_path: str, chunk_size: int = CHUNK_SIZE):
+        """
+           Args:
+               client (:obj:`botocore.client.S3`): the S3 client
+               s3bucket (str): the s3 bucket name
+               s3_just_path (str): the key of the object
+               chunk_size (int): size in bytes of every part
+           """
+        super().__init__()
+        self.client = client
+        self.s3bucket = s3bucket
+        self.s3_just_path = s3_just_path
+        self.chunk_size = chunk_size
+        self.md5 = hashlib.md5()
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self.md5.update(data)
+        while len(self._buffer) >= self.chunk_size:
+            self._upload_part(bytes(self._buffer[:self.chunk_size]))
+            del self._buffer[:self.chunk_size]
+        return len(data)
+
+    def _upload_part(self, part: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(Bucket=self.s3bucket,
+                                                                  Key=self.s3_just_path)["UploadId"]
+        number = len(self._parts) + 1
+        response = self.client.upload_part(Bucket=self.s3bucket, Key=self.s3_just_path, UploadId=self._upload_id,
+                                           PartNumber=number, Body=part)
+        self._parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.client.put_object(Bucket=self.s3bucket, Key=self.s3_just_path, Body=bytes(self._buffer),
+                                       Metadata={MD5_METADATA: self.md5.hexdigest()})
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.client.complete_multipart_upload(Bucket=self.s3bucket, Key=self.s3_just_path,
+                                                      UploadId=self._upload_id, MultipartUpload={"Parts": self._parts})
+        except Exception as e:
+            self.abort()
+            raise e
+        finally:
+            super().close()
+
+    def abort(self) -> None:
+        """Drop the object instead of creating it"""
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.s3bucket, Key=self.s3_just_path, UploadId=self._upload_id)
+            self._upload_id = None
+        self._buffer.clear()
+        super().close()
+
+
+class S3BufferedWriter(io.BufferedWriter):
+    """Buffered `S3Writer` that aborts the upload when its `with` block raises, instead of creating a truncated object"""
+
+    def abort(self) -> None:
+        """Drop the object instead of creating it"""
+        self.raw.abort()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        return super().__exit__(exc_type, exc_value, traceback)
+
+
+class S3TextWriter(io.TextIOWrapper):
+    """Text stream over an `S3BufferedWriter`, which aborts the upload when its `with` block raises"""
+
+    def abort(self) -> None:
+        """Drop the object instead of creating it"""
+        self.buffer.abort()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        return super().__exit__(exc_type, exc_value, traceback)
+
+
+def exists(s3path: str) -> bool:
+    """
+       Check if an S3 object exists
+       Args:
+           s3path (str): the s3 path of the object
+       Returns:
+           exists (bool): whether the object exists
+       """
+    return _head_object(get_client(_settings["endpoint_url"]), *parse_s3(s3path)) is not None
+
+
+def remove(s3path: str) -> None:
+    """
+       Delete an S3 object, if it exists
+       Args:
+           s3path (str): the s3 path of the object
+       Returns:
+           None
+       """
+    s3bucket, s3_just_path = parse_s3(s3path)
+    get_client(_settings["endpoint_url"]).delete_object(Bucket=s3bucket, Key=s3_just_path)
+
+
+def open_s3(s3path: str, mode: str = "rb") -> typing.IO:
+    """
+       Open an S3 object as a file, without a local copy unless a cache directory is configured
+       Args:
+           s3path (str): the s3 path of the object
+           mode (str): "rb" or "wb", or "r" or "w" for text
+       Returns:
+           file (:obj:`typing.IO`): buffered reads of ranges of the object, or the local copy of the current version
+               of the object in the cache directory, or a stream of multipart upload parts, which creates the
+               object when it is closed and drops it when a `with` block on it raises
+       """
+    if mode.rstrip("bt") not in ("r", "w"):
+        raise ValueError("Unsupported mode %s for %s, S3 objects can only be read or written whole" % (mode, s3path))
+    s3bucket, s3_just_path = parse_s3(s3path)
+    client = get_client(_settings["endpoint_url"])
+
+    if mode.startswith("w"):
+        file = S3BufferedWriter(S3Writer(client, s3bucket, s3_just_path), buffer_size=1 << 20)
+        return file if "b" in mode else S3TextWriter(file)
+    else:
+        head = _head_object(client, s3bucket, s3_just_path)
+        if head is None:
+            logger.error("The specified path %s does not contain the file", s3path)
+            raise FileNotFoundError(s3path)
+        if _settings["cache_dir"] is not None:
+            return open(_cached_copy(client, s3bucket, s3_just_path, head), mode)
+        file = io.BufferedReader(S3Reader(client, s3bucket, s3_just_path, head))
+
+    return file if "b" in mode else io.TextIOWrapper(file)
+
+
+def _cached_copy(client, s3bucket: str, s3_just_path: str, head: dict) -> str:
+    """Download the version of an object with the given ETag into the cache directory once, return its path"""
+    name = "%s-%s%s" % (hashlib.sha256(("%s/%s" % (s3bucket, s3_just_path)).encode()).hexdigest()[:16],
+                        head["ETag"].strip('"'), os.path.splitext(s3_just_path)[1])
+    path = os.path.join(_settings["cache_dir"], name)
+    if not os.path.exists(path):
+        os.makedirs(_settings["cache_dir"], exist_ok=True)
+        # read through S3Reader, so the copy is the version with this ETag even if the object changes meanwhile
+        download_path = "%s.%d.tmp" % (path, os.getpid())
+        with S3Reader(client, s3bucket, s3_just_path, head) as source, open(download_path, "wb") as file:
+            shutil.copyfileobj(source, file, CHUNK_SIZE)
+        os.replace(download_path, path)
+        logger.info("Cached s3://%s/%s in %s", s3bucket, s3_just_path, path)
+    return path
@@ -1,29 +1,51 @@
+import collections
+import concurrent.futures
 import logging
+import os
 import pickle
+import time
 import typing
 
 import pandas as pd
 import numpy as np
 import sklearn
 
+from src.artifact_io import TableWriter, artifact_path, config_format, iter_table, open_file, read_table
+from src.model_backends import backend_for_model
+
 logger = logging.getLogger(__name__)
 
 
 def model_test(model: sklearn.base.BaseEstimator, x_test: pd.DataFrame, initial_features: typing.List[str],
-               save_path: str) -> None:
+               save_path: typing.Optional[str] = None) -> np.ndarray:
     """Generate predictions
         Args:
-            model (`sklearn.linear_model.LogisticRegression`): Trained model object
+            model (`sklearn.base.BaseEstimator`): Trained model object of one of `src.model_backends.BACKENDS`
             x_test (`pd.DataFrame`): x_test data
             initial_features (`list` of `str`): List of features that were trained on
+            save_path (`str`): The path to save the prediction result, None to keep it in memory only
+        Returns:
+            y_pred (`np.ndarray`): Prediction result
+        """
+    # generate predictions
+    y_pred = backend_for_model(model).predict(model, x_test[initial_features])
+    if save_path is not None:
+        save_predictions(y_pred, save_path)
+
+    return y_pred
+
+
+def save_predictions(y_pred: np.ndarray, save_path: str) -> None:
+    """Save the predictions
+        Args:
+            y_pred (`np.ndarray`): Prediction result
             save_path (`str`): The path to save the prediction result
         Returns:
             None
         """
-    # generate predictions
-    y_pred = model.predict(x_test[initial_features])
     try:
-        np.savetxt(save_path, y_pred)
+        with open_file(save_path, "w") as file:
+            np.savetxt(file, y_pred)
     except FileNotFoundError as e:
         logger.error("The specified path %s does not exist", save_path)
         raise e
@@ -31,6 +53,125 @@ def model_test(model: sklearn.base.BaseEstimator, x_test: pd.DataFrame, initial_
         logger.info("Successfully save the prediction result as %s", save_path)
 
 
+# Scorer of the worker processes of `score_chunks`, loaded once per process
+_scorer = None
+
+
+def load_scorer(model_path: str, scaler_path: str):
+    """Load a pickled model and its scaler as a scorer of raw measurements
+        Args:
+            model_path (`str`): The path of the pickled model of any backend in `src.model_backends`
+            scaler_path (`str`): The path of the pickled scaler the model's features were scaled with
+        Returns:
+            scorer (`LinearScorer` or `EstimatorScorer`): Scorer with a `predict` method
+        """
+    try:
+        with open_file(model_path, "rb") as file:
+            model = pickle.load(file)
+        with open_file(scaler_path, "rb") as file:
+            scaler = pickle.load(file)
+    except FileNotFoundError as e:
+        logger.error("The model or the scaler does not exist at %s, %s", model_path, scaler_path)
+        raise e
+
+    return backend_for_model(model).scorer(model, scaler)
+
+
+def _init_scorer(model_path: str, scaler_path: str) -> None:
+    global _scorer
+    _scorer = load_scorer(model_path, scaler_path)
+
+
+def _score_chunk(task: typing.Tuple[np.ndarray, np.ndarray]) -> typing.Tuple[np.ndarray, np.ndarray]:
+    ids, features = task
+    return ids, _scorer.predict(features)
+
+
+def score_chunks(chunks: typing.Iterable[typing.Tuple[np.ndarray, np.ndarray]], model_path: str, scaler_path: str,
+                 n_jobs: typing.Optional[int] = 1, max_pending: typing.Optional[int] = None) \
+        -> typing.Iterator[typing.Tuple[np.ndarray, np.ndarray]]:
+    """Score chunks of raw measurements in a pool of processes, in the order of the chunks
+        Args:
+            chunks (`iterator` of `tuple`): Pairs of ids and N x n_features matrices of raw measurements
+            model_path (`str`): The path of the pickled model
+            scaler_path (`str`): The path of the pickled scaler
+            n_jobs (`int`): Number of worker processes, -1 for one per CPU, 1 or None to score in this process
+            max_pending (`int`): Maximum number of chunks read ahead of the one being written, which bounds
+                                 memory, twice `n_jobs` if None
+        Returns:
+            results (`iterator` of `tuple`): Pairs of ids and predictions, chunk by chunk
+        """
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if not n_jobs or n_jobs <= 1:
+        _init_scorer(model_path, scaler_path)
+        for chunk in chunks:
+            yield _score_chunk(chunk)
+        return
+
+    max_pending = max_pending or 2 * n_jobs
+    with concurrent.futures.ProcessPoolExecutor(n_jobs, initializer=_init_scorer,
+                                                initargs=(model_path, scaler_path)) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_score_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def score_batch(batch_config: dict, model_path: str, initial_features: typing.List[str]) -> dict:
+    """Score a file or the UserInputs table of raw measurements chunk by chunk and write the predictions
+    with the id of every row as they come, so that memory does not grow with the number of rows
+        Args:
+            batch_config (`dict`): The `predict.batch` section of the configuration: the `load_path` of a CSV,
+                                   Parquet or Feather file or the `engine_string` of the database, the
+                                   `scaler_path`, the `id_column`, the `chunksize`, `n_jobs` and the
+                                   `save_path` of the predictions, whose extension sets their format
+            model_path (`str`): The path of the pickled model
+            initial_features (`list` of `str`): List of features the model was trained on, in order
+        Returns:
+            stats (`dict`): Number of rows and chunks scored, seconds and rows per second
+        """
+    chunksize = batch_config.get("chunksize", 100000)
+    id_column = batch_config.get("id_column", "id")
+    if batch_config.get("engine_string"):
+        from src.add_bodymeasurement import read_user_inputs
+        from src.preprocess_data import DATABASE_COLUMNS
+
+        source = (chunk.rename(columns=DATABASE_COLUMNS)
+                  for chunk in read_user_inputs(batch_config["engine_string"], chunksize))
+        id_column = "id"
+    else:
+        source = iter_table(batch_config["load_path"], chunksize)
+
+    def chunks() -> typing.Iterator[typing.Tuple[np.ndarray, np.ndarray]]:
+        offset = 0
+        for chunk in source:
+            # rows of a file without an id column are identified by their position
+            ids = chunk[id_column].to_numpy() if id_column in chunk else np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+            try:
+                yield ids, chunk[initial_features].to_numpy(dtype=float)
+            except KeyError as e:
+                logger.error("They key %s does not exist in the data to score", str(e))
+                raise e
+
+    start = time.perf_counter()
+    with TableWriter(batch_config["save_path"]) as writer:
+        for ids, predictions in score_chunks(chunks(), model_path, batch_config["scaler_path"],
+                                             batch_config.get("n_jobs", 1)):
+            writer.write(pd.DataFrame({id_column: ids, "prediction": predictions}))
+    seconds = time.perf_counter() - start
+
+    stats = {"rows": writer.rows, "chunks": writer.chunks, "seconds": seconds,
+             "rows_per_second": writer.rows / seconds if seconds else float("nan")}
+    logger.info("Scored %d rows in %d chunks in %.2f seconds, %.0f rows per second, saved as %s", stats["rows"],
+                stats["chunks"], seconds, stats["rows_per_second"], batch_config["save_path"])
+
+    return stats
+
+
 def predict(config: dict) -> None:
     """Score the provided model
         Args:
@@ -39,11 +180,16 @@ def predict(config: dict) -> None:
         Returns:
             None
     """
+    # score a large table of raw measurements chunk by chunk instead of x_test
+    if config["predict"].get("batch"):
+        score_batch(config["predict"]["batch"], config["predict"]["model_path"],
+                    config["predict"]["model_test"]["initial_features"])
+        return
 
     # load x_test
     try:
-        load_path = config["predict"]["load_path"]
-        x_test = pd.read_csv(load_path)
+        load_path = artifact_path(config["predict"]["load_path"], config_format(config))
+        x_test = read_table(load_path)
     except FileNotFoundError as e:
         logger.error("The file does not exist at %s", load_path)
         raise e
@@ -54,7 +200,8 @@ def predict(config: dict) -> None:
     # load the model
     try:
         model_path = config["predict"]["model_path"]
-        model = pickle.load(open(model_path, "rb"))
+        with open_file(model_path, "rb") as file:
+            model = pickle.load(file)
     except FileNotFoundError as e:
         logger.error("The model file does not exist at %s", model_path)
         raise e
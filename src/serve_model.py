@@ -0,0 +1,74 @@
+import logging
+import typing
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Order of the measurements expected by the scaler and the model
+FEATURE_NAMES = ["age", "weight", "height", "neck", "chest", "abdomen", "hip",
+                 "thigh", "knee", "ankle", "biceps", "forearm", "wrist"]
+
+# Label and pixel offset on the body fat reference image for each band
+BAND_LABELS = ["under 8%", "8-15%", "15-18%", "18-25%", "25% and over"]
+BAND_OFFSETS = [20, 82, 144, 206, 268]
+
+
+def body_fat_bands(predictions: np.ndarray) -> np.ndarray:
+    """ Find the body fat band index of every prediction
+    Args:
+        predictions (`np.ndarray`): Predicted body fat percentages
+
+    Returns:
+        bands (`np.ndarray`): Index into `BAND_LABELS` and `BAND_OFFSETS` for every prediction
+    """
+    predictions = np.asarray(predictions, dtype=float)
+    conditions = [predictions < 8,
+                  predictions < 15,
+                  predictions <= 18,
+                  predictions < 25]
+    return np.select(conditions, [0, 1, 2, 3], default=4)
+
+
+def body_fat_band(prediction: float) -> int:
+    """ Find the pixel offset on the reference image for a single prediction
+    Args:
+        prediction (`float`): Predicted body fat percentage
+
+    Returns:
+        offset (`int`): Pixel offset of the "You are here" marker
+    """
+    return BAND_OFFSETS[int(body_fat_bands(prediction))]
+
+
+def _to_float(value) -> float:
+    """Convert a JSON value to a float, NaN if it is missing or not numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def validate_records(records: typing.List[dict]) -> typing.Tuple[np.ndarray, np.ndarray, typing.List[typing.List[str]]]:
+    """ Convert a list of measurement records to a feature matrix in one pass
+    Args:
+        records (`list` of `dict`): Measurement records keyed by `FEATURE_NAMES`
+
+    Returns:
+        features (`np.ndarray`): N x 13 float matrix, NaN where a value is missing or not numeric
+        valid (`np.ndarray`): Boolean mask of the records that can be scored
+        errors (`list` of `list` of `str`): Names of the invalid fields of every record
+    """
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise TypeError("Records must be a list of JSON objects")
+
+    features = np.array([[_to_float(record.get(name)) for name in FEATURE_NAMES] for record in records],
+                        dtype=float).reshape(len(records), len(FEATURE_NAMES))
+    invalid = ~np.isfinite(features)
+    valid = ~invalid.any(axis=1)
+
+    names = np.array(FEATURE_NAMES)
+    errors = [[] if ok else names[row].tolist() for ok, row in zip(valid, invalid)]
+    logger.debug("%d of %d records are valid", int(valid.sum()), len(records))
+
+    return features, valid, errors
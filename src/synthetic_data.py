@@ -0,0 +1,101 @@
+import logging
+import os
+import typing
+
+import numpy as np
+import pandas as pd
+from scipy import special
+
+logger = logging.getLogger(__name__)
+
+
+def _decimals(values: np.ndarray, max_decimals: int = 4) -> int:
+    """Return the fewest decimals every value is written with, up to `max_decimals`"""
+    for decimals in range(max_decimals):
+        if np.allclose(values, values.round(decimals)):
+            return decimals
+    return max_decimals
+
+
+class MeasurementGenerator:
+    """Draws synthetic body measurements that keep the distribution of every column of a real table and the rank
+    correlations between them (a Gaussian copula).
+
+    Every column keeps its range and the number of decimals it is written with, since the values are interpolated
+    between its sorted real values, so e.g. the outlier rules of preprocess reject about the same share of rows.
+    """
+
+    def __init__(self, columns: typing.Sequence[str], sorted_values: np.ndarray, correlation: np.ndarray,
+                 decimals: typing.Sequence[int]):
+        """
+            Args:
+                columns (`list` of str): Names of the columns
+                sorted_values (:obj:`numpy.ndarray`): Real values of every column sorted, one column per column
+                correlation (:obj:`numpy.ndarray`): Correlation matrix of the normal scores of the columns
+                decimals (`list` of int): Number of decimals every column is rounded to
+        """
+        self.columns = list(columns)
+        self.sorted_values = sorted_values
+        self.correlation = correlation
+        self.decimals = list(decimals)
+
+    @classmethod
+    def fit(cls, data: pd.DataFrame) -> "MeasurementGenerator":
+        """Learn the distribution of every numeric column of a table and the correlations between them
+        Args:
+            data (:obj:`DataFrame <pandas.DataFrame>`): Real measurements, e.g. data/raw/bodyfat.csv
+        Returns:
+            generator (`MeasurementGenerator`): Generator of tables with the numeric columns of `data`
+        """
+        numeric = data.select_dtypes("number").dropna()
+        if numeric.shape[1] == 0 or len(numeric) < 2:
+            raise ValueError("At least two rows of numeric columns are needed to fit the generator, got %s"
+                             % (numeric.shape,))
+
+        values = numeric.to_numpy(dtype=float)
+        # normal scores of the ranks, whose correlations the samples keep whatever the distribution of a column
+        scores = special.ndtri((numeric.rank().to_numpy() - 0.5) / len(numeric))
+        correlation = np.atleast_2d(np.corrcoef(scores, rowvar=False))
+        decimals = [_decimals(values[:, index]) for index in range(values.shape[1])]
+        logger.info("Synthetic data generator fitted on %d rows of %d columns", *values.shape)
+        return cls(numeric.columns, np.sort(values, axis=0), correlation, decimals)
+
+    def sample(self, rows: int, seed: int = 0) -> pd.DataFrame:
+        """Draw a table of synthetic measurements
+        Args:
+            rows (int): Number of rows
+            seed (int): Seed of the random generator, the same seed draws the same table
+        Returns:
+            table (:obj:`DataFrame <pandas.DataFrame>`): The synthetic measurements, with the columns of the fitted
+                table
+        """
+        if rows < 0:
+            raise ValueError("The number of rows must not be negative, got %d" % rows)
+
+        rng = np.random.default_rng(seed)
+        scores = rng.multivariate_normal(np.zeros(len(self.columns)), self.correlation, size=rows, method="eigh")
+        levels = np.linspace(0., 1., len(self.sorted_values))
+        table = {}
+        for index, column in enumerate(self.columns):
+            table[column] = np.interp(special.ndtr(scores[:, index]), levels,
+                                      self.sorted_values[:, index]).round(self.decimals[index])
+        return pd.DataFrame(table, columns=self.columns)
+
+    def write_csv(self, path: str, rows: int, chunksize: int = 1000000, seed: int = 0) -> None:
+        """Write a CSV file of synthetic measurements chunk by chunk, so memory does not grow with the rows
+        Args:
+            path (str): Path of the CSV file
+            rows (int): Number of rows
+            chunksize (int): Number of rows drawn and written at once
+            seed (int): Seed of the first chunk, the next chunks use the following seeds
+        Returns:
+            None
+        """
+        try:
+            for chunk, offset in enumerate(range(0, max(rows, 1), chunksize)):
+                self.sample(min(chunksize, rows - offset), seed + chunk).to_csv(
+                    path, index=False, mode="w" if offset == 0 else "a", header=offset == 0)
+        except OSError as e:
+            logger.error("Could not write the synthetic data to %s", path)
+            raise e
+        logger.info("%d rows of synthetic data written to %s (%.1f MB)", rows, path, os.path.getsize(path) / 1e6)
@@ -1,17 +1,20 @@
 import logging
 import pickle
+import time
 import typing
 
 import pandas as pd
 import sklearn
 from sklearn import model_selection
-from sklearn import linear_model
+
+from src.artifact_io import artifact_path, config_format, open_file, read_table, remove_file, write_table
+from src.model_backends import backend_for_model, get_backend
 
 logger = logging.getLogger(__name__)
 
 
 def data_split(features: pd.DataFrame, target: pd.DataFrame, feature_columns: typing.List, target_column: str,
-               test_size: float, random_state: int, save_path: str) \
+               test_size: float, random_state: int, save_path: typing.Optional[str] = None, fmt: str = "csv") \
         -> typing.Tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
     """ Splits dataframe into train and test feature sets and targets.
             Args:
@@ -21,7 +24,9 @@ def data_split(features: pd.DataFrame, target: pd.DataFrame, feature_columns: ty
                 target_column (`str`): Column name of target variable
                 test_size (`float`): Fraction of set to randomly sample to create test data
                 random_state (`int`): Random state to make split reproducible
-                save_path (`str`): The path to save train and test feature sets and targets
+                save_path (`str`): The path to save train and test feature sets and targets, None to keep them
+                                   in memory only
+                fmt (`str`): Artifact format of the saved files, one of `src.artifact_io.FORMATS`
             Returns:
                 x_train (`pd.DataFrame`): Features for training dataset
                 x_test (`pd.DataFrame`): Features for testing dataset
@@ -40,83 +45,95 @@ def data_split(features: pd.DataFrame, target: pd.DataFrame, feature_columns: ty
     else:
         logger.info("Successfully split the train and test set")
 
-    try:
-        file_path = save_path + "x_train.csv"
-        x_train.to_csv(save_path + "x_train.csv", header=feature_columns, index=False)
-    except FileNotFoundError as e:
-        logger.error("The specified path %s does not exist", save_path)
-        raise e
-    else:
-        logger.info("Successfully save the x_train file as %s", file_path)
-        logger.debug("The shape of x_train is %s", str(x_train.shape))
-
-    try:
-        file_path = save_path + "x_test.csv"
-        x_test.to_csv(file_path, header=feature_columns, index=False)
-    except FileNotFoundError as e:
-        logger.error("The specified path %s does not exist", save_path)
-        raise e
-    else:
-        logger.info("Successfully save the x_test data as %s", file_path)
-        logger.debug("The shape of x_test is %s", str(x_test.shape))
+    if save_path is not None:
+        save_split(x_train, x_test, y_train, y_test, feature_columns, target_column, save_path, fmt)
 
-    try:
-        file_path = save_path + "y_train.csv"
-        y_train.to_csv(file_path, header=target_column, index=False)
-    except FileNotFoundError as e:
-        logger.error("The specified path %s does not exist", save_path)
-        raise e
-    else:
-        logger.info("Successfully save the y_train data as %s", file_path)
-        logger.debug("The shape of y_train is %s", str(y_train.shape))
+    return x_train, x_test, y_train, y_test
 
-    try:
-        file_path = save_path + "y_test.csv"
-        y_test.to_csv(file_path, header=target_column, index=False)
-    except FileNotFoundError as e:
-        logger.error("The specified path %s does not exist", file_path)
-        raise e
-    else:
-        logger.info("Successfully save the y_test data as %s", file_path)
-        logger.debug("The shape of y_test is %s", str(y_test.shape))
 
-    return x_train, x_test, y_train, y_test
+def save_split(x_train: pd.DataFrame, x_test: pd.DataFrame, y_train: pd.Series, y_test: pd.Series,
+               feature_columns: typing.List, target_column: str, save_path: str, fmt: str = "csv") -> None:
+    """ Save the train and test feature sets and targets
+            Args:
+                x_train (`pd.DataFrame`): Features for training dataset
+                x_test (`pd.DataFrame`): Features for testing dataset
+                y_train (`pd.Series`): True target values for training dataset
+                y_test (`pd.Series`): True target values for testing dataset
+                feature_columns (`list`): List of column name for features
+                target_column (`str`): Column name of target variable
+                save_path (`str`): The path to save train and test feature sets and targets
+                fmt (`str`): Artifact format of the files, one of `src.artifact_io.FORMATS`
+            Returns:
+                None
+        """
+    target_columns = [target_column] if isinstance(target_column, str) else list(target_column)
+    for name, data, columns in [("x_train", x_train, list(feature_columns)), ("x_test", x_test, list(feature_columns)),
+                                ("y_train", y_train, target_columns), ("y_test", y_test, target_columns)]:
+        file_path = artifact_path(save_path + name + ".csv", fmt)
+        try:
+            write_table(pd.DataFrame(data).set_axis(columns, axis=1), file_path)
+        except FileNotFoundError as e:
+            logger.error("The specified path %s does not exist", save_path)
+            raise e
+        else:
+            logger.info("Successfully save the %s data as %s", name, file_path)
+            logger.debug("The shape of %s is %s", name, str(data.shape))
 
 
 def model_train(x_train: pd.DataFrame, y_train: pd.Series, initial_features: typing.List[str],
-                alpha: float, random_state: int, save_path: str) -> sklearn.base.BaseEstimator:
-    """Fits a lasso regression model
+                alpha: typing.Optional[float] = None, random_state: typing.Optional[int] = None,
+                save_path: typing.Optional[str] = None, model_type: str = "lasso",
+                **params) -> sklearn.base.BaseEstimator:
+    """Fits a regression model of one of the backends in `src.model_backends`, a lasso by default
         Args:
             x_train (`pd.DataFrame`): Features for training dataset
             y_train (`pd.Series`): True target values for training dataset
             initial_features (`list` of `str`): List of features to train on
-            alpha (`float`): Constant that multiplies the L1 term, controlling regularization strength
+            alpha (`float`): Constant that multiplies the penalty term, controlling regularization strength.
+                             Not passed to the model if None
             random_state (`int`): Random state to make model training reproducible
-            save_path (`str`): The path to save the trained model
+            save_path (`str`): The path to save the trained model, None to keep it in memory only
+            model_type (`str`): Name of the backend, one of `src.model_backends.BACKENDS`
+            **params: Other hyperparameters of the model, e.g. `l1_ratio` or `max_iter`
         Returns:
             model: Trained model object
         """
-    # generate the model
-    try:
-        model = linear_model.Lasso(alpha=alpha, random_state=random_state)
-    except ValueError as e:
-        logger.error("Failed to generate the model")
-        raise e
-    else:
-        logger.info("Successfully generate the Lasso model")
+    backend = get_backend(model_type)
+    if alpha is not None:
+        params["alpha"] = alpha
 
-    # train the model
+    # generate and train the model
     try:
-        model.fit(x_train[initial_features], y_train)
+        start = time.perf_counter()
+        model = backend.fit(x_train[initial_features], y_train, random_state=random_state, **params)
     except KeyError as e:
         logger.error("They key %s does not exist in the x_train data", str(e))
         raise e
+    except ValueError as e:
+        logger.error("Failed to train the %s model", model_type)
+        raise e
     else:
-        logger.info("Successfully train the Lasso model on x_train")
+        logger.info("Successfully train the %s model on x_train in %.3f seconds", model_type,
+                    time.perf_counter() - start)
 
     # save the model
+    if save_path is not None:
+        save_model(model, save_path)
+
+    return model
+
+
+def save_model(model: sklearn.base.BaseEstimator, save_path: str) -> None:
+    """Save the trained model
+        Args:
+            model (`sklearn.base.BaseEstimator`): Trained model object
+            save_path (`str`): The path to save the trained model
+        Returns:
+            None
+    """
     try:
-        pickle.dump(model, open(save_path, "wb"))
+        with open_file(save_path, "wb") as file:
+            pickle.dump(model, file)
     except FileNotFoundError as e:
         logger.error("The specified path %s does not exist", save_path)
         raise e
@@ -124,6 +141,40 @@ def model_train(x_train: pd.DataFrame, y_train: pd.Series, initial_features: typ
         logger.info("Successfully save the model as %s", save_path)
 
 
+def export_model(model: sklearn.base.BaseEstimator, initial_features: typing.List[str], scaler_path: str,
+                 save_path: str, scaler: typing.Optional[sklearn.base.TransformerMixin] = None) -> None:
+    """Export the trained model together with its scaler in the NumPy-only serving format. Models of other than
+    linear backends cannot be exported: the export is skipped and a previous export at `save_path` is deleted,
+    so that it is not served in place of the new model
+        Args:
+            model (`sklearn.base.BaseEstimator`): Trained model object
+            initial_features (`list` of `str`): List of features the model was trained on
+            scaler_path (`str`): The path of the pickled scaler the features were scaled with
+            save_path (`str`): The path to save the exported model
+            scaler (`sklearn.preprocessing.StandardScaler`): The fitted scaler, loaded from `scaler_path` if None
+        Returns:
+            None
+    """
+    backend = backend_for_model(model)
+    if not backend.linear:
+        logger.warning("The %s backend cannot be exported to the NumPy-only format, skipping the export. Point "
+                       "MODEL_PATH at the pickled model and SCALER_PATH at the scaler to serve it", backend.name)
+        remove_file(save_path)
+        return
+
+    if scaler is None:
+        try:
+            with open_file(scaler_path, "rb") as file:
+                scaler = pickle.load(file)
+        except FileNotFoundError as e:
+            logger.error("The scaler file does not exist at %s", scaler_path)
+            raise e
+        else:
+            logger.info("Successfully load the scaler from %s", scaler_path)
+
+    backend.export(model, scaler, list(initial_features), save_path, metadata={"params": model.get_params()})
+
+
 def train(config: dict) -> None:
     """ Orchestrate model training by creating train test split, training model, and writing out trained model object
              Args:
@@ -132,17 +183,18 @@ def train(config: dict) -> None:
              Returns:
                 None
     """
+    fmt = config_format(config)
     try:
-        path = config["train"]["feature_path"]
-        features = pd.read_csv(path)
+        path = artifact_path(config["train"]["feature_path"], fmt)
+        features = read_table(path)
     except FileNotFoundError:
         logger.error("The specified path %s does not contain the file", path)
     else:
         logger.info("Successfully load the features from path %s", path)
 
     try:
-        path = config["train"]["target_path"]
-        target = pd.read_csv(path)
+        path = artifact_path(config["train"]["target_path"], fmt)
+        target = read_table(path)
     except FileNotFoundError:
         logger.error("The specified path %s does not contain the file", path)
     else:
@@ -150,6 +202,9 @@ def train(config: dict) -> None:
 
     # train test split
     x_train, _, y_train, _ = data_split(features, target, features.columns, target.columns,
-                                        **config["train"]["data_split"])
+                                        fmt=fmt or "csv", **config["train"]["data_split"])
     # train the model
-    model_train(x_train, y_train, **config["train"]["model_train"])
+    model = model_train(x_train, y_train, **config["train"]["model_train"])
+    # export the model for serving
+    if "export" in config["train"]:
+        export_model(model, config["train"]["model_train"]["initial_features"], **config["train"]["export"])
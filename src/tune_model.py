@@ -0,0 +1,188 @@
+import concurrent.futures
+import json
+import logging
+import os
+import time
+import typing
+
+import numpy as np
+import pandas as pd
+from sklearn import linear_model, model_selection
+
+from src.artifact_io import artifact_path, config_format, open_file, read_table
+from src.train_model import data_split, export_model, model_train
+
+logger = logging.getLogger(__name__)
+
+
+def alpha_grid(x: np.ndarray, y: np.ndarray, l1_ratio: float = 1., n_alphas: int = 100,
+               eps: float = 1e-3) -> np.ndarray:
+    """Build a log-spaced grid of alphas from the smallest one that sets every coefficient to zero
+    Args:
+        x (`np.ndarray`): Features, one row per sample
+        y (`np.ndarray`): Target
+        l1_ratio (`float`): Share of the L1 term in the penalty, 1 for the Lasso
+        n_alphas (`int`): Number of alphas
+        eps (`float`): Ratio of the smallest to the largest alpha
+    Returns:
+        alphas (`np.ndarray`): Alphas in decreasing order
+    """
+    x_centered = x - x.mean(axis=0)
+    alpha_max = np.max(np.abs(x_centered.T @ (y - y.mean()))) / (len(y) * l1_ratio)
+    return np.geomspace(alpha_max, alpha_max * eps, n_alphas)
+
+
+def path_scores(x_train: np.ndarray, y_train: np.ndarray, x_test: np.ndarray, y_test: np.ndarray,
+                alphas: np.ndarray, l1_ratio: float = 1., max_iter: int = 1000, tol: float = 1e-4) -> np.ndarray:
+    """Fit the regularization path on one fold and score every alpha on its held-out part
+    The path is fitted by coordinate descent from the largest alpha to the smallest, every fit starting
+    from the coefficients of the previous one. The intercept is fitted by centering, as `Lasso` does.
+    Args:
+        x_train (`np.ndarray`): Features to fit on
+        y_train (`np.ndarray`): Target to fit on
+        x_test (`np.ndarray`): Held-out features
+        y_test (`np.ndarray`): Held-out target
+        alphas (`np.ndarray`): Alphas in decreasing order
+        l1_ratio (`float`): Share of the L1 term in the penalty, 1 for the Lasso
+        max_iter (`int`): Maximum number of coordinate descent passes per alpha
+        tol (`float`): Tolerance of the coordinate descent
+    Returns:
+        mse (`np.ndarray`): Mean squared error on the held-out part for every alpha
+    """
+    x_mean, y_mean = x_train.mean(axis=0), y_train.mean()
+    _, coefs, _ = linear_model.enet_path(np.asfortranarray(x_train - x_mean), y_train - y_mean,
+                                         l1_ratio=l1_ratio, alphas=alphas, max_iter=max_iter, tol=tol)
+    # one column of predictions per alpha
+    predictions = (x_test - x_mean) @ coefs + y_mean
+    return np.mean((predictions - y_test[:, None]) ** 2, axis=0)
+
+
+def _path_scores(task: tuple) -> np.ndarray:
+    return path_scores(*task)
+
+
+def cross_validate_path(x: pd.DataFrame, y: pd.Series, initial_features: typing.List[str],
+                        alphas: typing.Optional[typing.List[float]] = None, n_alphas: int = 100, eps: float = 1e-3,
+                        l1_ratios: typing.Optional[typing.List[float]] = None, n_splits: int = 5,
+                        random_state: int = 1, n_jobs: typing.Optional[int] = 1, max_iter: int = 1000,
+                        tol: float = 1e-4) -> dict:
+    """Score a grid of alphas and l1 ratios with k-fold cross validation along the regularization path
+    Args:
+        x (`pd.DataFrame`): Features for training dataset
+        y (`pd.Series`): True target values for training dataset
+        initial_features (`list` of `str`): List of features to train on
+        alphas (`list` of `float`): Alphas to score, a grid of `n_alphas` derived from the data if None
+        n_alphas (`int`): Number of alphas of the derived grid
+        eps (`float`): Ratio of the smallest to the largest alpha of the derived grid
+        l1_ratios (`list` of `float`): Shares of the L1 term in the penalty, 1 for the Lasso and below 1 for
+                                       the ElasticNet. Only the Lasso if None
+        n_splits (`int`): Number of folds
+        random_state (`int`): Random state to make the folds reproducible
+        n_jobs (`int`): Number of processes the folds are spread across, -1 for one per CPU, 1 or None to
+                        run them in this process
+        max_iter (`int`): Maximum number of coordinate descent passes per alpha
+        tol (`float`): Tolerance of the coordinate descent
+    Returns:
+        result (`dict`): The best `alpha` and `l1_ratio` with their mean held-out `mse`, and the mean and
+                         standard deviation of the held-out MSE of every alpha of every l1 ratio in `grid`
+    """
+    try:
+        features = x[initial_features].to_numpy(dtype=float)
+    except KeyError as e:
+        logger.error("They key %s does not exist in the x_train data", str(e))
+        raise e
+    target = np.asarray(y, dtype=float).ravel()
+    l1_ratios = list(l1_ratios or [1.])
+    if any(not 0 < l1_ratio <= 1 for l1_ratio in l1_ratios):
+        raise ValueError("The l1 ratios must be in (0, 1], got %s" % l1_ratios)
+
+    grids = [np.sort(np.asarray(alphas, dtype=float))[::-1] if alphas else
+             alpha_grid(features, target, l1_ratio, n_alphas, eps) for l1_ratio in l1_ratios]
+    folds = list(model_selection.KFold(n_splits, shuffle=True, random_state=random_state).split(features))
+    tasks = [(features[train], target[train], features[test], target[test], grid, l1_ratio, max_iter, tol)
+             for l1_ratio, grid in zip(l1_ratios, grids) for train, test in folds]
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if n_jobs and n_jobs > 1:
+        with concurrent.futures.ProcessPoolExecutor(min(n_jobs, len(tasks))) as executor:
+            scores = list(executor.map(_path_scores, tasks))
+    else:
+        scores = [_path_scores(task) for task in tasks]
+    logger.info("Scored %d alphas on %d folds for %d l1 ratios", len(grids[0]), n_splits, len(l1_ratios))
+
+    result = {"grid": []}
+    best = np.inf
+    for index, (l1_ratio, grid) in enumerate(zip(l1_ratios, grids)):
+        mse = np.array(scores[index * n_splits:(index + 1) * n_splits])
+        mean = mse.mean(axis=0)
+        result["grid"].append({"l1_ratio": l1_ratio, "alphas": grid.tolist(), "mse_mean": mean.tolist(),
+                               "mse_std": mse.std(axis=0).tolist()})
+        if mean.min() < best:
+            best = mean.min()
+            result.update(alpha=float(grid[np.argmin(mean)]), l1_ratio=l1_ratio, mse=float(best))
+    logger.info("Best alpha %f with l1 ratio %s, held-out MSE %f", result["alpha"], result["l1_ratio"], result["mse"])
+
+    return result
+
+
+def save_tuning_result(result: dict, save_path: str) -> None:
+    """Save the cross validation scores and the chosen hyperparameters as JSON
+    Args:
+        result (`dict`): Output of `cross_validate_path`
+        save_path (`str`): The path to save the result
+    Returns:
+        None
+    """
+    try:
+        with open_file(save_path, "w") as file:
+            json.dump(result, file, indent=2)
+    except FileNotFoundError as e:
+        logger.error("The specified path %s does not exist", save_path)
+        raise e
+    else:
+        logger.info("Successfully save the tuning result as %s", save_path)
+
+
+def tune(config: dict) -> None:
+    """Choose the regularization of the model by cross validation on the train split and train it with it
+    The model is saved and exported to the paths of the `train` section, in place of the one `train` fits
+    with the configured alpha.
+        Args:
+            config (`dict`): Dictionary of configurations
+        Returns:
+            None
+    """
+    fmt = config_format(config)
+    try:
+        features = read_table(artifact_path(config["train"]["feature_path"], fmt))
+        target = read_table(artifact_path(config["train"]["target_path"], fmt))
+    except FileNotFoundError as e:
+        logger.error("The features or the target do not exist, run get_features first")
+        raise e
+
+    train_config = config["train"]
+    if train_config["model_train"].get("model_type", "lasso") not in ("lasso", "elasticnet"):
+        raise ValueError("Only the lasso and elasticnet model types can be tuned, got %s"
+                         % train_config["model_train"]["model_type"])
+    tune_config = dict(config["tune"])
+    save_path = tune_config.pop("save_path", None)
+    x_train, _, y_train, _ = data_split(features, target, features.columns, target.columns,
+                                        fmt=fmt or "csv", **train_config["data_split"])
+
+    start = time.perf_counter()
+    result = cross_validate_path(x_train, y_train, train_config["model_train"]["initial_features"],
+                                 random_state=train_config["model_train"]["random_state"], **tune_config)
+    result["seconds"] = time.perf_counter() - start
+    logger.info("Cross validated %d candidates in %.3f s, best alpha %g with l1 ratio %g (MSE %.4f)",
+                sum(len(grid["alphas"]) for grid in result["grid"]), result["seconds"], result["alpha"],
+                result["l1_ratio"], result["mse"])
+    if save_path is not None:
+        save_tuning_result(result, save_path)
+
+    model_config = dict(train_config["model_train"], alpha=result["alpha"], model_type="lasso")
+    model_config.pop("l1_ratio", None)
+    if result["l1_ratio"] < 1:
+        model_config.update(model_type="elasticnet", l1_ratio=result["l1_ratio"])
+    model = model_train(x_train, y_train, **model_config)
+    if "export" in train_config:
+        export_model(model, train_config["model_train"]["initial_features"], **train_config["export"])
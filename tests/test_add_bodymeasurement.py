@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from src.add_bodymeasurement import (UserInput, UserInputManager, UserInputWriter, UserLabel, create_db,
+                                     ingest_file, read_user_inputs, validate_chunk)
+from src.app_metrics import AppMetrics
+
+row = dict(name="Mike", age=22, weight=165., height=70., neck=30., chest=100., abdomen=85., hip=100.,
+           thigh=60., knee=80., ankle=23., biceps=35., forearm=25., wrist=18.)
+
+
+class BlockedEngine:
+    """Engine stand-in whose transactions wait until `release` is set"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def begin(self):
+        self.release.wait()
+        raise sqlalchemy.exc.OperationalError("INSERT", {}, Exception("unavailable"))
+
+
+# happy path for testing UserInputManager with write-behind
+def test_add_user_write_behind(tmp_path):
+    """test if add_user writes every queued row in batches and flushes the rest on close"""
+    engine_string = "sqlite:///" + str(tmp_path / "test.db")
+    create_db(engine_string)
+
+    manager = UserInputManager(engine_string=engine_string,
+                               write_behind={"batch_size": 4, "flush_interval": 60})
+    for _ in range(10):
+        manager.add_user(**row)
+    manager.close()
+
+    count = sqlalchemy.create_engine(engine_string).execute(
+        sqlalchemy.select([sqlalchemy.func.count()]).select_from(UserInput.__table__)).scalar()
+    assert count == 10
+    assert manager.writer.written == 10
+
+
+# unhappy path for testing UserInputWriter
+def test_writer_bad_row(tmp_path):
+    """test if a row the database rejects only costs that row, not the rest of its batch"""
+    engine_string = "sqlite:///" + str(tmp_path / "test.db")
+    create_db(engine_string)
+    engine = sqlalchemy.create_engine(engine_string)
+    writer = UserInputWriter(engine, batch_size=4, flush_interval=60)
+    metrics = AppMetrics()
+    writer.add_listener(metrics.count_db_error)
+
+    for name in ["Mike", None, "Anna", "Bob"]:
+        writer.submit(dict(row, name=name))
+    writer.close()
+
+    names = [name for name, in engine.execute(sqlalchemy.select([UserInput.__table__.c.name]))]
+    assert sorted(names) == ["Anna", "Bob", "Mike"]
+    assert (writer.written, writer.failed) == (3, 1)
+    assert 'bodyfat_db_errors_total{error="IntegrityError"} 1' in metrics.render().splitlines()
+
+
+# unhappy path for testing UserInputWriter
+def test_writer_backpressure():
+    """test if submit raises queue.Full once the queue is full"""
+    engine = BlockedEngine()
+    writer = UserInputWriter(engine, batch_size=1, queue_size=1, put_timeout=0.01)
+
+    writer.submit(row)  # taken by the worker, which then waits on the engine
+    while not writer.queue.empty():
+        time.sleep(0.001)
+    writer.submit(row)  # fills the queue
+    with pytest.raises(queue.Full):
+        writer.submit(row)
+
+    engine.release.set()
+    writer.close()
+    assert writer.failed == 2
+
+
+# happy path for testing validate_chunk
+def test_validate_chunk():
+    """test if validate_chunk function keeps only complete rows with positive measurements"""
+    chunk = pd.DataFrame([row, dict(row, hip=None), dict(row, age=None), dict(row, weight="heavy"),
+                          dict(row, wrist=-1.)])
+
+    output = validate_chunk(chunk)
+
+    assert output.index.tolist() == [0, 1]
+    assert output["weight"].dtype == float
+
+
+# unhappy path for testing validate_chunk
+def test_validate_chunk_missing_column():
+    """test if validate_chunk function works as expected if a required column does not exist"""
+    chunk = pd.DataFrame([row]).drop(columns="height")
+
+    with pytest.raises(KeyError):
+        validate_chunk(chunk)
+
+
+# happy path for testing ingest_file
+def test_ingest_file(tmp_path):
+    """test if ingest_file function inserts every valid row of a file"""
+    engine_string = "sqlite:///" + str(tmp_path / "test.db")
+    create_db(engine_string)
+    input_path = str(tmp_path / "users.csv")
+    pd.DataFrame([row] * 7 + [dict(row, age="")]).to_csv(input_path, index=False)
+
+    stats = ingest_file(engine_string, input_path, chunksize=3)
+
+    count = sqlalchemy.create_engine(engine_string).execute(
+        sqlalchemy.select([sqlalchemy.func.count()]).select_from(UserInput.__table__)).scalar()
+    assert count == 7
+    assert (stats["read"], stats["inserted"], stats["rejected"]) == (8, 7, 1)
+
+
+# happy path for testing read_user_inputs
+def test_read_user_inputs(tmp_path):
+    """test if read_user_inputs reads the labeled rows past the watermark in chunks and in id order"""
+    engine_string = "sqlite:///" + str(tmp_path / "test.db")
+    create_db(engine_string)
+    engine = sqlalchemy.create_engine(engine_string)
+    engine.execute(UserInput.__table__.insert(), [dict(row, age=20 + i) for i in range(12)])
+    engine.execute(UserLabel.__table__.insert(), [dict(user_input_id=i, body_fat=10. + i) for i in range(2, 13, 2)])
+
+    chunks = list(read_user_inputs(engine_string, chunksize=2, since_id=2, labeled=True))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    output = pd.concat(chunks)
+    assert output["id"].tolist() == [6, 8, 10, 12]
+    assert output["label_id"].tolist() == [3, 4, 5, 6]
+    assert output["body_fat"].tolist() == [16., 18., 20., 22.]
+    assert output["age"].tolist() == [25, 27, 29, 31]
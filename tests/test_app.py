@@ -0,0 +1,131 @@
+import importlib
+import os
+import re
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from sklearn import linear_model
+from sklearn.preprocessing import StandardScaler
+
+from src.add_bodymeasurement import create_db
+from src.model_artifact import export_linear_model
+from src.serve_model import FEATURE_NAMES
+
+record = {"age": 22, "weight": 165, "height": 70, "neck": 30, "chest": 100, "abdomen": 85, "hip": 100,
+          "thigh": 60, "knee": 80, "ankle": 23, "biceps": 35, "forearm": 25, "wrist": 18}
+rng = np.random.default_rng(5)
+features = rng.normal([record[name] for name in FEATURE_NAMES], 3., size=(60, len(FEATURE_NAMES)))
+target = 0.5 * features[:, FEATURE_NAMES.index("abdomen")] - 20 + rng.normal(size=60)
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    """Import the app with a temporary SQLite database and a model exported to a temporary directory"""
+    directory = tmp_path_factory.mktemp("app")
+    scaler = StandardScaler().fit(features)
+    model = linear_model.Lasso(alpha=0.1).fit(scaler.transform(features), target)
+    model_path = str(directory / "bodyfat_model.npz")
+    export_linear_model(scaler, model, FEATURE_NAMES, model_path)
+    engine_string = "sqlite:///" + str(directory / "bodyfat.db")
+    create_db(engine_string)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("SQLALCHEMY_DATABASE_URI", engine_string)
+        patch.setenv("MODEL_PATH", model_path)
+        yield importlib.import_module("app")
+
+
+@pytest.fixture
+def client(app_module):
+    """Test client of the app"""
+    return app_module.app.test_client()
+
+
+def metric_value(text: str, sample: str) -> float:
+    """Return the value of a sample of the Prometheus text, 0 if it is missing"""
+    match = re.search("^%s (\\S+)$" % re.escape(sample), text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.
+
+
+def test_predict_batch(client, app_module):
+    """test if /predict_batch scores the valid records and reports the invalid ones next to them"""
+    response = client.post("/predict_batch", json={"records": [record, dict(record, abdomen=None),
+                                                               dict(record, weight="heavy")]})
+    # happy path
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["model_version"] == app_module.model_registry.version == response.headers["X-Model-Version"]
+    valid, missing, invalid = body["predictions"]
+    assert isinstance(valid["prediction"], float) and valid["band"]
+    assert "error" not in valid
+    assert missing == {"prediction": None, "band": None, "error": "Missing or invalid: abdomen"}
+    assert invalid["error"] == "Missing or invalid: weight"
+
+    # a bare list of records is accepted too
+    assert client.post("/predict_batch", json=[record]).get_json()["predictions"] == [valid]
+
+
+def test_predict_batch_bad_request(client, app_module, monkeypatch):
+    """test if /predict_batch rejects bodies that are not a list of records and batches that are too large"""
+    # unhappy path
+    response = client.post("/predict_batch", data="age=22", content_type="text/plain")
+    assert response.status_code == 400 and "error" in response.get_json()
+    assert client.post("/predict_batch", json={"items": [record]}).status_code == 400
+
+    monkeypatch.setitem(app_module.app.config, "MAX_BATCH_SIZE", 2)
+    response = client.post("/predict_batch", json={"records": [record] * 3})
+    assert response.status_code == 413
+    assert response.get_json()["error"] == "A batch can hold at most 2 records"
+
+
+def test_result_not_finite(client, app_module):
+    """test if /result rejects measurements that are not finite instead of predicting and caching them"""
+    form = dict({name: str(value) for name, value in record.items()}, name="Mike")
+    # happy path
+    response = client.post("/result", data=form)
+    assert response.status_code == 200 and b"Error!" not in response.data
+
+    # unhappy path
+    for value in ("nan", "inf"):
+        size = app_module.prediction_cache.stats()["size"]
+        response = client.post("/result", data=dict(form, age=value))
+        assert b"Please input a number for every input field" in response.data
+        assert app_module.prediction_cache.stats()["size"] == size
+
+
+def test_metrics(client, app_module):
+    """test if /metrics counts the requests and reports the latency of the requests and of the phases of /result"""
+    before = client.get("/metrics").get_data(as_text=True)
+    form = dict({name: str(value) for name, value in record.items()}, name="Mike")
+    assert client.get("/").status_code == 200
+    assert client.post("/result", data=form).status_code == 200
+    response = client.get("/metrics")
+    # happy path
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    for sample in ['bodyfat_requests_total{endpoint="/",method="GET",status="200"}',
+                   'bodyfat_requests_total{endpoint="/result",method="POST",status="200"}',
+                   'bodyfat_request_latency_seconds_count{endpoint="/result"}',
+                   'bodyfat_phase_latency_seconds_count{endpoint="/result",phase="predict"}']:
+        assert metric_value(text, sample) == metric_value(before, sample) + 1
+    assert "# TYPE bodyfat_request_latency_seconds summary" in text
+    assert metric_value(text, 'bodyfat_request_latency_seconds{endpoint="/result",quantile="0.99"}') > 0
+    assert metric_value(text, 'bodyfat_model_info{version="%s"}' % app_module.model_registry.version) == 1
+
+    # unhappy path
+    client.get("/missing")
+    assert metric_value(client.get("/metrics").get_data(as_text=True),
+                        'bodyfat_requests_total{endpoint="unmatched",method="GET",status="404"}') >= 1
+
+
+def test_import_footprint(app_module):
+    """test if importing the app does not load pandas, scikit-learn or scipy"""
+    env = dict(os.environ, MODEL_PATH=app_module.app.config["MODEL_PATH"],
+               SQLALCHEMY_DATABASE_URI=app_module.app.config["SQLALCHEMY_DATABASE_URI"])
+    code = "import sys, app; print(sorted(set(sys.modules) & {'pandas', 'sklearn', 'scipy'}))"
+    process = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    # happy path
+    assert process.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,60 @@
+import math
+
+import numpy as np
+
+from src.app_metrics import AppMetrics, LatencyHistogram
+
+latencies = np.random.default_rng(7).lognormal(mean=-5., sigma=1., size=10000)
+
+
+def test_latency_histogram():
+    """test if the quantiles estimated from the buckets are close to the true quantiles"""
+    histogram = LatencyHistogram()
+    histogram.observe(latencies[:5000])
+    for seconds in latencies[5000:5010]:
+        histogram.observe(seconds)
+    histogram.observe(latencies[5010:])
+    # happy path
+    assert histogram.count == len(latencies)
+    assert math.isclose(histogram.sum, latencies.sum())
+    for q in (0.5, 0.9, 0.99):
+        assert abs(histogram.quantile(q) / np.quantile(latencies, q) - 1) < 0.19
+
+    # unhappy path
+    assert math.isnan(LatencyHistogram().quantile(0.5))
+
+
+def test_app_metrics_render():
+    """test if render folds the pending samples and reports them in the Prometheus text format"""
+    metrics = AppMetrics()
+    for seconds in latencies[:100]:
+        metrics.observe_request("/result", "POST", 200, seconds)
+    metrics.observe_request("/predict_batch", "POST", 400, 0.002)
+    timer = metrics.timer("/result")
+    timer.lap("parse_form")
+    timer.lap("predict")
+    metrics.count_db_error("OperationalError")
+    metrics.set_model_version('313d"21')
+    text = metrics.render()
+    lines = text.splitlines()
+    # happy path
+    assert len(metrics.request_samples) == 0 and len(metrics.phase_samples) == 0
+    assert 'bodyfat_requests_total{endpoint="/result",method="POST",status="200"} 100' in lines
+    assert 'bodyfat_requests_total{endpoint="/predict_batch",method="POST",status="400"} 1' in lines
+    assert "# TYPE bodyfat_request_latency_seconds summary" in lines
+    assert 'bodyfat_request_latency_seconds_count{endpoint="/result"} 100' in lines
+    assert any(line.startswith('bodyfat_request_latency_seconds{endpoint="/result",quantile="0.99"} ')
+               for line in lines)
+    assert 'bodyfat_phase_latency_seconds_count{endpoint="/result",phase="parse_form"} 1' in lines
+    assert 'bodyfat_phase_latency_seconds_count{endpoint="/result",phase="predict"} 1' in lines
+    assert 'bodyfat_db_errors_total{error="OperationalError"} 1' in lines
+    assert 'bodyfat_model_info{version="313d\\"21"} 1' in lines
+    assert text.endswith("\n")
+
+    # rendering again does not count the requests twice
+    metrics.observe_request("/result", "POST", 200, 0.01)
+    assert 'bodyfat_requests_total{endpoint="/result",method="POST",status="200"} 101' in \
+        metrics.render().splitlines()
+
+    # unhappy path
+    assert "bodyfat_model_info" not in AppMetrics().render()
@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.artifact_io import TableWriter, artifact_format, artifact_path, count_rows, iter_table, read_table, write_table
+
+df_in = pd.DataFrame({"Age": [23, 22, 28, 45],
+                      "Weight": [154.25, 173.25, 183.75, 184.25],
+                      "BodyFat": [12.3, 6.1, 25.3, 10.4]},
+                     index=[3, 7, 8, 12])
+
+
+# happy path for testing write_table and read_table
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_write_read_table(tmp_path, fmt):
+    """test if write_table and read_table round trip a dataframe without its index in every format"""
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    path = artifact_path(str(tmp_path / "cleaned_data.csv"), fmt)
+    write_table(df_in, path)
+
+    df_out = read_table(path)
+    pd.testing.assert_frame_equal(df_out, df_in.reset_index(drop=True))
+    pd.testing.assert_frame_equal(read_table(path, columns=["BodyFat", "Age"]),
+                                  df_in[["BodyFat", "Age"]].reset_index(drop=True))
+
+
+# happy path for testing write_table
+def test_write_table_series(tmp_path):
+    """test if write_table writes a series as a single column"""
+    path = str(tmp_path / "target.csv")
+    write_table(df_in["BodyFat"], path)
+
+    np.testing.assert_array_equal(read_table(path)["BodyFat"], df_in["BodyFat"])
+
+
+# happy path for testing artifact_path
+def test_artifact_path():
+    """test if artifact_path replaces the extension only when a format is set"""
+    assert artifact_path("data/artifacts/x_train.csv", "parquet") == "data/artifacts/x_train.parquet"
+    assert artifact_path("data/artifacts/x_train.csv", None) == "data/artifacts/x_train.csv"
+
+
+# unhappy path for testing artifact_format
+def test_artifact_format_unknown():
+    """test if artifact_format raises ValueError for an unknown extension"""
+    with pytest.raises(ValueError):
+        artifact_format("data/artifacts/x_train.xlsx")
+
+
+# happy path for testing TableWriter, iter_table and count_rows
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_iter_table_start(tmp_path, fmt):
+    """test if iter_table skips the first rows of a file written chunk by chunk in every format"""
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    table = pd.DataFrame({"Weight": np.arange(25, dtype=float), "Age": np.arange(25)})
+    path = artifact_path(str(tmp_path / "features.csv"), fmt)
+    with TableWriter(path) as writer:
+        for start in range(0, 25, 10):
+            writer.write(table.iloc[start:start + 10])
+
+    chunks = list(iter_table(path, 4, start=13))
+    assert count_rows(path) == 25
+    assert max(len(chunk) for chunk in chunks) <= 4
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), table.iloc[13:].reset_index(drop=True))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_table_writer_abort(tmp_path, fmt):
+    """test if an error inside the with block of a TableWriter leaves the file as it was before"""
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    table = pd.DataFrame({"Weight": np.arange(25, dtype=float), "Age": np.arange(25)})
+    path = artifact_path(str(tmp_path / "features.csv"), fmt)
+    # unhappy path
+    with pytest.raises(RuntimeError):
+        with TableWriter(path) as writer:
+            writer.write(table)
+            raise RuntimeError("stopped writing")
+    assert list(tmp_path.iterdir()) == []
+
+    write_table(table.iloc[:10], path)
+    with pytest.raises(RuntimeError):
+        with TableWriter(path, append=True) as writer:
+            writer.write(table.iloc[10:])
+            raise RuntimeError("stopped writing")
+    assert [file.name for file in tmp_path.iterdir()] == [os.path.basename(path)]
+    pd.testing.assert_frame_equal(read_table(path), table.iloc[:10])
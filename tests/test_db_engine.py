@@ -0,0 +1,36 @@
+from sqlalchemy.pool import NullPool
+
+from src.db_engine import TimedQueuePool, get_engine, pool_status
+
+
+# happy path for testing get_engine
+def test_get_engine_reused(tmp_path):
+    """test if get_engine function returns one engine per engine string and drops queue options for SQLite"""
+    engine_string = "sqlite:///" + str(tmp_path / "test.db")
+
+    engine = get_engine(engine_string, pool_size=3, max_overflow=2, pool_pre_ping=True)
+
+    assert get_engine(engine_string) is engine
+    assert get_engine("sqlite:///" + str(tmp_path / "other.db")) is not engine
+
+
+# happy path for testing pool_status
+def test_pool_status(tmp_path):
+    """test if pool_status function reports checked out connections and checkout waits"""
+    engine = get_engine("sqlite:///" + str(tmp_path / "test.db"), poolclass=TimedQueuePool,
+                        pool_size=2, max_overflow=0)
+
+    with engine.connect():
+        status = pool_status(engine)
+    assert status["pool"] == "TimedQueuePool"
+    assert (status["size"], status["checked_out"], status["checkouts"]) == (2, 1, 1)
+    assert pool_status(engine)["checked_out"] == 0
+
+
+# happy path for testing get_engine
+def test_get_engine_null_pool(tmp_path):
+    """test if get_engine function drops queue options when Flask-SQLAlchemy asks for a NullPool"""
+    engine = get_engine("sqlite:///" + str(tmp_path / "test.db"), poolclass=NullPool, pool_size=5,
+                        max_overflow=10, pool_timeout=30, pool_recycle=1800)
+
+    assert pool_status(engine) == {"pool": "NullPool"}
@@ -0,0 +1,41 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.evaulate_model import evaluate_chunks, model_evaluate
+
+rng = np.random.default_rng(6)
+y_test = pd.DataFrame({"BodyFat": rng.normal(19., 8., 100).round(1)})
+y_pred = y_test["BodyFat"].to_numpy() + rng.normal(0., 2., 100)
+
+
+def test_model_evaluate(tmp_path):
+    """test if model_evaluate saves the metrics as JSON"""
+    # happy path
+    save_path = tmp_path / "evaluation_result.json"
+    metrics = model_evaluate(y_test, pd.DataFrame(y_pred), str(save_path), n_features=13)
+    assert json.loads(save_path.read_text()) == metrics
+    assert metrics["Adjusted R-squared"] < metrics["R-squared"]
+
+    metrics = model_evaluate(y_test, pd.DataFrame(y_pred), n_features=13, bootstrap={"replicates": 500})
+    lower, upper = metrics["confidence_intervals"]["MAPE"]
+    assert lower < metrics["MAPE"] < upper
+
+
+def test_evaluate_chunks(tmp_path):
+    """test if evaluate_chunks reads the files in chunks and computes the metrics of all rows"""
+    test_path, prediction_path = tmp_path / "y_test.csv", tmp_path / "predictions.txt"
+    y_test.to_csv(test_path, index=False)
+    np.savetxt(prediction_path, y_pred)
+    # happy path
+    metrics = evaluate_chunks(str(test_path), str(prediction_path), chunksize=30, n_features=13)
+    assert (metrics.pop("rows"), metrics.pop("chunks")) == (100, 4)
+    expected = model_evaluate(pd.read_csv(test_path), pd.read_csv(prediction_path, header=None), n_features=13)
+    assert metrics == pytest.approx(expected, rel=1e-12)
+
+    # unhappy path
+    np.savetxt(prediction_path, y_pred[:-1])
+    with pytest.raises(ValueError):
+        evaluate_chunks(str(test_path), str(prediction_path), chunksize=30)
@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 import pytest
+from sklearn.preprocessing import StandardScaler
 
-from src.generate_features import extract_features, extract_target
+from src.generate_features import extract_features, extract_target, get_features_incremental
 
 columns = ["Density", "BodyFat", "Age", "Weight", "Height", "Neck", "Chest",
            "Abdomen", "Hip", "Thigh", "Knee", "Ankle", "Biceps", "Forearm",
@@ -76,3 +78,65 @@ def test_extract_target_not_existing():
 
     with pytest.raises(KeyError):
         extract_target(input_data, not_exist_target)
+
+
+def make_incremental_config(tmp_path):
+    """Build a get_features configuration in incremental mode that reads and writes under tmp_path"""
+    return {"get_features": {"load_path": str(tmp_path / "cleaned_data.csv"),
+                             "features_column": columns[2:], "target_column": "BodyFat",
+                             "scaler_path": str(tmp_path / "scaler.sav"),
+                             "feature_path": str(tmp_path / "features.csv"),
+                             "target_path": str(tmp_path / "target.csv"),
+                             "incremental": {"state_path": str(tmp_path / "scaler_state.json"), "chunksize": 7}}}
+
+
+# happy path for testing get_features_incremental
+def test_get_features_incremental(tmp_path):
+    """test if get_features_incremental folds in appended rows and matches a full refit"""
+    rng = np.random.default_rng(14)
+    cleaned = pd.DataFrame(rng.normal(loc=50., scale=10., size=(90, len(columns))), columns=columns)
+    config = make_incremental_config(tmp_path)
+    cleaned.iloc[:60].to_csv(config["get_features"]["load_path"], index=False)
+    get_features_incremental(config)
+
+    cleaned.iloc[60:].to_csv(config["get_features"]["load_path"], index=False, mode="a", header=False)
+    scaler = get_features_incremental(config)
+
+    full = StandardScaler().fit(cleaned[columns[2:]])
+    np.testing.assert_allclose(scaler.mean_, full.mean_)
+    np.testing.assert_allclose(scaler.var_, full.var_)
+    assert scaler.n_samples_seen_ == 90
+    np.testing.assert_allclose(pd.read_csv(config["get_features"]["feature_path"]).values,
+                               full.transform(cleaned[columns[2:]]))
+    np.testing.assert_allclose(pd.read_csv(config["get_features"]["target_path"])["BodyFat"], cleaned["BodyFat"])
+
+
+# unhappy path for testing get_features_incremental
+def test_get_features_incremental_rebuilt_data(tmp_path):
+    """test if get_features_incremental refits the scaler when the cleaned data shrank since the last run"""
+    config = make_incremental_config(tmp_path)
+    pd.DataFrame(data * 3, columns=columns).to_csv(config["get_features"]["load_path"], index=False)
+    get_features_incremental(config)
+
+    pd.DataFrame(data, columns=columns).to_csv(config["get_features"]["load_path"], index=False)
+    scaler = get_features_incremental(config)
+
+    assert scaler.n_samples_seen_ == len(data)
+    np.testing.assert_allclose(scaler.mean_, pd.DataFrame(data, columns=columns)[columns[2:]].mean())
+
+
+# unhappy path for testing get_features_incremental
+def test_get_features_incremental_rebuilt_data_same_rows(tmp_path):
+    """test if get_features_incremental refits the scaler when the cleaned data was rebuilt with as many rows"""
+    rng = np.random.default_rng(15)
+    config = make_incremental_config(tmp_path)
+    pd.DataFrame(rng.normal(loc=50., scale=10., size=(30, len(columns))), columns=columns).to_csv(
+        config["get_features"]["load_path"], index=False)
+    get_features_incremental(config)
+
+    rebuilt = pd.DataFrame(rng.normal(loc=20., scale=2., size=(40, len(columns))), columns=columns)
+    rebuilt.to_csv(config["get_features"]["load_path"], index=False)
+    scaler = get_features_incremental(config)
+
+    assert scaler.n_samples_seen_ == 40
+    np.testing.assert_allclose(scaler.mean_, rebuilt[columns[2:]].mean())
@@ -0,0 +1,28 @@
+from src.import_profiler import parse_importtime, summarize_imports
+
+lines = ["import time: self [us] | cumulative | imported package",
+         "import time:       120 |        120 |     numpy.core",
+         "import time:       300 |        420 |   numpy",
+         "import time:        80 |        500 | src.evaulate_model",
+         "2022-06-01 12:00:00,000 run.py       INFO     Configuration file loaded",
+         "import time:        50 |         50 | yaml"]
+
+
+# happy path for testing parse_importtime
+def test_parse_importtime():
+    """test if parse_importtime function reads the module, depth and times of every import line"""
+    output = parse_importtime(lines)
+
+    assert [entry["module"] for entry in output] == ["numpy.core", "numpy", "src.evaulate_model", "yaml"]
+    assert [entry["depth"] for entry in output] == [2, 1, 0, 0]
+    assert output[1]["self_us"] == 300 and output[1]["cumulative_us"] == 420
+
+
+# happy path for testing summarize_imports
+def test_summarize_imports():
+    """test if summarize_imports function adds up the top level imports and groups self time by package"""
+    output = summarize_imports(parse_importtime(lines))
+
+    assert output["total_ms"] == 0.55
+    assert output["top_level"][0]["module"] == "src.evaulate_model"
+    assert output["packages"][0] == {"package": "numpy", "self_us": 420}
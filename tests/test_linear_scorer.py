@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from sklearn import linear_model
+from sklearn.preprocessing import StandardScaler
+
+from src.linear_scorer import LinearScorer
+
+rng = np.random.default_rng(1)
+features = rng.normal(loc=[45., 180., 70., 38.], scale=[12., 29., 3.6, 2.4], size=(60, 4))
+target = 0.3 * features[:, 1] - 2. * features[:, 3] + rng.normal(size=60)
+
+
+# happy path for testing LinearScorer
+def test_linear_scorer_matches_two_step():
+    """test if the compiled scorer predicts the same as scaler.transform followed by model.predict"""
+    scaler = StandardScaler().fit(features)
+    model = linear_model.Lasso(alpha=0.5, random_state=1).fit(scaler.transform(features), target)
+
+    scorer = LinearScorer.from_estimators(scaler, model)
+    expected_output = model.predict(scaler.transform(features))
+
+    assert np.allclose(scorer.predict(features), expected_output)
+    assert np.isclose(scorer.predict_one(features[0].tolist()), expected_output[0])
+
+
+# happy path for testing LinearScorer
+def test_linear_scorer_skips_zero_coefficients():
+    """test if the compiled scorer only keeps the features with a non zero coefficient"""
+    scaler = StandardScaler().fit(features)
+    model = linear_model.Lasso(alpha=5, random_state=1).fit(scaler.transform(features), target)
+
+    scorer = LinearScorer.from_estimators(scaler, model)
+
+    assert scorer.active.tolist() == np.flatnonzero(model.coef_).tolist()
+    assert scorer.active.shape[0] < features.shape[1]
+
+
+# unhappy path for testing LinearScorer
+def test_linear_scorer_wrong_shape():
+    """test if the compiled scorer raises an error if the number of measurements is wrong"""
+    scorer = LinearScorer(np.ones(4), 0.)
+
+    with pytest.raises(ValueError):
+        scorer.predict(np.ones((2, 3)))
+    with pytest.raises(ValueError):
+        scorer.predict_one([1., 2.])
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sklearn.metrics
+
+from src.metrics import RegressionMetrics, bootstrap_metrics, compute_metrics, compute_metrics_chunks
+
+rng = np.random.default_rng(5)
+y_true = pd.DataFrame({"BodyFat": rng.normal(19., 8., 500)})
+y_pred = pd.DataFrame(y_true["BodyFat"].to_numpy() + rng.normal(0., 2., 500))
+
+
+def test_compute_metrics():
+    """test if compute_metrics matches the metrics of scikit-learn"""
+    # happy path
+    metrics = compute_metrics(y_true, y_pred, n_features=13)
+    r2 = sklearn.metrics.r2_score(y_true, y_pred)
+    expected = {"MSE": sklearn.metrics.mean_squared_error(y_true, y_pred),
+                "MAE": sklearn.metrics.mean_absolute_error(y_true, y_pred),
+                "MAPE": sklearn.metrics.mean_absolute_percentage_error(y_true, y_pred),
+                "R-squared": r2,
+                "Adjusted R-squared": 1 - (1 - r2) * 499 / 486}
+    expected["RMSE"] = expected["MSE"] ** 0.5
+    assert metrics.keys() == expected.keys()
+    for name, value in expected.items():
+        assert metrics[name] == pytest.approx(value, rel=1e-12)
+
+
+def test_compute_metrics_chunks():
+    """test if metrics accumulated chunk by chunk equal those of all the data at once"""
+    # happy path
+    chunks = [(y_true[start:start + 64], y_pred[start:start + 64]) for start in range(0, 500, 64)]
+    metrics = compute_metrics_chunks(chunks, n_features=13)
+    assert (metrics.pop("rows"), metrics.pop("chunks")) == (500, 8)
+    assert metrics == pytest.approx(compute_metrics(y_true, y_pred, n_features=13), rel=1e-12)
+
+
+def test_compute_metrics_constant_target():
+    """test if a constant target is scored like scikit-learn"""
+    # happy path
+    assert compute_metrics([3., 3.], [3., 3.])["R-squared"] == 1.
+    assert compute_metrics([3., 3.], [2., 4.])["R-squared"] == 0.
+
+
+def test_compute_metrics_unhappy():
+    """test if mismatched or missing predictions are rejected"""
+    # unhappy path
+    with pytest.raises(ValueError):
+        compute_metrics(y_true, y_pred[:-1])
+    with pytest.raises(ValueError):
+        RegressionMetrics().result()
+    with pytest.raises(ValueError):
+        compute_metrics(np.ones((3, 2)), np.ones((3, 2)))
+
+
+def test_bootstrap_metrics():
+    """test if bootstrap_metrics matches a loop over the same resamples, in one and in several processes"""
+    # happy path
+    intervals = bootstrap_metrics(y_true, y_pred, n_features=13, replicates=200, confidence=0.9, random_state=1)
+    index = np.random.default_rng(np.random.SeedSequence(1).spawn(1)[0]).integers(0, 500, size=(200, 500))
+    replicates = [compute_metrics(y_true.to_numpy()[rows], y_pred.to_numpy()[rows], n_features=13)
+                  for rows in index]
+    for name, (lower, upper) in intervals.items():
+        expected = np.percentile([replicate[name] for replicate in replicates], [5, 95])
+        assert [lower, upper] == pytest.approx(expected, rel=1e-12)
+
+    metrics = compute_metrics(y_true, y_pred)
+    assert all(lower < metrics[name] < upper for name, (lower, upper) in intervals.items() if name in metrics)
+
+    # blocks of replicates spread across processes give the same intervals
+    many = bootstrap_metrics(y_true, y_pred, replicates=20000, random_state=1)
+    assert bootstrap_metrics(y_true, y_pred, replicates=20000, random_state=1, n_jobs=2) == many
+
+
+def test_bootstrap_metrics_unhappy():
+    """test if bootstrap_metrics rejects invalid confidence levels and empty predictions"""
+    # unhappy path
+    with pytest.raises(ValueError):
+        bootstrap_metrics(y_true, y_pred, confidence=1.5)
+    with pytest.raises(ValueError):
+        bootstrap_metrics([], [])
@@ -0,0 +1,40 @@
+import json
+
+import numpy as np
+import pytest
+from sklearn import linear_model
+from sklearn.preprocessing import StandardScaler
+
+from src.model_artifact import export_linear_model, load_linear_model
+
+feature_names = ["Age", "Weight", "Height"]
+rng = np.random.default_rng(3)
+features = rng.normal(loc=[45., 180., 70.], scale=[12., 29., 3.6], size=(40, 3))
+target = 0.1 * features[:, 1] + rng.normal(size=40)
+
+
+# happy path for testing export_linear_model and load_linear_model
+def test_export_and_load_linear_model(tmp_path):
+    """test if an exported model predicts the same as the scaler and the model it was exported from"""
+    scaler = StandardScaler().fit(features)
+    model = linear_model.Lasso(alpha=0.1).fit(scaler.transform(features), target)
+    save_path = str(tmp_path / "model.npz")
+
+    export_linear_model(scaler, model, feature_names, save_path, metadata={"alpha": 0.1})
+    scorer, mean, metadata = load_linear_model(save_path)
+
+    assert np.allclose(scorer.predict(features), model.predict(scaler.transform(features)))
+    assert np.allclose(mean, scaler.mean_)
+    assert scorer.feature_names == feature_names
+    assert (metadata["model_type"], metadata["alpha"]) == ("Lasso", 0.1)
+
+
+# unhappy path for testing load_linear_model
+def test_load_linear_model_unsupported_version(tmp_path):
+    """test if load_linear_model raises an error for a file written in another format version"""
+    save_path = str(tmp_path / "model.npz")
+    np.savez(save_path, coef=np.ones(3), intercept=np.zeros(1), mean=np.zeros(3), scale=np.ones(3),
+             feature_names=np.array(feature_names), metadata=np.array(json.dumps({"format_version": 99})))
+
+    with pytest.raises(ValueError):
+        load_linear_model(save_path)
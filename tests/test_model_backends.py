@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from src.model_backends import BACKENDS, backend_for_model, get_backend
+from src.train_model import export_model, model_train
+
+feature_names = ["Age", "Weight", "Height"]
+rng = np.random.default_rng(4)
+raw = pd.DataFrame(rng.normal(loc=[45., 180., 70.], scale=[12., 29., 3.6], size=(60, 3)), columns=feature_names)
+target = pd.DataFrame({"BodyFat": 0.1 * raw["Weight"] + rng.normal(size=60)})
+scaler = StandardScaler().fit(raw)
+scaled = pd.DataFrame(scaler.transform(raw), columns=feature_names)
+params = {"lasso": {"alpha": 0.1}, "elasticnet": {"alpha": 0.1, "l1_ratio": 0.5}, "ridge": {"alpha": 1.},
+          "gbt": {"max_iter": 20}}
+
+
+@pytest.mark.parametrize("model_type", list(BACKENDS))
+def test_backend_scorer(model_type):
+    """test if the serving scorer of every backend predicts raw measurements like the model on scaled ones"""
+    # happy path
+    model = model_train(scaled, target, feature_names, random_state=1, model_type=model_type, **params[model_type])
+    backend = backend_for_model(model)
+    scorer = backend.scorer(model, scaler)
+
+    assert backend is get_backend(model_type)
+    expected = backend.predict(model, scaled)
+    assert expected.shape == (60,)
+    assert np.allclose(scorer.predict(raw.to_numpy()), expected)
+    assert np.isclose(scorer.predict_one(raw.iloc[0].tolist()), expected[0])
+
+
+def test_backend_export(tmp_path):
+    """test if only linear backends export to the NumPy-only format"""
+    # happy path
+    model = get_backend("ridge").fit(scaled, target, alpha=1.)
+    get_backend("ridge").export(model, scaler, feature_names, str(tmp_path / "model.npz"))
+    assert (tmp_path / "model.npz").exists()
+
+    # unhappy path
+    model = get_backend("gbt").fit(scaled, target, max_iter=5)
+    with pytest.raises(ValueError):
+        get_backend("gbt").export(model, scaler, feature_names, str(tmp_path / "gbt.npz"))
+
+
+def test_export_model_skips_tree_model(tmp_path):
+    """test if export_model skips models that cannot be exported and deletes the stale export"""
+    save_path = str(tmp_path / "bodyfat_model.npz")
+    # happy path
+    model = get_backend("lasso").fit(scaled, target, alpha=0.1)
+    export_model(model, feature_names, None, save_path, scaler=scaler)
+    assert (tmp_path / "bodyfat_model.npz").exists()
+
+    # unhappy path
+    model = get_backend("gbt").fit(scaled, target, max_iter=5)
+    export_model(model, feature_names, None, save_path, scaler=scaler)
+    assert not (tmp_path / "bodyfat_model.npz").exists()
+
+
+def test_backend_unhappy():
+    """test if unknown model types, models and hyperparameters are rejected"""
+    # unhappy path
+    with pytest.raises(KeyError):
+        get_backend("svm")
+    with pytest.raises(ValueError):
+        backend_for_model(StandardScaler())
+    with pytest.raises(TypeError):
+        get_backend("gbt").build(alpha=0.1)
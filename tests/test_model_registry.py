@@ -0,0 +1,79 @@
+import pickle
+
+import numpy as np
+import pytest
+from sklearn import linear_model
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.preprocessing import StandardScaler
+
+from src.model_registry import ModelRegistry
+
+rng = np.random.default_rng(2)
+features = rng.normal(loc=[45., 180., 70.], scale=[12., 29., 3.6], size=(40, 3))
+target = 0.1 * features[:, 1] + rng.normal(size=40)
+
+
+def save_model(tmp_path, alpha):
+    """Fit and pickle a scaler and a Lasso model, return their paths"""
+    scaler = StandardScaler().fit(features)
+    model = linear_model.Lasso(alpha=alpha).fit(scaler.transform(features), target)
+    model_path, scaler_path = tmp_path / "Lasso.sav", tmp_path / "scaler.sav"
+    model_path.write_bytes(pickle.dumps(model))
+    scaler_path.write_bytes(pickle.dumps(scaler))
+    return str(model_path), str(scaler_path)
+
+
+# happy path for testing ModelRegistry
+def test_model_registry_swaps_changed_model(tmp_path):
+    """test if ModelRegistry swaps in a retrained model once its files have settled"""
+    model_path, scaler_path = save_model(tmp_path, 0.1)
+    registry = ModelRegistry(model_path, scaler_path, poll_interval=0)
+    versions = []
+    registry.add_listener(versions.append)
+    first = registry.current
+
+    save_model(tmp_path, 1.)
+
+    assert not registry.check()  # the files are seen changing
+    assert registry.check()  # and loaded once they stayed the same
+    assert registry.version != first.version
+    assert versions == [registry.version]
+    assert first.scorer.predict(features[:1]) != registry.current.scorer.predict(features[:1])
+
+
+# unhappy path for testing ModelRegistry
+def test_model_registry_keeps_serving_on_bad_model(tmp_path):
+    """test if ModelRegistry keeps the current model if the new files cannot be loaded"""
+    model_path, scaler_path = save_model(tmp_path, 0.1)
+    registry = ModelRegistry(model_path, scaler_path, poll_interval=0)
+    version = registry.version
+
+    with open(model_path, "wb") as file:
+        file.write(b"not a pickle")
+
+    assert not registry.check()
+    assert not registry.check()
+    assert registry.version == version
+
+
+# unhappy path for testing ModelRegistry
+def test_model_registry_missing_files(tmp_path):
+    """test if ModelRegistry raises an error at startup if the model does not exist"""
+
+    with pytest.raises(FileNotFoundError):
+        ModelRegistry(str(tmp_path / "Lasso.sav"), str(tmp_path / "scaler.sav"), poll_interval=0)
+
+
+# happy path for testing ModelRegistry
+def test_model_registry_serves_tree_model(tmp_path):
+    """test if ModelRegistry serves a pickled model that cannot be folded into linear weights"""
+    scaler = StandardScaler().fit(features)
+    model = HistGradientBoostingRegressor(max_iter=20).fit(scaler.transform(features), target)
+    model_path, scaler_path = tmp_path / "gbt.sav", tmp_path / "scaler.sav"
+    model_path.write_bytes(pickle.dumps(model))
+    scaler_path.write_bytes(pickle.dumps(scaler))
+
+    registry = ModelRegistry(str(model_path), str(scaler_path), poll_interval=0)
+
+    assert registry.current.model_type == "gbt"
+    assert np.allclose(registry.current.scorer.predict(features), model.predict(scaler.transform(features)))
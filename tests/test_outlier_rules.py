@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.outlier_rules import OutlierRules, rules_from_config
+from src.preprocess_data import remove_outliers
+
+rng = np.random.default_rng(13)
+df_in = pd.DataFrame({"BodyFat": rng.normal(19., 8., size=200),
+                      "Weight": rng.normal(179., 29., size=200),
+                      "Abdomen": rng.normal(92., 10., size=200),
+                      "Hip": rng.normal(100., 7., size=200)})
+df_in.loc[[3, 50], "Weight"] = [400., 20.]
+df_in.loc[7, ["Abdomen", "Hip"]] = [160., 95.]
+df_in.loc[9, "BodyFat"] = np.nan
+
+
+# happy path for testing OutlierRules
+def test_outlier_rules_range_matches_remove_outliers():
+    """test if a range rule removes the same rows as remove_outliers"""
+    outliers = OutlierRules([{"type": "range", "column": "BodyFat", "minimum": 5, "maximum": 30}])
+
+    pd.testing.assert_frame_equal(outliers.apply(df_in), remove_outliers(df_in, "BodyFat", 5, 30))
+    assert outliers.counts["range(BodyFat)"] == len(df_in) - outliers.kept
+
+
+# happy path for testing OutlierRules
+def test_outlier_rules_statistics():
+    """test if iqr, zscore, mad and ratio rules reject the planted outliers and count them per rule"""
+    rules = [{"type": "iqr", "column": "Weight", "k": 3},
+             {"type": "zscore", "column": "Weight", "threshold": 4},
+             {"type": "mad", "column": "Abdomen", "threshold": 5},
+             {"type": "ratio", "numerator": "Abdomen", "denominator": "Hip", "minimum": 0.6, "maximum": 1.6}]
+    outliers = OutlierRules(rules).fit(df_in)
+    output = outliers.apply(df_in)
+
+    assert sorted(set(df_in.index) - set(output.index)) == [3, 7, 50]
+    assert outliers.counts == {"iqr(Weight)": 2, "zscore(Weight)": 2, "mad(Abdomen)": 1,
+                               "ratio(Abdomen/Hip)": 1}
+    q1, q3 = np.percentile(df_in["Weight"], [25, 75])
+    assert outliers.rules[0]["upper"] == pytest.approx(q3 + 3 * (q3 - q1))
+
+
+# happy path for testing OutlierRules
+def test_outlier_rules_fit_chunks():
+    """test if fitting the rules on chunks gives the same bounds as fitting them on the whole data"""
+    rules = [{"type": "iqr", "column": "Weight"}, {"type": "mad", "column": "Abdomen"}]
+    whole = OutlierRules(rules).fit(df_in)
+    chunked = OutlierRules(rules).fit_chunks(df_in.iloc[start:start + 30] for start in range(0, 200, 30))
+
+    assert [rule["lower"] for rule in chunked.rules] == [rule["lower"] for rule in whole.rules]
+    assert [rule["upper"] for rule in chunked.rules] == [rule["upper"] for rule in whole.rules]
+
+
+# happy path for testing rules_from_config
+def test_rules_from_config():
+    """test if rules_from_config turns remove_outliers into a range rule in front of outlier_rules"""
+    config = {"remove_outliers": {"column_name": "BodyFat", "minimum": 5, "maximum": 50},
+              "outlier_rules": [{"type": "iqr", "column": "Weight"}]}
+
+    assert rules_from_config(config) == [{"type": "range", "column": "BodyFat", "minimum": 5, "maximum": 50},
+                                         {"type": "iqr", "column": "Weight"}]
+
+
+# unhappy path for testing OutlierRules
+def test_outlier_rules_unknown_type():
+    """test if OutlierRules raises ValueError for an unknown rule type"""
+    with pytest.raises(ValueError):
+        OutlierRules([{"type": "quantile", "column": "Weight"}])
+
+
+# unhappy path for testing OutlierRules
+def test_outlier_rules_not_fitted():
+    """test if OutlierRules raises ValueError when a rule that needs statistics is not fitted"""
+    with pytest.raises(ValueError):
+        OutlierRules([{"type": "zscore", "column": "Weight"}]).mask(df_in)
+
+
+# unhappy path for testing OutlierRules
+def test_outlier_rules_not_existing():
+    """test if OutlierRules raises KeyError if the column of a rule does not exist in the dataframe"""
+    with pytest.raises(KeyError):
+        OutlierRules([{"type": "range", "column": "BMI", "maximum": 40}]).mask(df_in)
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src import pipeline
+from src.pipeline import run_pipeline, source_fingerprint
+
+features_column = ["Age", "Weight", "Height", "Neck", "Chest", "Abdomen", "Hip", "Thigh", "Knee", "Ankle",
+                   "Biceps", "Forearm", "Wrist"]
+rng = np.random.default_rng(10)
+raw = pd.DataFrame(rng.normal(loc=50., scale=5., size=(60, len(features_column))), columns=features_column)
+raw["BodyFat"] = 0.3 * raw["Abdomen"] + rng.normal(size=60)
+raw.loc[0, "BodyFat"] = 80.
+
+
+def make_config(tmp_path, alpha=0.2):
+    """Build a pipeline configuration that reads and writes under tmp_path"""
+    raw_path = tmp_path / "bodyfat.csv"
+    if not raw_path.exists():
+        raw.to_csv(raw_path, index=False)
+    artifacts = str(tmp_path) + "/"
+    return {"preprocess": {"load_path": str(raw_path),
+                           "remove_outliers": {"column_name": "BodyFat", "minimum": 5, "maximum": 50},
+                           "save_path": artifacts + "cleaned_data.csv"},
+            "get_features": {"features_column": features_column, "target_column": "BodyFat",
+                             "scaler_path": artifacts + "scaler.sav", "feature_path": artifacts + "features.csv",
+                             "target_path": artifacts + "target.csv"},
+            "train": {"data_split": {"test_size": 0.2, "random_state": 1, "save_path": artifacts},
+                      "model_train": {"initial_features": features_column, "alpha": alpha, "random_state": 1,
+                                      "save_path": artifacts + "Lasso.sav"},
+                      "export": {"scaler_path": artifacts + "scaler.sav", "save_path": artifacts + "model.npz"}},
+            "predict": {"model_test": {"initial_features": features_column,
+                                       "save_path": artifacts + "predictions.txt"}},
+            "evaluate": {"save_path": artifacts + "evaluation_result.json"}}
+
+
+# happy path for testing run_pipeline
+def test_run_pipeline_skips_unchanged_stages(tmp_path):
+    """test if run_pipeline skips the stages whose inputs and configuration did not change"""
+    cache_dir = str(tmp_path / "cache")
+    values, report = run_pipeline(make_config(tmp_path), cache_dir=cache_dir)
+    assert [entry["status"] for entry in report] == ["ran"] * 6
+    assert len(values["cleaned"]) == len(raw) - 1
+    assert os.path.exists(tmp_path / "model.npz") and os.path.exists(tmp_path / "evaluation_result.json")
+
+    cached_values, report = run_pipeline(make_config(tmp_path), cache_dir=cache_dir)
+    assert [entry["status"] for entry in report[:5]] == ["cached"] * 5
+    np.testing.assert_array_equal(cached_values["predictions"], values["predictions"])
+
+    _, report = run_pipeline(make_config(tmp_path, alpha=0.5), cache_dir=cache_dir)
+    assert [entry["status"] for entry in report[:5]] == ["cached", "cached", "ran", "ran", "ran"]
+
+    # the cached stages overwrite the artifacts written with the other alpha
+    _, report = run_pipeline(make_config(tmp_path), cache_dir=cache_dir)
+    assert [entry["status"] for entry in report[:5]] == ["cached"] * 5
+    predictions = np.loadtxt(tmp_path / "predictions.txt")
+    np.testing.assert_allclose(predictions, np.ravel(values["predictions"]))
+
+
+# happy path for testing run_pipeline
+def test_run_pipeline_no_persist(tmp_path):
+    """test if run_pipeline keeps the artifacts in memory when persist is off"""
+    values, report = run_pipeline(make_config(tmp_path), persist=False)
+
+    assert report[-1]["status"] == "skipped"
+    # 12 test rows are too few for the adjusted R squared of 13 features
+    assert set(values["metrics"]) == {"MSE", "RMSE", "MAE", "MAPE", "R-squared"}
+    assert not os.path.exists(tmp_path / "cleaned_data.csv")
+
+
+# happy path for testing source_fingerprint
+def test_source_fingerprint(tmp_path):
+    """test if the code fingerprint changes when any module of the package changes"""
+    (tmp_path / "pipeline.py").write_text("STAGES = []\n")
+    (tmp_path / "metrics.py").write_text("def r2():\n    return 1\n")
+    fingerprint = source_fingerprint(str(tmp_path))
+    (tmp_path / "notes.txt").write_text("not code")
+    assert source_fingerprint(str(tmp_path)) == fingerprint
+
+    (tmp_path / "metrics.py").write_text("def r2():\n    return 0\n")
+    assert source_fingerprint(str(tmp_path)) != fingerprint
+
+
+# unhappy path for testing run_pipeline
+def test_run_pipeline_warns_ignored_settings(tmp_path, monkeypatch):
+    """test if run_pipeline warns about the settings of the step by step pipeline it does not apply"""
+    warnings = []
+    monkeypatch.setattr(pipeline.logger, "warning", lambda message, *args: warnings.append(message % args))
+    config = make_config(tmp_path)
+    config["preprocess"]["chunksize"] = 10
+    config["evaluate"]["chunksize"] = 10
+
+    run_pipeline(config, persist=False)
+
+    assert [warning.split(":")[0] for warning in warnings] == ["run.py all ignores preprocess.chunksize",
+                                                               "run.py all ignores evaluate.chunksize"]
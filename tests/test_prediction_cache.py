@@ -0,0 +1,48 @@
+import time
+
+from src.prediction_cache import PredictionCache
+
+features = [22., 165., 70., 30., 100., 85., 100., 60., 80., 23., 35., 25., 18.]
+
+
+# happy path for testing PredictionCache
+def test_prediction_cache_hit_and_lru():
+    """test if PredictionCache returns cached predictions of rounded inputs and evicts the least recently used"""
+    cache = PredictionCache(maxsize=2, decimals=1)
+
+    assert cache.get(features) is None
+    cache.put(features, 12.3)
+    cache.put([1.] * 13, 1.)
+    assert cache.get([value + 0.01 for value in features]) == 12.3
+    cache.put([2.] * 13, 2.)
+
+    assert cache.get([1.] * 13) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+# happy path for testing PredictionCache
+def test_prediction_cache_ttl():
+    """test if PredictionCache drops predictions older than the time to live"""
+    cache = PredictionCache(ttl=0.01)
+    cache.put(features, 12.3)
+    time.sleep(0.02)
+
+    assert cache.get(features) is None
+    assert cache.stats()["expirations"] == 1
+
+
+# happy path for testing PredictionCache
+def test_prediction_cache_invalidate():
+    """test if PredictionCache is cleared and re-keyed when a new model is swapped in"""
+    cache = PredictionCache(fingerprint="v1")
+    cache.put(features, 12.3)
+
+    cache.invalidate("v2")
+
+    assert cache.get(features) is None
+    assert cache.fingerprint == "v2"
+    assert cache.stats()["invalidations"] == 1
+    # predictions of the replaced model are not cached
+    cache.put(features, 12.3, "v1")
+    assert cache.get(features) is None
@@ -1,7 +1,13 @@
+import json
+
+import numpy as np
 import pandas as pd
 import pytest
+import sqlalchemy
 
-from src.preprocess_data import remove_outliers
+from src.add_bodymeasurement import UserInput, UserLabel, create_db
+from src.artifact_io import read_table
+from src.preprocess_data import preprocess_chunks, preprocess_database, remove_outliers, save_cleaned_data
 
 columns = ["Density", "BodyFat", "Age", "Weight", "Height", "Neck", "Chest",
            "Abdomen", "Hip", "Thigh", "Knee", "Ankle", "Biceps", "Forearm",
@@ -53,3 +59,74 @@ def test_remove_outliers_not_existing():
 
     with pytest.raises(KeyError):
         remove_outliers(input_data, non_exist_feature, 30, 50)
+
+
+# happy path for testing preprocess_chunks
+@pytest.mark.parametrize("extension", [".csv", ".parquet", ".feather"])
+def test_preprocess_chunks(tmp_path, extension):
+    """test if preprocess_chunks function writes the same cleaned data as the in-memory path"""
+    if extension != ".csv":
+        pytest.importorskip("pyarrow")
+    rng = np.random.default_rng(12)
+    raw = pd.DataFrame(rng.normal(loc=70., scale=15., size=(103, len(columns))), columns=columns)
+    raw_path, save_path = tmp_path / ("raw" + extension), tmp_path / ("cleaned" + extension)
+    save_cleaned_data(raw, str(raw_path))
+
+    stats = preprocess_chunks(str(raw_path), str(save_path),
+                              [{"type": "range", "column": "Height", "minimum": 60, "maximum": 90}], chunksize=10)
+    expected_output = remove_outliers(read_table(str(raw_path)), "Height", 60, 90)
+
+    assert stats["read"] == 103 and stats["chunks"] == 11
+    assert stats["kept"] == len(expected_output)
+    pd.testing.assert_frame_equal(read_table(str(save_path)), expected_output.reset_index(drop=True))
+    if extension == ".csv":
+        save_cleaned_data(expected_output, str(tmp_path / "expected.csv"))
+        assert save_path.read_bytes() == (tmp_path / "expected.csv").read_bytes()
+
+
+# happy path for testing preprocess_database
+@pytest.mark.parametrize("extension", [".csv", ".parquet"])
+def test_preprocess_database(tmp_path, extension):
+    """test if preprocess_database appends only the rows labeled since the last run to the cleaned data"""
+    if extension != ".csv":
+        pytest.importorskip("pyarrow")
+    engine_string = "sqlite:///" + str(tmp_path / "test.db")
+    create_db(engine_string)
+    engine = sqlalchemy.create_engine(engine_string)
+    database_config = {"engine_string": engine_string, "labeled": True, "chunksize": 3,
+                       "watermark_path": str(tmp_path / "watermark.json")}
+    save_path = str(tmp_path / ("cleaned" + extension))
+    rules = [{"type": "range", "column": "BodyFat", "minimum": 5, "maximum": 50}]
+    measurements = dict(name="Mike", weight=165., height=70., neck=30., chest=100., abdomen=85., hip=100.,
+                        thigh=60., knee=80., ankle=23., biceps=35., forearm=25., wrist=18.)
+
+    engine.execute(UserInput.__table__.insert(), [dict(measurements, age=20 + i) for i in range(8)])
+    engine.execute(UserLabel.__table__.insert(), [dict(user_input_id=i, body_fat=b)
+                                                  for i, b in [(1, 12.), (2, 60.), (3, 20.), (5, 30.)]])
+    stats = preprocess_database(database_config, save_path, rules)
+    assert (stats["read"], stats["kept"], stats["last_id"]) == (4, 3, 4)
+
+    engine.execute(UserLabel.__table__.insert(), [dict(user_input_id=i, body_fat=15.) for i in (4, 7, 8)])
+    stats = preprocess_database(database_config, save_path, rules)
+    assert (stats["read"], stats["kept"], stats["last_id"]) == (3, 3, 7)
+
+    # input 4 is labeled after the first run, it is still read by the second one
+    output = read_table(save_path)
+    assert output["Age"].tolist() == [20, 22, 24, 23, 26, 27]
+    assert output["BodyFat"].tolist() == [12., 20., 30., 15., 15., 15.]
+    assert json.loads((tmp_path / "watermark.json").read_text()) == {"last_id": 7}
+
+
+# unhappy path for testing preprocess_database
+def test_preprocess_database_no_rows(tmp_path):
+    """test if preprocess_database raises before saving a watermark when no input is labeled yet"""
+    engine_string = "sqlite:///" + str(tmp_path / "test.db")
+    create_db(engine_string)
+    engine = sqlalchemy.create_engine(engine_string)
+    engine.execute(UserInput.__table__.insert(), [dict(name="Mike", age=22, weight=165., height=70.)])
+    database_config = {"engine_string": engine_string, "labeled": True,
+                       "watermark_path": str(tmp_path / "watermark.json")}
+
+    with pytest.raises(ValueError):
+        preprocess_database(database_config, str(tmp_path / "cleaned.csv"), [])
+    assert list(tmp_path.iterdir()) == [tmp_path / "test.db"]
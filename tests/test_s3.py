@@ -0,0 +1,175 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import s3
+from src.artifact_io import read_table
+from src.generate_features import get_features
+from src.preprocess_data import preprocess_data
+
+moto = pytest.importorskip("moto")
+
+bucket_name = "bodyfat-test"
+content = b"Density,BodyFat,Age\n1.0708,12.3,23\n" * 200000
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Start a moto stand-in of S3 with an empty bucket and return its client"""
+    for variable in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(variable, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    mock = moto.mock_aws() if hasattr(moto, "mock_aws") else moto.mock_s3()
+    with mock:
+        monkeypatch.setattr(s3, "_clients", {})
+        monkeypatch.setattr(s3, "_settings", {"cache_dir": None, "endpoint_url": None})
+        s3_client = s3.get_client()
+        s3_client.create_bucket(Bucket=bucket_name)
+        yield s3_client
+
+
+def test_parse_s3():
+    """test if parse_s3 works as expected"""
+    # happy path
+    assert s3.parse_s3("s3://2022-msia-423-xu-ziru/raw/bodyfat.csv") == ("2022-msia-423-xu-ziru", "raw/bodyfat.csv")
+
+    # unhappy path
+    with pytest.raises(AttributeError):
+        s3.parse_s3("2022-msia-423-xu-ziru/raw/bodyfat.csv")
+
+
+def test_local_etag(tmp_path):
+    """test if local_etag computes the ETag of single and multipart uploads"""
+    path = tmp_path / "bodyfat.csv"
+    path.write_bytes(content)
+    # happy path
+    assert s3.local_etag(str(path), len(content) + 1) == hashlib.md5(content).hexdigest()
+    part = 1024 * 1024
+    parts = [hashlib.md5(content[start:start + part]).digest() for start in range(0, len(content), part)]
+    assert s3.local_etag(str(path), part) == "%s-7" % hashlib.md5(b"".join(parts)).hexdigest()
+
+
+def test_upload_download(tmp_path, client):
+    """test if multipart transfers reuse the client of the process and skip unchanged files"""
+    path = tmp_path / "bodyfat.csv"
+    path.write_bytes(content)
+    s3path = "s3://%s/raw/bodyfat.csv" % bucket_name
+    # happy path
+    assert s3.upload_file_to_s3(str(path), s3path, chunk_size=5 * 1024 * 1024) is True
+    assert s3.get_client() is client
+    assert client.head_object(Bucket=bucket_name, Key="raw/bodyfat.csv")["ETag"].strip('"').endswith("-2")
+    assert s3.upload_file_to_s3(str(path), s3path, chunk_size=5 * 1024 * 1024) is False
+
+    download_path = tmp_path / "raw" / "bodyfat.csv"
+    assert s3.download_file_from_s3(str(download_path), s3path) is True
+    assert download_path.read_bytes() == content
+    assert s3.download_file_from_s3(str(download_path), s3path) is False
+
+    # a changed local file is transferred again, an object without the MD5 metadata is compared by its ETag
+    download_path.write_bytes(content[::-1])
+    assert s3.download_file_from_s3(str(download_path), s3path) is True
+    for key, chunk_size in [("raw/single.csv", len(content) + 1), ("raw/one_part.csv", len(content)), ("raw/multipart.csv", 5 * 1024 * 1024)]:
+        client.upload_file(str(path), bucket_name, key, Config=s3.transfer_config(chunk_size))
+        assert s3.download_file_from_s3(str(path), "s3://%s/%s" % (bucket_name, key)) is False
+
+
+def test_sync_prefix(tmp_path, client):
+    """test if sync_prefix uploads and downloads every file of a prefix"""
+    local_dir = tmp_path / "artifacts"
+    (local_dir / ".cache").mkdir(parents=True)
+    for name in ("features.csv", "target.csv", ".cache/stage.pkl"):
+        (local_dir / name).write_bytes(name.encode() * 100)
+    s3path = "s3://%s/data/artifacts/" % bucket_name
+    # happy path
+    assert s3.sync_prefix(str(local_dir), s3path, max_workers=3) == {"transferred": 3, "skipped": 0}
+    (local_dir / "target.csv").write_bytes(b"changed")
+    assert s3.sync_prefix(str(local_dir), s3path) == {"transferred": 1, "skipped": 2}
+
+    download_dir = tmp_path / "download"
+    assert s3.sync_prefix(str(download_dir), s3path, "download") == {"transferred": 3, "skipped": 0}
+    assert (download_dir / ".cache" / "stage.pkl").read_bytes() == b".cache/stage.pkl" * 100
+    assert (download_dir / "target.csv").read_bytes() == b"changed"
+    assert s3.sync_prefix(str(download_dir), s3path, "download") == {"transferred": 0, "skipped": 3}
+
+    # unhappy path
+    with pytest.raises(ValueError):
+        s3.sync_prefix(str(local_dir), s3path, "mirror")
+
+
+def test_open_s3(tmp_path, client):
+    """test if S3 objects are written as multipart uploads and read back with ranged reads"""
+    s3path = "s3://%s/raw/bodyfat.csv" % bucket_name
+    # happy path
+    with s3.open_s3(s3path, "wb") as file:
+        for start in range(0, len(content), 1000000):
+            file.write(content[start:start + 1000000])
+    path = tmp_path / "bodyfat.csv"
+    path.write_bytes(content)
+    head = client.head_object(Bucket=bucket_name, Key="raw/bodyfat.csv")
+    assert head["ETag"].strip('"') == s3.local_etag(str(path))
+    assert s3.is_unchanged(str(path), head)
+
+    with s3.open_s3(s3path, "rb") as file:
+        file.seek(-36, 2)
+        assert file.read() == content[-36:]
+        file.seek(20)
+        assert file.read(16) == content[20:36]
+    with s3.open_s3(s3path, "r") as file:
+        assert file.readline() == "Density,BodyFat,Age\n"
+
+    # unhappy path
+    with pytest.raises(FileNotFoundError):
+        s3.open_s3("s3://%s/raw/missing.csv" % bucket_name)
+    with pytest.raises(ValueError):
+        s3.open_s3(s3path, "ab")
+
+
+def test_open_s3_abort(client):
+    """test if an error inside the with block of a written S3 object drops the upload instead of creating the object"""
+    s3path = "s3://%s/raw/bodyfat.csv" % bucket_name
+    # unhappy path
+    for mode, data in (("wb", content), ("w", content[:1000].decode())):
+        with pytest.raises(RuntimeError):
+            with s3.open_s3(s3path, mode) as file:
+                file.write(data)
+                raise RuntimeError("stopped writing")
+        assert not s3.exists(s3path)
+    assert client.list_multipart_uploads(Bucket=bucket_name).get("Uploads", []) == []
+
+
+def test_pipeline_s3_paths(tmp_path, client, monkeypatch):
+    """test if the steps stream s3:// paths, and read them through the ETag keyed cache when it is configured"""
+    features_column = ["Age", "Weight", "Abdomen"]
+    rng = np.random.default_rng(11)
+    raw = pd.DataFrame(rng.normal(50., 5., size=(100, 3)), columns=features_column)
+    raw["BodyFat"] = 0.3 * raw["Abdomen"] + rng.normal(size=100)
+    client.put_object(Bucket=bucket_name, Key="raw/bodyfat.csv", Body=raw.to_csv(index=False).encode())
+    artifacts = "s3://%s/data/artifacts/" % bucket_name
+    config = {"artifacts": {"format": "parquet"},
+              "preprocess": {"load_path": "s3://%s/raw/bodyfat.csv" % bucket_name, "chunksize": 30,
+                             "remove_outliers": {"column_name": "BodyFat", "minimum": 5, "maximum": 50},
+                             "save_path": artifacts + "cleaned_data.csv"},
+              "get_features": {"load_path": artifacts + "cleaned_data.csv", "features_column": features_column,
+                               "target_column": "BodyFat", "scaler_path": artifacts + "scaler.sav",
+                               "feature_path": artifacts + "features.csv", "target_path": artifacts + "target.csv"}}
+    monkeypatch.chdir(tmp_path)
+    # happy path
+    preprocess_data(config)
+    get_features(config)
+    assert list(tmp_path.iterdir()) == []
+    cleaned = read_table(artifacts + "cleaned_data.parquet")
+    pd.testing.assert_frame_equal(cleaned, raw[raw["BodyFat"].between(5, 50)].reset_index(drop=True))
+    assert read_table(artifacts + "features.parquet").shape == (len(cleaned), 3)
+    assert s3.exists(artifacts + "scaler.sav")
+
+    s3.configure(cache_dir=str(tmp_path / "cache"))
+    pd.testing.assert_frame_equal(read_table(artifacts + "cleaned_data.parquet"), cleaned)
+    pd.testing.assert_frame_equal(read_table(artifacts + "cleaned_data.parquet"), cleaned)
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    # a new version of the object is a new entry of the cache
+    rule = {"column_name": "BodyFat", "minimum": 10, "maximum": 50}
+    preprocess_data(dict(config, preprocess=dict(config["preprocess"], remove_outliers=rule)))
+    assert read_table(artifacts + "cleaned_data.parquet")["BodyFat"].min() >= 10
+    assert len(list((tmp_path / "cache").iterdir())) == 2
@@ -0,0 +1,61 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn import linear_model
+from sklearn.preprocessing import StandardScaler
+
+from src.artifact_io import read_table
+from src.score_model import score_batch
+
+features = ["Age", "Weight", "Height"]
+rng = np.random.default_rng(7)
+raw = pd.DataFrame(rng.normal(loc=[45., 180., 70.], scale=[12., 29., 3.6], size=(250, 3)), columns=features)
+raw.insert(0, "id", np.arange(1000, 1250))
+target = 0.1 * raw["Weight"] + rng.normal(size=250)
+
+
+@pytest.fixture
+def model_paths(tmp_path):
+    """Pickle a scaler and a Lasso model fitted on the raw data, return their paths"""
+    scaler = StandardScaler().fit(raw[features])
+    model = linear_model.Lasso(alpha=0.1).fit(pd.DataFrame(scaler.transform(raw[features]), columns=features), target)
+    model_path, scaler_path = tmp_path / "Lasso.sav", tmp_path / "scaler.sav"
+    model_path.write_bytes(pickle.dumps(model))
+    scaler_path.write_bytes(pickle.dumps(scaler))
+    expected = model.predict(pd.DataFrame(scaler.transform(raw[features]), columns=features))
+    return str(model_path), str(scaler_path), expected
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_score_batch(tmp_path, model_paths, n_jobs):
+    """test if score_batch writes the prediction of every row next to its id, in order"""
+    model_path, scaler_path, expected = model_paths
+    raw.to_csv(tmp_path / "users.csv", index=False)
+    batch_config = {"load_path": str(tmp_path / "users.csv"), "scaler_path": scaler_path, "chunksize": 40,
+                    "n_jobs": n_jobs, "save_path": str(tmp_path / "predictions.parquet")}
+    # happy path
+    stats = score_batch(batch_config, model_path, features)
+    assert (stats["rows"], stats["chunks"]) == (250, 7)
+
+    output = read_table(tmp_path / "predictions.parquet")
+    assert output["id"].tolist() == raw["id"].tolist()
+    np.testing.assert_allclose(output["prediction"], expected)
+
+
+def test_score_batch_without_id(tmp_path, model_paths):
+    """test if score_batch identifies the rows by position when the data has no id column"""
+    model_path, scaler_path, expected = model_paths
+    raw[features].to_parquet(tmp_path / "users.parquet")
+    batch_config = {"load_path": str(tmp_path / "users.parquet"), "scaler_path": scaler_path, "chunksize": 100,
+                    "save_path": str(tmp_path / "predictions.feather")}
+    # happy path
+    score_batch(batch_config, model_path, features)
+    output = read_table(tmp_path / "predictions.feather")
+    assert output["id"].tolist() == list(range(250))
+    np.testing.assert_allclose(output["prediction"], expected)
+
+    # unhappy path
+    with pytest.raises(KeyError):
+        score_batch(batch_config, model_path, features + ["Wrist"])
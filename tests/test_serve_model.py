@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from src.serve_model import BAND_OFFSETS, body_fat_band, body_fat_bands, validate_records
+
+record = {"age": 22, "weight": 165, "height": 70, "neck": 30, "chest": 100, "abdomen": 85, "hip": 100,
+          "thigh": 60, "knee": 80, "ankle": 23, "biceps": 35, "forearm": 25, "wrist": 18}
+
+
+# happy path for testing body_fat_bands
+def test_body_fat_bands():
+    """test if body_fat_bands function puts the boundaries in the same band as the form view"""
+    predictions = np.array([7.9, 8, 14.9, 15, 18, 18.1, 24.9, 27, 35])
+
+    output = body_fat_bands(predictions)
+
+    assert output.tolist() == [0, 1, 1, 2, 2, 3, 3, 4, 4]
+    assert body_fat_band(16.5) == BAND_OFFSETS[2]
+
+
+# happy path for testing validate_records
+def test_validate_records():
+    """test if validate_records function works as expected"""
+    records = [record, dict(record, hip=""), dict(record, wrist="abc", knee=None)]
+
+    features, valid, errors = validate_records(records)
+
+    assert features.shape == (3, 13)
+    assert features[0].tolist() == list(map(float, record.values()))
+    assert valid.tolist() == [True, False, False]
+    assert errors == [[], ["hip"], ["knee", "wrist"]]
+
+
+# unhappy path for testing validate_records
+def test_validate_records_not_objects():
+    """test if validate_records function works as expected if the records are not JSON objects"""
+
+    with pytest.raises(TypeError):
+        validate_records([record, [1, 2, 3]])
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.synthetic_data import MeasurementGenerator
+
+rng = np.random.default_rng(3)
+abdomen = rng.normal(92.6, 10.8, size=300).round(2)
+real = pd.DataFrame({"BodyFat": (0.6 * abdomen - 36 + rng.normal(0, 4, size=300)).round(1),
+                     "Age": rng.integers(22, 81, size=300).astype(float),
+                     "Abdomen": abdomen,
+                     "Name": ["user"] * 300})
+
+
+def test_sample():
+    """test if the synthetic measurements keep the ranges, decimals and correlations of the real ones"""
+    generator = MeasurementGenerator.fit(real)
+    synthetic = generator.sample(20000, seed=1)
+    numeric = real.drop(columns="Name")
+    # happy path
+    assert list(synthetic.columns) == ["BodyFat", "Age", "Abdomen"]
+    assert generator.decimals == [1, 0, 2]
+    assert (synthetic.min() >= numeric.min()).all() and (synthetic.max() <= numeric.max()).all()
+    assert (synthetic["Age"] == synthetic["Age"].round()).all()
+    np.testing.assert_allclose(synthetic.corr("spearman"), numeric.corr("spearman"), atol=0.05)
+    np.testing.assert_allclose(synthetic.mean(), numeric.mean(), rtol=0.02)
+    pd.testing.assert_frame_equal(generator.sample(100, seed=1), synthetic.head(100))
+
+    # unhappy path
+    with pytest.raises(ValueError):
+        generator.sample(-1)
+    with pytest.raises(ValueError):
+        MeasurementGenerator.fit(real[["Name"]])
+
+
+def test_write_csv(tmp_path):
+    """test if write_csv writes the requested number of rows chunk by chunk"""
+    generator = MeasurementGenerator.fit(real)
+    path = tmp_path / "bodyfat.csv"
+    # happy path
+    generator.write_csv(str(path), 2500, chunksize=1000)
+    written = pd.read_csv(path)
+    assert written.shape == (2500, 3)
+    pd.testing.assert_frame_equal(written.head(1000), generator.sample(1000), check_exact=False)
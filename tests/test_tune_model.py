@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn import linear_model
+
+from src.tune_model import alpha_grid, cross_validate_path, path_scores
+
+features = ["Age", "Weight", "Height", "Abdomen"]
+rng = np.random.default_rng(0)
+x = pd.DataFrame(rng.normal(size=(120, len(features))), columns=features)
+y = pd.Series(3 * x["Abdomen"] - x["Weight"] + 19 + rng.normal(0, 1, 120), name="BodyFat")
+alphas = np.array([1., 0.3, 0.1, 0.03, 0.01])
+
+
+def test_path_scores():
+    """test if path_scores scores every alpha like an independent Lasso fit"""
+    x_train, x_test = x.to_numpy()[:90], x.to_numpy()[90:]
+    y_train, y_test = y.to_numpy()[:90], y.to_numpy()[90:]
+    # happy path
+    mse = path_scores(x_train, y_train, x_test, y_test, alphas, tol=1e-10, max_iter=10000)
+    expected = [np.mean((linear_model.Lasso(alpha=alpha, tol=1e-10, max_iter=10000).fit(x_train, y_train)
+                         .predict(x_test) - y_test) ** 2) for alpha in alphas]
+    np.testing.assert_allclose(mse, expected, rtol=1e-6)
+
+
+def test_alpha_grid():
+    """test if alpha_grid starts at the smallest alpha that sets every coefficient to zero"""
+    # happy path
+    grid = alpha_grid(x.to_numpy(), y.to_numpy(), n_alphas=10)
+    assert len(grid) == 10 and np.all(np.diff(grid) < 0)
+    assert np.allclose(linear_model.Lasso(alpha=grid[0]).fit(x, y).coef_, 0)
+    assert not np.allclose(linear_model.Lasso(alpha=grid[1]).fit(x, y).coef_, 0)
+
+
+def test_cross_validate_path():
+    """test if cross_validate_path chooses the same alpha in one and in several processes"""
+    # happy path
+    serial = cross_validate_path(x, y, features, alphas=list(alphas), l1_ratios=[1., 0.5], n_splits=3)
+    parallel = cross_validate_path(x, y, features, alphas=list(alphas), l1_ratios=[1., 0.5], n_splits=3, n_jobs=2)
+    assert serial == parallel
+    assert [grid["l1_ratio"] for grid in serial["grid"]] == [1., 0.5]
+    best = min(min(grid["mse_mean"]) for grid in serial["grid"])
+    assert serial["mse"] == best and serial["alpha"] in alphas
+
+
+def test_cross_validate_path_unhappy():
+    """test if cross_validate_path rejects invalid l1 ratios and missing features"""
+    # unhappy path
+    with pytest.raises(ValueError):
+        cross_validate_path(x, y, features, alphas=list(alphas), l1_ratios=[0.])
+    with pytest.raises(KeyError):
+        cross_validate_path(x, y, features + ["Wrist"], alphas=list(alphas))